@@ -1,34 +1,97 @@
-from flask import Flask, render_template, session, redirect, url_for, request, jsonify, flash
+from flask import Flask, render_template, session, redirect, url_for, request, jsonify, flash, abort
 from firebase_admin import firestore, auth, credentials
 import firebase_admin
 from datetime import datetime, date
+import multiprocessing
 import os
+import sys
+import threading
+import time
+
+from shared.queries import (
+    patients_for_radiologist, scans_for_patients, scans_page, patient_names, patient_ref_id, forget_patient_name
+)
+from shared.doc_cache import DocCache
+from shared.writer import BackgroundWriter
+from shared.aggregates import current_stats, record_gender_change, record_patient, record_scan, radiologist_of
+from shared.measurements import case_ref_id, case_series, record_points, series_point
+from shared.case_summary import record_added
+from shared import cascade, media, metrics
+from shared.datastore import open_client
+from shared.metrics import span
+from shared.patient_index import PatientIndex
 
 app = Flask(__name__)
 app.secret_key = "brainalyze-secret"
 
-cred = credentials.Certificate("brainalyze-admin.json")
-try:
-    firebase_admin.get_app()
-except ValueError:
-    firebase_admin.initialize_app(cred)
+# DATASTORE=memory runs the app on an in-process stand-in for Firestore
+# (shared/datastore.py), e.g. for load tests. Either way every document
+# read and write is counted per request.
+DATASTORE = os.environ.get("DATASTORE", "firestore")
+if DATASTORE == "firestore":
+    cred = credentials.Certificate("brainalyze-admin.json")
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(cred)
+
+db = open_client(DATASTORE)
 
-db = firestore.client()
+# Radiologist and Patient documents are read on almost every request.
+doc_cache = DocCache(db, ttl=int(os.environ.get("DOC_CACHE_TTL", 30)))
+# Searches, filters and pages of /patients are served from a local index.
+patient_index = PatientIndex(db, ttl=int(os.environ.get("PATIENT_INDEX_TTL", 600)))
+PATIENTS_PER_PAGE = int(os.environ.get("PATIENTS_PER_PAGE", 20))
 
 UPLOAD_FOLDER = "static/uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+# {{ thumb(url, 256) }} in templates: a cached thumbnail for media URLs.
+app.jinja_env.globals["thumb"] = media.thumbnail_url
+
+# Uploaded scans are analysed from memory and written to the media store
+# (shared/media.py) by a background thread. ASYNC_UPLOAD_WRITES=0 writes them
+# inside the request.
+ASYNC_UPLOAD_WRITES = os.environ.get("ASYNC_UPLOAD_WRITES", "1") != "0"
+upload_writer = BackgroundWriter()
+
+
+def _persist_upload(path, data):
+    if ASYNC_UPLOAD_WRITES:
+        upload_writer.write(path, data)
+    else:
+        media.write_atomic(path, data)
+
+
+def _store_upload(data, filename, digest=None):
+    """Persist an upload under its content-addressed media name; returns its URL."""
+    digest = digest or content_hash(data)
+    name = media.media_name(digest, os.path.splitext(filename)[1])
+    path = media.media_path(name)
+    if not os.path.exists(path):
+        _persist_upload(path, data)
+    return media.media_url(name)
+
+
+# Per-request timings and datastore ops: Server-Timing headers and /metrics.
+metrics.init_app(app, db.counter)
+
+
+@app.after_request
+def _datastore_ops_header(response):
+    ops = db.counter.request_ops()
+    response.headers["X-Datastore-Ops"] = f"reads={ops['reads']}, writes={ops['writes']}"
+    return response
 
 
 def _get_logged_doctor():
     rid = session.get("radiologist_id")
     if not rid:
         return None
-    doc = db.collection("Radiologists").document(rid).get()
-    if not doc.exists:
+    d = doc_cache.get("Radiologists", rid)
+    if d is None:
         return None
 
-    d = doc.to_dict() or {}
     return {
         "id": rid,
         "name": d.get("FullName", "Radiologist"),
@@ -100,9 +163,8 @@ def home():
     if not doctor:
         return redirect(url_for("register_login"))
 
-    patients_query = db.collection("Patients").where(
-        "CreatedBy", "==", f"/Radiologists/{doctor['id']}"
-    ).stream()
+    patients_list = patients_for_radiologist(db, doctor["id"])
+    scans_by_patient = scans_for_patients(db, [p.id for p in patients_list])
 
     cases = []
     today = datetime.now().date()
@@ -110,15 +172,10 @@ def home():
     today_completed = 0
     today_pending = 0
 
-    for p in patients_query:
+    for p in patients_list:
         pdata = p.to_dict()
-        patient_id = p.id
-
-        scans_query = db.collection("MRI_Scans").where(
-            "PatientID", "==", f"/Patients/{patient_id}"
-        ).stream()
 
-        for s in scans_query:
+        for s in scans_by_patient[p.id]:
             sdata = s.to_dict()
             upload_date = sdata.get("UploadDate")
 
@@ -169,56 +226,27 @@ def dashboard():
     if not doctor:
         return redirect(url_for("register_login"))
 
-    patients = list(
-        db.collection("Patients")
-        .where("CreatedBy", "==", f"/Radiologists/{doctor['id']}")
-        .stream()
-    )
-    scans = list(db.collection("MRI_Scans").stream())
-    reports = list(db.collection("Reports").stream())
-
-    total_patients = len(patients)
-    total_scans = len(scans)
-    total_reports = len(reports)
+    stats = current_stats(db, doctor["id"])
 
     now = datetime.now()
-    new_scans = sum(
-        1 for s in scans
-        if isinstance(s.to_dict().get("UploadDate"), datetime)
-        and s.to_dict()["UploadDate"].month == now.month
-    )
+    monthly = stats.get("MonthlyUploads") or {}
+    new_scans = monthly.get(now.strftime("%Y-%m"), 0)
+    monthly_uploads = [monthly.get(f"{now.year}-{m:02d}", 0) for m in range(1, 13)]
 
-    conf_scores = []
-    for s in scans:
-        val = s.to_dict().get("ConfidenceScore")
-        try:
-            val_f = float(val)
-            conf_scores.append(val_f if val_f <= 1 else val_f / 100)
-        except:
-            pass
+    total_patients = stats.get("TotalPatients", 0)
+    total_reports = stats.get("TotalReports", 0)
 
+    conf_count = stats.get("ConfidenceCount", 0)
     ai_accuracy = (
-        f"{(sum(conf_scores) / len(conf_scores) * 100):.0f}%"
-        if conf_scores else "95%"
+        f"{(stats.get('ConfidenceSum', 0) / conf_count * 100):.0f}%"
+        if conf_count else "95%"
     )
 
-    tumor_counts = {}
+    tumor_counts = {k: v for k, v in (stats.get("TumorCounts") or {}).items() if v}
     gender_counts = {"Male": 0, "Female": 0}
-
-    for s in scans:
-        tumor = s.to_dict().get("ClassificationResult", "Unknown")
-        tumor_counts[tumor] = tumor_counts.get(tumor, 0) + 1
-
-    for p in patients:
-        g = p.to_dict().get("Gender", "")
+    for g, n in (stats.get("GenderCounts") or {}).items():
         if g in gender_counts:
-            gender_counts[g] += 1
-
-    monthly_uploads = [0] * 12
-    for s in scans:
-        d = s.to_dict().get("UploadDate")
-        if isinstance(d, datetime):
-            monthly_uploads[d.month - 1] += 1
+            gender_counts[g] = n
 
     return render_template(
         "dashboard.html",
@@ -239,8 +267,7 @@ def profile():
         return redirect(url_for("register_login"))
 
     doc_ref = db.collection("Radiologists").document(doctor["id"])
-    snap = doc_ref.get()
-    data = snap.to_dict() or {}
+    data = doc_cache.get("Radiologists", doctor["id"]) or {}
 
     if request.method == "POST":
         updated = {
@@ -260,6 +287,7 @@ def profile():
             updated["ProfilePicture"] = data.get("ProfilePicture", "/static/images/user.png")
 
         doc_ref.update(updated)
+        doc_cache.invalidate("Radiologists", doctor["id"])
         data.update(updated)
 
         try:
@@ -290,7 +318,7 @@ def update_profile_ajax():
         return jsonify({"status": "error", "message": "Not logged in"}), 403
 
     doc_ref = db.collection("Radiologists").document(doctor["id"])
-    old_data = doc_ref.get().to_dict() or {}
+    old_data = doc_cache.get("Radiologists", doctor["id"]) or {}
 
     name = request.form.get("name", "").strip()
     email = request.form.get("email", "").strip()
@@ -314,6 +342,7 @@ def update_profile_ajax():
         updated["ProfilePicture"] = old_data.get("ProfilePicture", "/static/images/user.png")
 
     doc_ref.update(updated)
+    doc_cache.invalidate("Radiologists", doctor["id"])
 
     return jsonify({
         "status": "success",
@@ -350,7 +379,9 @@ def patients():
                 "CreatedBy": f"/Radiologists/{doctor['id']}",
                 "CreatedAt": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
-            db.collection("Patients").add(new_patient)
+            _, new_ref = db.collection("Patients").add(new_patient)
+            record_patient(db, doctor["id"], new_patient)
+            patient_index.put(new_ref.id, new_patient)
 
             flash("Patient added successfully.", "success")
             return redirect(url_for("patients"))
@@ -359,34 +390,25 @@ def patients():
     tumor = request.args.get("tumor", "").strip()
     date_from = request.args.get("from", "").strip()
     date_to = request.args.get("to", "").strip()
+    page = request.args.get("page", "1")
 
-    patients_ref = db.collection("Patients").where("CreatedBy", "==", f"/Radiologists/{doctor['id']}")
-    patients_query = patients_ref.stream()
-
-    patients = []
-    tumor_types = set()
-
-    for p in patients_query:
-        pdata = p.to_dict()
-        pdata["id"] = p.id
-        pdata["FullName"] = pdata.get("FullName", "")
-        pdata["Age"] = pdata.get("Age", "")
-        pdata["Gender"] = pdata.get("Gender", "")
-        pdata["TumorType"] = pdata.get("TumorType", "")
-        pdata["LastMRIDate"] = pdata.get("LastMRIDate", "")
+    result = patient_index.search(
+        doctor["id"], q=q, tumor=tumor, date_from=date_from, date_to=date_to,
+        page=int(page) if page.isdigit() else 1, per_page=PATIENTS_PER_PAGE
+    )
+    patients = result["patients"]
+    for pdata in patients:
         pdata["Initials"] = compute_initials(pdata["FullName"])
-        tumor_types.add(pdata["TumorType"])
-
-        if q and (q not in pdata["FullName"].lower() and q not in p.id.lower()):
-            continue
-
-        patients.append(pdata)
 
     return render_template(
         "patients.html",
         doctor=doctor,
         patients=patients,
-        tumor_types=sorted(list(filter(None, tumor_types))),
+        tumor_types=sorted(result["facets"]["TumorType"]),
+        tumor_counts=result["facets"]["TumorType"],
+        total=result["total"],
+        page=result["page"],
+        pages=result["pages"],
         q=q,
         tumor=tumor,
         date_from=date_from,
@@ -412,7 +434,7 @@ def add_patient():
     now = datetime.now().isoformat()
 
     new_doc = db.collection("Patients").document()
-    new_doc.set({
+    new_patient = {
         "FullName": name,
         "Age": age,
         "Gender": gender,
@@ -420,7 +442,10 @@ def add_patient():
         "CreatedBy": f"/Radiologists/{rid}",
         "CreatedAt": now,
         "LastMRI": ""
-    })
+    }
+    new_doc.set(new_patient)
+    record_patient(db, rid, new_patient)
+    patient_index.put(new_doc.id, new_patient)
     return jsonify({"status": "success", "message": "Patient added successfully"})
 
 
@@ -432,11 +457,10 @@ def patient_profile(patient_id):
         return redirect(url_for("register_login"))
 
     p_ref = db.collection("Patients").document(patient_id)
-    snap = p_ref.get()
-    if not snap.exists:
+    p = doc_cache.get("Patients", patient_id)
+    if p is None:
         return "Patient not found", 404
 
-    p = snap.to_dict() or {}
     if p.get("CreatedBy") != f"/Radiologists/{doctor['id']}":
         return "Unauthorized", 403
 
@@ -474,7 +498,14 @@ def patient_profile(patient_id):
             updated["ProfilePicture"] = p.get("ProfilePicture", "/static/images/user.png")
 
         if updated:
-            p_ref.update(updated)
+            batch = db.batch()
+            batch.update(p_ref, updated)
+            if "Gender" in updated:
+                record_gender_change(db, doctor["id"], p.get("Gender", ""), updated["Gender"], batch=batch)
+            batch.commit()
+            doc_cache.invalidate("Patients", patient_id)
+            forget_patient_name(patient_id)
+            patient_index.update(patient_id, updated)
 
         return redirect(url_for("patient_profile", patient_id=patient_id))
 
@@ -489,6 +520,9 @@ def patient_profile(patient_id):
         "LastScanDate": p.get("LastMRIDate", ""),
     }
 
+    # ScanCount, LastScanAt and FirstDiagnosis are kept on the case
+    # (shared/case_summary.py), so the page needs one query for the cases
+    # and one for the scans however many cases there are.
     cases_query = (
         db.collection("Cases")
         .where("PatientID", "==", f"/Patients/{patient_id}")
@@ -499,33 +533,16 @@ def patient_profile(patient_id):
     cases = []
     for c in cases_query:
         cd = c.to_dict() or {}
-        scans_for_case = db.collection("MRI_Scans").where(
-            "CaseID", "==", f"/Cases/{c.id}"
-        ).stream()
-
-        scan_dates = []
-        for sc in scans_for_case:
-            dt = sc.to_dict().get("UploadDate")
-            if isinstance(dt, datetime):
-                scan_dates.append(dt)
-
-        if scan_dates:
-            last_update_clean = max(scan_dates).strftime("%Y-%m-%d %H:%M")
-        else:
-            raw = cd.get("LastUpdate")
-            if isinstance(raw, datetime):
-                last_update_clean = raw.strftime("%Y-%m-%d %H:%M")
-            else:
-                last_update_clean = "—"
-
+        raw = cd.get("LastScanAt") or cd.get("LastUpdate")
         cases.append({
             "id": c.id,
-            "diagnosis": cd.get("Diagnosis", "—"),
+            "diagnosis": cd.get("Diagnosis") or cd.get("FirstDiagnosis") or "—",
             "treatment_plan": cd.get("TreatmentPlan", "—"),
             "status": cd.get("Status", "—"),
             "start_date": cd.get("StartDate", "—"),
             "end_date": cd.get("EndDate", None),
-            "last_update": last_update_clean
+            "scan_count": cd.get("ScanCount", 0),
+            "last_update": raw.strftime("%Y-%m-%d %H:%M") if isinstance(raw, datetime) else "—"
         })
 
     cases_sorted = sorted(cases, key=lambda x: x["start_date"] if x["start_date"] != "—" else "")
@@ -534,7 +551,9 @@ def patient_profile(patient_id):
 
     scans_query = db.collection("MRI_Scans").where(
         "PatientID", "==", f"/Patients/{patient_id}"
-    ).order_by("UploadDate", direction=firestore.Query.ASCENDING).stream()
+    ).order_by("UploadDate", direction=firestore.Query.ASCENDING).select(
+        ["MRIFilePath", "UploadDate", "CaseID"]
+    ).stream()
 
     scans = []
     for s in scans_query:
@@ -572,9 +591,7 @@ def create_case(patient_id):
     if not doctor:
         return redirect(url_for("register_login"))
 
-    patient_ref = db.collection("Patients").document(patient_id)
-    snap = patient_ref.get()
-    if not snap.exists:
+    if doc_cache.get("Patients", patient_id) is None:
         return "Patient not found", 404
 
     treatment_plan = request.form.get("treatment_plan", "").strip()
@@ -596,13 +613,13 @@ def create_case(patient_id):
         "Notes": "",
         "CreatedAt": now,
         "LastUpdate": now,
-        "FirstScanID": None
+        "FirstScanID": None,
+        "ScanCount": 0,
+        "LastScanAt": None,
+        "FirstDiagnosis": None
     })
 
-    filename = f"{case_id}_{first_scan.filename}"
-    save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    first_scan.save(save_path)
-    rel_path = "/" + save_path.replace("\\", "/")
+    rel_path = _store_upload(first_scan.read(), first_scan.filename)
 
     return redirect(url_for("scans", patient_id=patient_id, case_id=case_id, first_image=rel_path))
 
@@ -653,16 +670,16 @@ def view_case(patient_id, case_id):
     else:
         case["LastUpdateFormatted"] = "—"
 
-    first_scan_diagnosis = None
-    if scans_list:
+    first_scan_diagnosis = case.get("FirstDiagnosis")
+    if not first_scan_diagnosis and scans_list:
         first_scan_diagnosis = scans_list[0].get("ClassificationResult", "").strip()
 
     if not case.get("Diagnosis") or case["Diagnosis"].strip() == "":
         case["Diagnosis"] = first_scan_diagnosis if first_scan_diagnosis else "Pending Diagnosis"
         db.collection("Cases").document(case_id).update({"Diagnosis": case["Diagnosis"]})
 
-    p_doc = db.collection("Patients").document(patient_id).get()
-    patient_name = p_doc.to_dict().get("FullName", "") if p_doc.exists else ""
+    p_data = doc_cache.get("Patients", patient_id)
+    patient_name = p_data.get("FullName", "") if p_data is not None else ""
 
     return render_template(
         "view_case.html",
@@ -672,10 +689,28 @@ def view_case(patient_id, case_id):
         patient_id=patient_id,
         patient_name=patient_name,
         case=case,
-        scans=scans_list
+        scans=scans_list,
+        series=case_series(case)
     )
 
 
+@app.route("/patients/<patient_id>/cases/<case_id>/measurements")
+def case_measurements(patient_id, case_id):
+    """The case's tumour time series, from the case document alone."""
+    doctor = _get_logged_doctor()
+    if not doctor:
+        return jsonify({"status": "error", "message": "Not logged in"}), 403
+
+    case_doc = db.collection("Cases").document(case_id).get()
+    if not case_doc.exists:
+        return jsonify({"status": "error", "message": "Case not found"}), 404
+
+    series = case_series(case_doc.to_dict() or {})
+    for point in series:
+        point.pop("UploadDate", None)
+    return jsonify({"status": "success", "case_id": case_id, "series": series})
+
+
 @app.route("/patients/<patient_id>/cases/<case_id>/update_treatment", methods=["POST"])
 def update_treatment_plan(patient_id, case_id):
     doctor = _get_logged_doctor()
@@ -715,11 +750,410 @@ def scans():
     return render_template("scans.html", doctor=doctor, patient_id=patient_id, case_id=case_id, first_image=first_image)
 
 
-from models.segmentation_model import load_segmentation_model, segment_image
-from models.classification_model import load_classifier_model, classify_image, generate_gradcam
+from models.registry import ModelRegistry, ModelNotReady
+from shared.result_cache import ResultCache, content_hash, file_hash
+from shared.jobs import JobStore, JobQueue
+from shared.ingest import ingest_study, extract_zip, is_image
+
+# Concurrent uploads are grouped into one forward pass per model.
+# Set INFERENCE_BATCHING=0 to fall back to one forward per request.
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 8))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", 5))
+INFERENCE_BATCHING = os.environ.get("INFERENCE_BATCHING", "1") != "0"
+
+# Models load in a background thread after startup (MODEL_WARMUP=0 loads
+# them on first use instead). Routes wait up to MODEL_WAIT_SECONDS before
+# answering 503 "warming_up".
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "1") != "0"
+MODEL_WAIT_SECONDS = float(os.environ.get("MODEL_WAIT_SECONDS", 30))
+
+
+# INFERENCE_WORKERS=N runs both models in N worker processes instead of in
+# this one (0, the default, keeps them in-process). Each worker gets
+# INFERENCE_THREADS_PER_WORKER torch threads (default: cores / N), bound to
+# its own cores with INFERENCE_PIN_CPUS=1.
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 0))
+INFERENCE_THREADS_PER_WORKER = int(os.environ.get("INFERENCE_THREADS_PER_WORKER", 0))
+INFERENCE_PIN_CPUS = os.environ.get("INFERENCE_PIN_CPUS", "0") == "1"
+INFERENCE_TASK_TIMEOUT = float(os.environ.get("INFERENCE_TASK_TIMEOUT", 120))
+
+# Worker processes are spawned and re-import this module when it is run as
+# `python app.py`; they must not start models, pools or jobs of their own.
+IS_MAIN_PROCESS = multiprocessing.parent_process() is None
+# `python app.py` also runs under the Werkzeug reloader: the first process only
+# watches the files and serves nothing; the child it starts has WERKZEUG_RUN_MAIN.
+IS_SERVING_PROCESS = IS_MAIN_PROCESS and (__name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true")
+
+_inference_pool = None
+_inference_pool_lock = threading.Lock()
+
+
+def _get_inference_pool():
+    global _inference_pool
+    with _inference_pool_lock:
+        if _inference_pool is None:
+            from models.worker_pool import InferencePool
+            _inference_pool = InferencePool(
+                workers=INFERENCE_WORKERS,
+                threads=INFERENCE_THREADS_PER_WORKER or None,
+                pin_cpus=INFERENCE_PIN_CPUS,
+                task_timeout=INFERENCE_TASK_TIMEOUT,
+            )
+        return _inference_pool
+
+
+def _make_scheduler(fn, name):
+    if not INFERENCE_BATCHING:
+        return None
+    from models.batching import BatchScheduler
+    return BatchScheduler(fn, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, name=name,
+                          workers=max(1, INFERENCE_WORKERS))
+
+
+def _load_classifier():
+    from models.classification_model import load_classifier_model, cam_forward
+    if INFERENCE_WORKERS:
+        model = _get_inference_pool().runner("classify")
+    else:
+        model = load_classifier_model()
+    return model, _make_scheduler(lambda x: cam_forward(model, x), "classifier")
+
+
+def _load_segmenter():
+    from models.segmentation_model import load_segmentation_model, seg_forward
+    if INFERENCE_WORKERS:
+        model = _get_inference_pool().runner("segment")
+    else:
+        model = load_segmentation_model()
+    return model, _make_scheduler(lambda x: seg_forward(model, x), "segmentation")
+
+
+def _drop_evicted_artefacts(values):
+    # originals are the radiologists' uploads and stay; a Grad-CAM overlay
+    # goes with its cache entry once no scan shows it. Segmentation entries
+    # hold their mask inline and have no files.
+    cascade.delete_unreferenced(db, "GradCAMPath", {v.get("gradcam") for v in values})
+
+
+# Results keyed by (content hash, checkpoint hash, preprocessing version),
+# so re-uploads of the same file skip inference entirely.
+result_cache = ResultCache(
+    os.environ.get("RESULT_CACHE_PATH", "cache/results.sqlite3"),
+    max_entries=int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 5000)),
+    max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 << 20)),
+    on_evict=_drop_evicted_artefacts,
+)
+
+
+def _checkpoint(name, eager_path):
+    from models.backends import MODEL_BACKEND, exported_path
+    return eager_path if MODEL_BACKEND == "eager" else exported_path(name, MODEL_BACKEND)
+
+
+def _classifier_cache_key(digest):
+    from models.classification_model import CLASSIFIER_MODEL_PATH, PREPROCESS_VERSION
+    return ("classify", digest, file_hash(_checkpoint("classifier", CLASSIFIER_MODEL_PATH)), PREPROCESS_VERSION)
+
+
+def _segmenter_cache_key(digest, mode="fast"):
+    from models.segmentation_model import SEG_MODEL_PATH, PREPROCESS_VERSION
+    version = PREPROCESS_VERSION if mode == "fast" else f"{PREPROCESS_VERSION}-{mode}"
+    return ("segment", digest, file_hash(_checkpoint("segmentation", SEG_MODEL_PATH)), version)
+
+
+def _file_ready(path):
+    upload_writer.wait_for(path)
+    return os.path.exists(path)
+
+
+def _files_exist(*keys):
+    return lambda value: all(_file_ready(media.local_path(value[k])) for k in keys)
 
-seg_model = load_segmentation_model()
-cls_model = load_classifier_model()
+
+model_registry = ModelRegistry()
+model_registry.register("classifier", _load_classifier)
+model_registry.register("segmentation", _load_segmenter)
+if MODEL_WARMUP and IS_SERVING_PROCESS:
+    model_registry.warm_up()
+
+
+def _warming_up_response(e):
+    resp = jsonify({"status": "warming_up", "message": str(e), "models": model_registry.status()})
+    resp.headers["Retry-After"] = "5"
+    return resp, 503
+
+
+@app.route("/ready")
+def ready():
+    ok = model_registry.is_ready()
+    return jsonify({"ready": ok, "models": model_registry.status()}), 200 if ok else 503
+
+
+@app.route("/inference_stats")
+def inference_stats():
+    schedulers = []
+    for name in ("classifier", "segmentation"):
+        loaded = model_registry.peek(name)
+        if loaded and loaded[1] is not None:
+            schedulers.append(loaded[1].stats())
+    stats = {"batching": INFERENCE_BATCHING, "schedulers": schedulers}
+    if _inference_pool is not None:
+        stats["pool"] = _inference_pool.stats()
+    return jsonify(stats)
+
+
+@app.route("/cache_stats")
+def cache_stats():
+    stats = {"results": result_cache.stats(), "documents": doc_cache.stats(), "upload_writer": upload_writer.stats(),
+             "datastore": dict(db.counter.totals, backend=DATASTORE), "patient_index": patient_index.stats()}
+    preprocessing = sys.modules.get("models.preprocessing")
+    if preprocessing is not None:
+        stats["decoded_images"] = dict(preprocessing.stats)
+    return jsonify(stats)
+
+
+def _upload_path(filename):
+    filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}"
+    return os.path.join(app.config["UPLOAD_FOLDER"], filename)
+
+
+def _analyze_upload(data, filename, patient_id, case_id, scan_id=None, radiologist_id=None,
+                    model_timeout=MODEL_WAIT_SECONDS, progress=None):
+    """Classify an upload, render its Grad-CAM and write the MRI_Scans record.
+
+    `data` are the uploaded bytes; inference runs on them directly and they
+    are persisted to the media store (under a name taken from their hash and
+    the extension of `filename`) in the background, only when the result is
+    not already cached. Raises ModelNotReady if the classifier
+    is not loaded within `model_timeout` seconds.
+    """
+    digest = content_hash(data)
+    cache_key = _classifier_cache_key(digest)
+    cached = result_cache.get(cache_key, validate=_files_exist("original", "gradcam"))
+
+    now = datetime.now()
+    preassigned = bool(scan_id)
+    scan_ref = db.collection("MRI_Scans").document(scan_id) if scan_id else db.collection("MRI_Scans").document()
+    scan_id = scan_ref.id
+
+    rel_mask = None
+    cached_mask = None
+    if cached:
+        rel_original = cached["original"]
+        rel_gradcam = cached["gradcam"]
+        tumor_type = cached["tumor_type"]
+        confidence = cached["confidence"]
+        cam = cached.get("cam")
+        cached_mask = result_cache.get(_segmenter_cache_key(digest))
+        if cached_mask:
+            from models.masks import mask_url
+            rel_mask = mask_url(scan_id, cached_mask["mask"])
+    else:
+        cls_model, cls_scheduler = model_registry.get("classifier", timeout=model_timeout)
+        from models.classification_model import classify_with_gradcam
+        from models.preprocessing import load_image
+
+        with span("upload.store"):
+            rel_original = _store_upload(data, filename, digest=digest)
+
+        if progress:
+            progress("classifying", 20)
+        with span("classify"):
+            tumor_type, confidence, probs, rel_gradcam, pred_idx, cam = classify_with_gradcam(
+                cls_model, load_image(digest, data=data), scheduler=cls_scheduler
+            )
+
+        result_cache.put(cache_key, {
+            "original": rel_original,
+            "gradcam": rel_gradcam,
+            "tumor_type": tumor_type,
+            "confidence": confidence,
+            "cam": cam,
+        })
+
+    if progress:
+        progress("saving", 60)
+    scan = {
+        "ScanID": scan_id,
+        "PatientID": f"/Patients/{patient_id}",
+        "CaseID": f"/Cases/{case_id}",
+        "MRIFilePath": rel_original,
+        "SegmentationMaskPath": rel_mask,
+        "SegmentationMask": cached_mask["mask"] if cached_mask else None,
+        "MaskStats": cached_mask["stats"] if cached_mask else None,
+        "GradCAMPath": rel_gradcam,
+        "GradCAMMap": cam,
+        "ClassificationResult": tumor_type,
+        "ConfidenceScore": confidence,
+        "QuickDescription": f"Detected {tumor_type} with {confidence:.1f}% confidence",
+        "ContentHash": digest,
+        "RadiologistID": f"/Radiologists/{radiologist_id}" if radiologist_id else None,
+        "UploadDate": now,
+        "UploadDateStr": now.strftime("%d %b %Y %H:%M")
+    }
+    if radiologist_id is None:
+        radiologist_id = radiologist_of(doc_cache.get("Patients", patient_id) or {})
+        scan["RadiologistID"] = f"/Radiologists/{radiologist_id}" if radiologist_id else None
+    if cached_mask:
+        from models.masks import measure
+        scan["Measurements"] = measure(cached_mask, cam)
+    case_snap = db.collection("Cases").document(case_id).get() if case_id else None
+    case = (case_snap.to_dict() or {}) if case_snap is not None and case_snap.exists else None
+
+    # a job re-run after a crash reuses its preassigned scan id; if the first
+    # run got as far as the commit, the scan is already saved and counted
+    if preassigned and scan_ref.get().exists:
+        return _upload_result(scan_id, scan, rel_mask, cached)
+
+    # the scan, its counters and its case's summary are committed together
+    batch = db.batch()
+    batch.set(scan_ref, scan)
+    record_scan(db, radiologist_id, scan, batch=batch)
+    record_added(db, case_id, [scan], case=case, batch=batch)
+    if cached_mask:
+        record_points(db, case_id, {scan_id: series_point(scan, scan["Measurements"])}, batch=batch)
+    batch.commit()
+
+    db.collection("Patients").document(patient_id).update({"LastMRIDate": now.strftime("%Y-%m-%d")})
+    doc_cache.invalidate("Patients", patient_id)
+    patient_index.update(patient_id, {"LastMRIDate": now.strftime("%Y-%m-%d")})
+
+    return _upload_result(scan_id, scan, rel_mask, cached)
+
+
+def _upload_result(scan_id, scan, rel_mask, cached):
+    return {
+        "status": "success",
+        "scan_id": scan_id,
+        "original": scan["MRIFilePath"],
+        "mask": rel_mask,
+        "gradcam": scan["GradCAMPath"],
+        "tumor_type": scan["ClassificationResult"],
+        "confidence": scan["ConfidenceScore"],
+        "description": scan["QuickDescription"],
+        "measurements": scan.get("Measurements"),
+        "cached": bool(cached)
+    }
+
+
+SEGMENT_MODES = ("fast", "tiled")
+
+
+def _segment_scan(scan_id, data, model_timeout=MODEL_WAIT_SECONDS, mode="fast"):
+    """Segment a stored scan and record its compact mask and measurements.
+
+    `mode` is "fast" (resize to 512x512) or "tiled" (overlapping tiles at
+    native resolution). The scan's measurements (mask statistics plus the
+    mean Grad-CAM intensity inside the tumour) are stored on the scan and
+    added to its case's time series. Returns (mask URL path, info about the
+    run); info includes the measurements.
+    """
+    mri_fs_path = media.local_path(data["MRIFilePath"])
+    upload_writer.wait_for(mri_fs_path)
+    raw = None
+    digest = data.get("ContentHash")
+    if not digest:
+        with open(mri_fs_path, "rb") as f:
+            raw = f.read()
+        digest = content_hash(raw)
+    cache_key = _segmenter_cache_key(digest, mode)
+    cached = result_cache.get(cache_key)
+    if cached:
+        info = {"mode": mode, "cached": True}
+    else:
+        seg_model, seg_scheduler = model_registry.get("segmentation", timeout=model_timeout)
+        from models.segmentation_model import segment_image, segment_image_tiled
+        from models.preprocessing import load_image
+
+        # usually still decoded in memory from the /analyze_mri call
+        img = load_image(digest, data=raw, path=mri_fs_path)
+        with span("segment"):
+            if mode == "tiled":
+                cached, info = segment_image_tiled(seg_model, img)
+            else:
+                started = time.perf_counter()
+                cached = segment_image(seg_model, img, scheduler=seg_scheduler)
+                info = {"mode": "fast", "tiles": 1, "seconds": round(time.perf_counter() - started, 3)}
+        result_cache.put(cache_key, cached)
+
+    from models.masks import mask_url, measure
+    rel_mask = mask_url(scan_id, cached["mask"])
+    measurements = measure(cached, data.get("GradCAMMap"))
+    info["measurements"] = measurements
+    db.collection("MRI_Scans").document(scan_id).update({
+        "SegmentationMaskPath": rel_mask,
+        "SegmentationMask": cached["mask"],
+        "MaskStats": cached["stats"],
+        "Measurements": measurements,
+        "LastUpdate": datetime.now()
+    })
+    record_points(db, case_ref_id(data.get("CaseID")), {scan_id: series_point(data, measurements)})
+    return rel_mask, info
+
+
+def _analysis_job(params, progress):
+    # the upload is in the media store before the job is queued, so a job
+    # resumed or re-run after a crash still finds it
+    path = media.local_path(params["media_url"]) if "media_url" in params else params["upload_path"]
+    with open(path, "rb") as f:
+        data = f.read()
+    result = _analyze_upload(
+        data, path, params["patient_id"], params["case_id"],
+        scan_id=params["scan_id"], radiologist_id=params.get("radiologist_id"),
+        model_timeout=None, progress=progress
+    )
+    if params.get("segment") and not result["mask"] and result["tumor_type"] != "no_tumor":
+        progress("segmenting", 80)
+        scan = db.collection("MRI_Scans").document(result["scan_id"]).get().to_dict() or {}
+        result["mask"], _ = _segment_scan(
+            result["scan_id"], scan, model_timeout=None, mode=params.get("segment_mode", "fast")
+        )
+    return result
+
+
+def _ingest_job(params, progress):
+    cls_model, cls_scheduler = model_registry.get("classifier")
+    seg_model = seg_scheduler = None
+    if params.get("segment", True):
+        seg_model, seg_scheduler = model_registry.get("segmentation")
+    result = ingest_study(
+        db, cls_model, seg_model, params["paths"], params["patient_id"], params["case_id"],
+        radiologist_id=params.get("radiologist_id"), segment=params.get("segment", True),
+        cls_scheduler=cls_scheduler, seg_scheduler=seg_scheduler, progress=progress
+    )
+    doc_cache.invalidate("Patients", params["patient_id"])
+    patient_index.reload(params["patient_id"])
+    return result
+
+
+def _delete_patient_job(params, progress):
+    result = cascade.delete_patient(db, params["patient_id"], progress=progress)
+    doc_cache.invalidate("Patients", params["patient_id"])
+    forget_patient_name(params["patient_id"])
+    patient_index.remove(params["patient_id"])
+    return result
+
+
+def _delete_case_job(params, progress):
+    return cascade.delete_case(db, params["case_id"], radiologist_id=params.get("radiologist_id"), progress=progress)
+
+
+# Deletes run as jobs (shared/cascade.py) so they report progress and are
+# resumed after a restart; requests wait DELETE_WAIT_SECONDS for them.
+DELETE_WAIT_SECONDS = float(os.environ.get("DELETE_WAIT_SECONDS", 3))
+
+# Uploads sent to /jobs/analyze are processed here; jobs left unfinished by a
+# previous process are picked up again on startup.
+job_queue = JobQueue(
+    JobStore(os.environ.get("JOB_STORE_PATH", "cache/jobs.sqlite3")),
+    workers=int(os.environ.get("JOB_WORKERS", 2)),
+)
+job_queue.register("analyze", _analysis_job)
+job_queue.register("ingest", _ingest_job)
+job_queue.register("delete_patient", _delete_patient_job)
+job_queue.register("delete_case", _delete_case_job)
+if IS_SERVING_PROCESS:
+    job_queue.resume()
 
 
 @app.route("/analyze_mri", methods=["POST"])
@@ -732,50 +1166,114 @@ def analyze_mri():
         if not file or not patient_id:
             return jsonify({"status": "error", "message": "Missing file or patient_id"}), 400
 
-        filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-        save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(save_path)
-        rel_original = "/" + save_path.replace("\\", "/")
-
-        now = datetime.now()
-        scan_ref = db.collection("MRI_Scans").document()
-        scan_id = scan_ref.id
-
-        tumor_type, confidence = classify_image(cls_model, save_path)
-        gradcam_path, pred_idx = generate_gradcam(cls_model, save_path, save_name=f"gradcam_{scan_id}.png")
-        rel_gradcam = "/" + gradcam_path.replace("\\", "/")
-
-        scan_ref.set({
-            "ScanID": scan_id,
-            "PatientID": f"/Patients/{patient_id}",
-            "CaseID": f"/Cases/{case_id}",
-            "MRIFilePath": rel_original,
-            "SegmentationMaskPath": None,
-            "GradCAMPath": rel_gradcam,
-            "ClassificationResult": tumor_type,
-            "ConfidenceScore": confidence,
-            "QuickDescription": f"Detected {tumor_type} with {confidence:.1f}% confidence",
-            "UploadDate": now,
-            "UploadDateStr": now.strftime("%d %b %Y %H:%M")
-        })
-
-        db.collection("Patients").document(patient_id).update({"LastMRIDate": now.strftime("%Y-%m-%d")})
-
-        return jsonify({
-            "status": "success",
-            "scan_id": scan_id,
-            "original": rel_original,
-            "mask": None,
-            "gradcam": rel_gradcam,
-            "tumor_type": tumor_type,
-            "confidence": confidence,
-            "description": f"Detected {tumor_type} with {confidence:.1f}% confidence"
-        }), 200
+        with span("upload.read"):
+            data = file.read()
+        try:
+            result = _analyze_upload(
+                data, file.filename, patient_id, case_id,
+                radiologist_id=session.get("radiologist_id")
+            )
+        except ModelNotReady as e:
+            return _warming_up_response(e)
+        return jsonify(result), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@app.route("/jobs/analyze", methods=["POST"])
+def submit_analysis_job():
+    _require_session()
+    file = request.files.get("file")
+    patient_id = request.form.get("patient_id", "")
+    case_id = request.form.get("case_id", "")
+
+    if not file or not patient_id:
+        return jsonify({"status": "error", "message": "Missing file or patient_id"}), 400
+    segment_mode = request.form.get("segment_mode", "fast")
+    if segment_mode not in SEGMENT_MODES:
+        return jsonify({"status": "error", "message": "segment_mode must be 'fast' or 'tiled'"}), 400
+    patient = doc_cache.get("Patients", patient_id)
+    if patient is None or radiologist_of(patient) != session["radiologist_id"]:
+        return jsonify({"status": "error", "message": "Patient not found"}), 404
+
+    data = file.read()
+    media_url = media.put(data, os.path.splitext(file.filename)[1])
+
+    job_id = job_queue.submit("analyze", {
+        "media_url": media_url,
+        "patient_id": patient_id,
+        "case_id": case_id,
+        "scan_id": db.collection("MRI_Scans").document().id,
+        "radiologist_id": session["radiologist_id"],
+        "segment": request.form.get("segment") == "1",
+        "segment_mode": segment_mode,
+    })
+    return jsonify({"status": "queued", "job_id": job_id, "poll": url_for("job_status", job_id=job_id)}), 202
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    _require_session()
+    job = job_queue.store.get(job_id)
+    # other radiologists' jobs are reported as missing, not forbidden
+    if not job or job["params"].get("radiologist_id") != session["radiologist_id"]:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    job.pop("params", None)
+    return jsonify(job), 200
+
+
+@app.route("/patients/<patient_id>/cases/<case_id>/ingest", methods=["POST"])
+def ingest_case_study(patient_id, case_id):
+    doctor = _get_logged_doctor()
+    if not doctor:
+        return jsonify({"status": "error", "message": "Not logged in"}), 403
+
+    patient = doc_cache.get("Patients", patient_id)
+    if patient is None:
+        return jsonify({"status": "error", "message": "Patient not found"}), 404
+    if patient.get("CreatedBy") != f"/Radiologists/{doctor['id']}":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+    case_snap = db.collection("Cases").document(case_id).get()
+    if not case_snap.exists or (case_snap.to_dict() or {}).get("PatientID") != f"/Patients/{patient_id}":
+        return jsonify({"status": "error", "message": "Case not found"}), 404
+
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    paths = []
+    for f in request.files.getlist("files"):
+        if f and is_image(f.filename):
+            path = os.path.join(upload_folder, f"{case_id}_{stamp}_{os.path.basename(f.filename)}")
+            f.save(path)
+            paths.append(path)
+
+    archive = request.files.get("archive")
+    if archive and archive.filename:
+        zip_path = os.path.join(upload_folder, f"{case_id}_{stamp}.zip")
+        archive.save(zip_path)
+        try:
+            paths += extract_zip(zip_path, upload_folder, prefix=f"{case_id}_{stamp}_")
+        finally:
+            os.remove(zip_path)
+
+    if not paths:
+        return jsonify({"status": "error", "message": "No image slices uploaded"}), 400
+
+    job_id = job_queue.submit("ingest", {
+        "paths": paths,
+        "patient_id": patient_id,
+        "case_id": case_id,
+        "radiologist_id": doctor["id"],
+        "segment": request.form.get("segment", "1") == "1",
+    })
+    return jsonify({
+        "status": "queued",
+        "job_id": job_id,
+        "count": len(paths),
+        "poll": url_for("job_status", job_id=job_id)
+    }), 202
+
+
 @app.route("/segment_only", methods=["POST"])
 def segment_only():
     try:
@@ -789,58 +1287,131 @@ def segment_only():
             return jsonify({"status": "error", "message": "Scan not found"}), 404
 
         data = snap.to_dict() or {}
-        mri_path = data.get("MRIFilePath")
-        if not mri_path:
+        if not data.get("MRIFilePath"):
             return jsonify({"status": "error", "message": "Missing MRIFilePath"}), 400
 
-        mri_fs_path = mri_path.lstrip("/")
-        mask_path = segment_image(seg_model, mri_fs_path, scan_id=scan_id)
-        rel_mask = "/" + mask_path.replace("\\", "/")
+        mode = request.form.get("mode", "fast")
+        if mode not in SEGMENT_MODES:
+            return jsonify({"status": "error", "message": "mode must be 'fast' or 'tiled'"}), 400
 
-        scan_ref.update({"SegmentationMaskPath": rel_mask, "LastUpdate": datetime.now()})
+        try:
+            rel_mask, info = _segment_scan(scan_id, data, mode=mode)
+        except ModelNotReady as e:
+            return _warming_up_response(e)
 
-        return jsonify({"status": "success", "mask": rel_mask}), 200
+        return jsonify({"status": "success", "mask": rel_mask, "segmentation": info}), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-@app.route("/delete_patient/<patient_id>", methods=["POST"])
-def delete_patient(patient_id):
-
-    patient_ref = db.collection("Patients").document(patient_id)
-    patient_ref.delete()
-
-    cases_ref = db.collection("Cases").where("PatientID", "==", patient_id).stream()
-
-    for case in cases_ref:
-        case_id = case.id
-
-        scans_ref = db.collection("MRI_Scans").where("CaseID", "==", case_id).stream()
-
-        for scan in scans_ref:
-            scan_data = scan.to_dict()
-
-            paths = [
-                scan_data.get("MRIFilePath"),
-                scan_data.get("GradCAMPath"),
-                scan_data.get("SegmentationMaskPath"),
-            ]
+# Masks live in the scan record (models/masks.py); PNGs are rendered on the
+# first request and kept under media.MASK_RENDER_DIR, named after the mask
+# version, outside static/ so only the session-checked routes serve them.
+MASK_RENDER_DIR = media.MASK_RENDER_DIR
+
+
+def _require_session():
+    """Scan images are patient data: only logged-in radiologists may fetch them."""
+    if not session.get("radiologist_id"):
+        abort(401)
+
+
+def _render_mask_image(scan_id, kind, render):
+    _require_session()
+    requested = request.args.get("v", "")
+    version = requested
+    path = os.path.join(MASK_RENDER_DIR, f"{kind}_{scan_id}_{version}.png")
+    if not version or not os.path.exists(path):
+        from models.masks import decode, version as mask_version
+
+        snap = db.collection("MRI_Scans").document(scan_id).get()
+        scan = (snap.to_dict() or {}) if snap.exists else {}
+        encoded = scan.get("SegmentationMask")
+        if not encoded:
+            abort(404)
+        version = mask_version(encoded)
+        path = os.path.join(MASK_RENDER_DIR, f"{kind}_{scan_id}_{version}.png")
+        if not os.path.exists(path):
+            media.write_atomic(path, render(scan, decode(encoded)))
+    # ?v= names one mask version, so only then can the response be cached for good
+    return media.send_media(path, etag=f"{kind}-{version}", immutable=requested == version)
+
+
+def _mask_overlay_png(scan, mask):
+    import numpy as np
+    from models.masks import render_overlay
+    from models.preprocessing import load_image
+
+    original = media.local_path(scan["MRIFilePath"])
+    upload_writer.wait_for(original)
+    img = load_image(scan.get("ContentHash") or original, path=original)
+    return render_overlay(mask, np.asarray(img))
+
+
+@app.route("/media/<name>")
+def media_file(name):
+    _require_session()
+    if not media.is_media_name(name):
+        abort(404)
+    path = media.media_path(name)
+    if not _file_ready(path):
+        abort(404)
+    return media.send_media(path, etag=name.split(".")[0])
+
+
+@app.route("/media/thumbs/<int:size>/<name>")
+def media_thumbnail(name, size):
+    _require_session()
+    if not media.is_media_name(name) or size not in media.THUMB_SIZES:
+        abort(404)
+    upload_writer.wait_for(media.media_path(name))
+    path = media.thumbnail_path(name, size)
+    if path is None:
+        abort(404)
+    return media.send_media(path, etag=f"{name.split('.')[0]}-{size}")
+
+
+@app.route("/scans/<scan_id>/mask.png")
+def scan_mask(scan_id):
+    from models.masks import render_png
+    return _render_mask_image(scan_id, "mask", lambda scan, mask: render_png(mask))
+
+
+@app.route("/scans/<scan_id>/mask_overlay.png")
+def scan_mask_overlay(scan_id):
+    return _render_mask_image(scan_id, "overlay", _mask_overlay_png)
+
+
+def _deletion_response(job_id, what, redirect_to):
+    """Wait briefly so small deletes finish within the request; larger ones carry on as a job."""
+    job = job_queue.wait(job_id, DELETE_WAIT_SECONDS)
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return jsonify({"status": job["status"], "job_id": job_id, "poll": url_for("job_status", job_id=job_id)}), 202
+    if job["status"] == "done":
+        flash(f"{what} deleted successfully.", "success")
+    elif job["status"] == "failed":
+        flash(f"{what} was only partly deleted ({job['error']}); delete it again to finish.", "error")
+    else:
+        flash(f"{what} is being deleted ({job['progress']}% done).", "success")
+    return redirect(redirect_to)
 
-            for p in paths:
-                if p:
-                    try:
-                        bucket = storage.bucket()
-                        blob = bucket.blob(p.replace("/storage/", ""))
-                        blob.delete()
-                    except Exception:
-                        pass
 
-            db.collection("MRI_Scans").document(scan.id).delete()
+@app.route("/delete_patient/<patient_id>", methods=["POST"])
+def delete_patient(patient_id):
+    doctor = _get_logged_doctor()
+    if not doctor:
+        return redirect(url_for("register_login"))
 
-        db.collection("Cases").document(case_id).delete()
+    # the patient document is deleted last, so a delete that failed part-way
+    # can still be retried; scans and cases without one are not ours to remove
+    patient = doc_cache.get("Patients", patient_id)
+    if patient is None:
+        return "Patient not found", 404
+    if patient.get("CreatedBy") != f"/Radiologists/{doctor['id']}":
+        return "Unauthorized", 403
 
-    flash("Patient deleted successfully.", "success")
-    return redirect(url_for("patients"))
+    job_id = job_queue.submit("delete_patient", {"patient_id": patient_id, "radiologist_id": doctor["id"]})
+    return _deletion_response(job_id, "Patient", url_for("patients"))
 
 
 @app.route("/patients/<patient_id>/cases/<case_id>/delete", methods=["POST"])
@@ -849,57 +1420,53 @@ def delete_case(patient_id, case_id):
     if not doctor:
         return redirect(url_for("register_login"))
 
-    case_ref = db.collection("Cases").document(case_id)
-    case_snap = case_ref.get()
-
+    case_snap = db.collection("Cases").document(case_id).get()
     if not case_snap.exists:
         return "Case not found", 404
 
     case_data = case_snap.to_dict()
     if case_data.get("PatientID") != f"/Patients/{patient_id}":
         return "Unauthorized", 403
+    patient = doc_cache.get("Patients", patient_id)
+    if patient is None:
+        return "Patient not found", 404
+    owner = radiologist_of(patient)
+    if owner != doctor["id"]:
+        return "Unauthorized", 403
 
-    scans_to_delete = db.collection("MRI_Scans").where("CaseID", "==", f"/Cases/{case_id}").stream()
-    for s in scans_to_delete:
-        s.reference.delete()
-
-    case_ref.delete()
-    return redirect(url_for("patient_profile", patient_id=patient_id))
+    job_id = job_queue.submit("delete_case", {"case_id": case_id, "radiologist_id": owner})
+    return _deletion_response(job_id, "Case", url_for("patient_profile", patient_id=patient_id))
 
 
 @app.route("/load_more_scans")
 def load_more_scans():
-    offset = int(request.args.get("offset", 0))
-    scans_query = db.collection("MRI_Scans").stream()
-
-    scans_list = []
-    for s in scans_query:
-        sd = s.to_dict()
-        upload_date = sd.get("UploadDate")
-        patient_ref = sd.get("PatientID")
+    doctor = _get_logged_doctor()
+    if not doctor:
+        return jsonify({"status": "error", "message": "Not logged in"}), 403
 
-        if isinstance(patient_ref, str):
-            patient_id = patient_ref.split("/")[-1]
-        elif hasattr(patient_ref, "id"):
-            patient_id = patient_ref.id
-        else:
-            patient_id = None
+    cursor = request.args.get("cursor") or None
+    try:
+        limit = max(1, min(int(request.args.get("limit", 5)), 50))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid limit"}), 400
+    try:
+        scans_page_docs, next_cursor = scans_page(db, doctor["id"], cursor=cursor, limit=limit)
+    except (ValueError, KeyError):
+        return jsonify({"status": "error", "message": "Invalid cursor"}), 400
 
-        pdata = {}
-        if patient_id:
-            patient_doc = db.collection("Patients").document(patient_id).get()
-            pdata = patient_doc.to_dict() if patient_doc.exists else {}
+    scans_data = [(s.id, s.to_dict() or {}) for s in scans_page_docs]
+    names = patient_names(db, filter(None, (patient_ref_id(sd.get("PatientID")) for _, sd in scans_data)))
 
-        scans_list.append({
-            "id": s.id,
-            "FullName": pdata.get("FullName", ""),
+    more = []
+    for scan_id, sd in scans_data:
+        upload_date = sd.get("UploadDate")
+        more.append({
+            "id": scan_id,
+            "FullName": names.get(patient_ref_id(sd.get("PatientID")), ""),
             "UploadDate": upload_date.strftime("%Y-%m-%d %H:%M") if hasattr(upload_date, "strftime") else "",
         })
 
-    scans_list = sorted(scans_list, key=lambda x: x["UploadDate"], reverse=True)
-    more = scans_list[offset: offset + 5]
-
-    return jsonify({"scans": more, "count": len(more)})
+    return jsonify({"scans": more, "count": len(more), "next": next_cursor})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+"""Fire N concurrent /analyze_mri uploads at a running server and report throughput.
+
+Run the server twice to compare the batched and per-request paths:
+
+    INFERENCE_BATCHING=1 python app.py
+    INFERENCE_BATCHING=0 python app.py
+
+then for each:
+
+    python benchmarks/bench_analyze_concurrency.py path/to/scan.jpg --patient-id <id> -n 32 -c 8
+
+Uploads are content-hashed and cached (shared/result_cache.py), so every
+request gets its own copy of the image with a few pixels changed and runs
+the models. --same-image sends identical bytes to measure the cache-hit path
+instead.
+"""
+import argparse
+import io
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+
+def variants(image_bytes, n):
+    """`n` copies of the image, each with its index written into the first pixels."""
+    img = Image.open(io.BytesIO(image_bytes))
+    fmt = img.format or "PNG"
+    img = img.convert("RGB")
+    out = []
+    for i in range(n):
+        copy = img.copy()
+        for j, byte in enumerate(i.to_bytes(4, "big")):
+            copy.putpixel((j, 0), (byte, byte, byte))
+        buf = io.BytesIO()
+        # lossless, so the changed pixels survive encoding
+        copy.save(buf, format="PNG" if fmt == "JPEG" else fmt)
+        out.append(buf.getvalue())
+    return out
+
+
+def upload(base_url, image_bytes, filename, patient_id, case_id):
+    started = time.perf_counter()
+    resp = requests.post(
+        f"{base_url}/analyze_mri",
+        files={"file": (filename, image_bytes)},
+        data={"patient_id": patient_id, "case_id": case_id},
+    )
+    return resp.status_code, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("image")
+    parser.add_argument("--patient-id", required=True)
+    parser.add_argument("--case-id", default="bench")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("-n", "--requests", type=int, default=32)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--same-image", action="store_true", help="upload identical bytes (result-cache hits)")
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+    if args.same_image:
+        uploads = [image_bytes] * args.requests
+        filename = os.path.basename(args.image)
+    else:
+        uploads = variants(image_bytes, args.requests)
+        stem, ext = os.path.splitext(os.path.basename(args.image))
+        filename = stem + (".png" if ext.lower() in (".jpg", ".jpeg") else ext)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(
+            lambda data: upload(args.url, data, filename, args.patient_id, args.case_id),
+            uploads,
+        ))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(t for _, t in results)
+    failures = sum(1 for code, _ in results if code != 200)
+    print(f"requests:    {args.requests} (concurrency {args.concurrency}, {failures} failed)")
+    print(f"throughput:  {args.requests / elapsed:.2f} req/s")
+    print(f"latency p50: {statistics.median(latencies) * 1000:.0f} ms")
+    print(f"latency p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+
+    stats = requests.get(f"{args.url}/inference_stats").json()
+    print("server:", stats)
+
+
+if __name__ == "__main__":
+    main()
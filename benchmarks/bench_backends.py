@@ -0,0 +1,80 @@
+"""CPU latency and memory of the eager, ONNX Runtime and TorchScript backends.
+
+Export first with `python -m models.export --format onnx` (and/or torchscript),
+then run:
+
+    python benchmarks/bench_backends.py -n 20
+
+Each backend runs in its own process so peak RSS is measured separately.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _time(fn, x, n):
+    fn(x)  # warm-up
+    times = []
+    for _ in range(n):
+        started = time.perf_counter()
+        fn(x)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def run_one(backend, n):
+    import torch
+    from models.classification_model import load_classifier_model, cam_forward
+    from models.segmentation_model import load_segmentation_model, seg_forward
+
+    cls_model = load_classifier_model(backend=backend)
+    seg_model = load_segmentation_model(backend=backend)
+
+    return {
+        "backend": backend,
+        "classifier_ms": _time(lambda x: cam_forward(cls_model, x), torch.randn(1, 3, 224, 224), n),
+        "segmentation_ms": _time(lambda x: seg_forward(seg_model, x), torch.rand(1, 3, 512, 512), n),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=20)
+    parser.add_argument("--backends", default="eager,onnx,torchscript")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_one(args.worker, args.n)))
+        return
+
+    print(f"{'backend':12s} {'classifier':>12s} {'segmentation':>14s} {'peak RSS':>10s}")
+    for backend in args.backends.split(","):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", backend, "-n", str(args.n)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{backend:12s} failed: {proc.stderr.strip().splitlines()[-1]}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{backend:12s} {r['classifier_ms']:10.1f}ms {r['segmentation_ms']:12.1f}ms "
+              f"{r['peak_rss_mb']:8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
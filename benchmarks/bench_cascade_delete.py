@@ -0,0 +1,117 @@
+"""Delete a patient with thousands of scans: one-by-one deletes vs shared/cascade.py.
+
+Needs a local Firestore emulator:
+
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=127.0.0.1:8080 python benchmarks/bench_cascade_delete.py --scans 5000
+
+Each run seeds one patient with --cases cases and --scans scans, each scan
+with an original, a Grad-CAM overlay and a rendered mask on disk (in a
+temporary MEDIA_DIR), then deletes everything.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RADIOLOGIST_ID = "bench-radiologist"
+
+
+def seed(db, media, patient_id, n_cases, n_scans, mask_dir):
+    from shared.queries import chunked
+
+    now = datetime.now()
+    db.collection("Patients").document(patient_id).set({
+        "FullName": "Bench Patient", "CreatedBy": f"/Radiologists/{RADIOLOGIST_ID}",
+    })
+    cases = [f"{patient_id}-c{i}" for i in range(n_cases)]
+    for case_id in cases:
+        db.collection("Cases").document(case_id).set({"PatientID": f"/Patients/{patient_id}"})
+
+    os.makedirs(mask_dir, exist_ok=True)
+    for chunk in chunked(range(n_scans), 500):
+        batch = db.batch()
+        for i in chunk:
+            scan_id = f"{patient_id}-s{i}"
+            original = media.put(f"original {scan_id}".encode(), ".png")
+            gradcam = media.put(f"gradcam {scan_id}".encode(), ".png")
+            version = hashlib.sha1(scan_id.encode()).hexdigest()[:12]
+            with open(os.path.join(mask_dir, f"mask_{scan_id}_{version}.png"), "wb") as f:
+                f.write(b"mask")
+            batch.set(db.collection("MRI_Scans").document(scan_id), {
+                "PatientID": f"/Patients/{patient_id}",
+                "CaseID": f"/Cases/{cases[i % n_cases]}",
+                "MRIFilePath": original,
+                "GradCAMPath": gradcam,
+                "SegmentationMaskPath": f"/scans/{scan_id}/mask.png",
+                "ClassificationResult": "glioma",
+                "ConfidenceScore": 90.0,
+                "UploadDate": now - timedelta(minutes=i),
+            })
+        batch.commit()
+
+
+def one_by_one(db, media, patient_id, mask_dir):
+    """The old route: a query per case, a delete per scan and per file."""
+    import glob
+
+    for case in db.collection("Cases").where("PatientID", "==", f"/Patients/{patient_id}").stream():
+        for scan in db.collection("MRI_Scans").where("CaseID", "==", f"/Cases/{case.id}").stream():
+            sd = scan.to_dict()
+            for url in (sd.get("MRIFilePath"), sd.get("GradCAMPath")):
+                try:
+                    os.remove(media.local_path(url))
+                except FileNotFoundError:
+                    pass
+            for path in glob.glob(os.path.join(mask_dir, f"*_{scan.id}_*.png")):
+                os.remove(path)
+            scan.reference.delete()
+        case.reference.delete()
+    db.collection("Patients").document(patient_id).delete()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type=int, default=10)
+    parser.add_argument("--scans", type=int, default=3000)
+    parser.add_argument("--file-workers", type=int, default=8)
+    args = parser.parse_args()
+
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("Set FIRESTORE_EMULATOR_HOST to point at a Firestore emulator")
+
+    workdir = tempfile.mkdtemp(prefix="bench-cascade-")
+    os.chdir(workdir)
+    os.environ["MEDIA_DIR"] = "media"
+
+    from google.cloud import firestore
+    from shared import cascade, media
+
+    db = firestore.Client(project="demo-brainalyze")
+    mask_dir = cascade.MASK_RENDER_DIR
+
+    print(f"{args.scans} scans in {args.cases} cases, 3 files per scan")
+    for name in ("one-by-one", "cascade"):
+        patient_id = f"bench-delete-{name}"
+        seed(db, media, patient_id, args.cases, args.scans, mask_dir)
+        started = time.perf_counter()
+        if name == "cascade":
+            cascade.delete_patient(db, patient_id, file_workers=args.file_workers)
+        else:
+            one_by_one(db, media, patient_id, mask_dir)
+        elapsed = time.perf_counter() - started
+
+        left = len(list(db.collection("MRI_Scans").where("PatientID", "==", f"/Patients/{patient_id}").stream()))
+        files = sum(len(f) for _, _, f in os.walk(workdir))
+        print(f"{name:12s} {elapsed:8.2f}s  {args.scans / elapsed:8.0f} scans/s  "
+              f"{left} scans and {files} files left")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Milliseconds per Grad-CAM: the previous NumPy/cv2 path against models/gradcam.py.
+
+Uses randomly initialised weights, so no checkpoint is needed:
+
+    python benchmarks/bench_gradcam.py -n 20 --size 512
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.classification_model import EfficientNetB1_Classifier, preprocess_pil  # noqa: E402
+from models.gradcam import grad_cam, pil_to_tensor, render_overlay  # noqa: E402
+
+
+def legacy_cam(model, img):
+    """The hook-based Grad-CAM the classifier used before the torch engine, minus the file write."""
+    x = preprocess_pil(img)
+    x.requires_grad_(True)
+    feats, grads = [], []
+    fh = model.model.conv_head.register_forward_hook(lambda m, i, o: feats.append(o))
+    bh = model.model.conv_head.register_full_backward_hook(lambda m, gi, go: grads.append(go[0]))
+    logits = model(x)
+    pred = logits.argmax(1).item()
+    model.zero_grad()
+    logits[0, pred].backward()
+    fh.remove()
+    bh.remove()
+
+    fmap = feats[0].detach().cpu().numpy()[0]
+    g = grads[0].detach().cpu().numpy()[0]
+    weights = g.mean(axis=(1, 2))
+    cam = np.maximum(np.sum(weights[:, None, None] * fmap, axis=0), 0)
+    cam /= (cam.max() + 1e-8)
+    cam = cv2.resize(cam, img.size)
+    heatmap = cv2.applyColorMap(np.uint8(cam * 255), cv2.COLORMAP_JET)
+    original = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+    return cv2.addWeighted(original, 0.5, heatmap, 0.5, 0)
+
+
+def engine_cams(model, imgs, classes=None):
+    x = torch.cat([preprocess_pil(img) for img in imgs])
+    _, cams = grad_cam(model, x, model.model.conv_head, classes=classes)
+    for img, img_cams in zip(imgs, cams):
+        pixels = pil_to_tensor(img)
+        for cam in img_cams:
+            render_overlay(cam, pixels)
+    return cams.shape[0] * cams.shape[1]
+
+
+def bench(label, fn, n):
+    fn()  # warm-up
+    started = time.perf_counter()
+    count = 0
+    for _ in range(n):
+        count += fn() or 1
+    print(f"{label:34s} {(time.perf_counter() - started) / count * 1000:8.1f} ms per CAM")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=20)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--batch", type=int, default=8)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    model = EfficientNetB1_Classifier(num_classes=4).eval()
+    rng = np.random.default_rng(0)
+    img = Image.fromarray(rng.integers(0, 255, (args.size, args.size, 3), dtype=np.uint8))
+    imgs = [img] * args.batch
+
+    bench("legacy (numpy + cv2)", lambda: legacy_cam(model, img) is not None and 1, args.n)
+    bench("engine, 1 image", lambda: engine_cams(model, [img]), args.n)
+    bench(f"engine, batch of {args.batch}", lambda: engine_cams(model, imgs), args.n)
+    bench(f"engine, batch of {args.batch}, all classes", lambda: engine_cams(model, imgs, "all"), args.n)
+
+
+if __name__ == "__main__":
+    main()
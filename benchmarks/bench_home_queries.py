@@ -0,0 +1,88 @@
+"""Compare the old per-patient scan queries of /home with the batched "in" queries.
+
+Needs a local Firestore emulator:
+
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=127.0.0.1:8080 python benchmarks/bench_home_queries.py --seed
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from google.cloud import firestore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.datastore import CountingClient  # noqa: E402
+from shared.queries import chunked, patients_for_radiologist, scans_for_patients  # noqa: E402
+
+RADIOLOGIST_ID = "bench-radiologist"
+
+
+def seed(db, n_patients, n_scans):
+    patients = [f"bench-p{i}" for i in range(n_patients)]
+    now = datetime.now()
+    for chunk in chunked(patients, 500):
+        batch = db.batch()
+        for pid in chunk:
+            batch.set(db.collection("Patients").document(pid), {
+                "FullName": f"Patient {pid}",
+                "CreatedBy": f"/Radiologists/{RADIOLOGIST_ID}",
+                "CreatedAt": now.strftime("%Y-%m-%d %H:%M:%S"),
+            })
+        batch.commit()
+    for chunk in chunked(range(n_scans), 500):
+        batch = db.batch()
+        for i in chunk:
+            batch.set(db.collection("MRI_Scans").document(f"bench-s{i}"), {
+                "PatientID": f"/Patients/{random.choice(patients)}",
+                "UploadDate": now - timedelta(minutes=i),
+            })
+        batch.commit()
+
+
+def per_patient(db, patients):
+    reads = queries = 0
+    for p in patients:
+        scans = list(db.collection("MRI_Scans").where("PatientID", "==", f"/Patients/{p.id}").stream())
+        queries += 1
+        reads += max(len(scans), 1)
+    return reads, queries
+
+
+def batched(db, patients):
+    # counted like per_patient: one read per document, or one for an empty query
+    counted = CountingClient(db)
+    scans_for_patients(counted, [p.id for p in patients])
+    return counted.counter.totals["reads"], len(list(chunked(patients)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", action="store_true")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--scans", type=int, default=10000)
+    args = parser.parse_args()
+
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("Set FIRESTORE_EMULATOR_HOST to point at a Firestore emulator")
+
+    db = firestore.Client(project="demo-brainalyze")
+    if args.seed:
+        seed(db, args.patients, args.scans)
+
+    patients = patients_for_radiologist(db, RADIOLOGIST_ID)
+    print(f"{len(patients)} patients")
+
+    for name, fn in (("per-patient", per_patient), ("batched in", batched)):
+        started = time.perf_counter()
+        reads, queries = fn(db, patients)
+        elapsed = time.perf_counter() - started
+        # each query costs at least one read even when it returns nothing
+        print(f"{name:12s} {queries:6d} queries  {reads:7d} reads  {elapsed * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Request-path latency of handling an upload before inference starts.
+
+"disk" is the previous flow (save the upload, then decode it from disk);
+"memory" decodes the bytes directly and hands the write to BackgroundWriter.
+
+    python benchmarks/bench_upload_path.py path/to/scan.jpg -n 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.preprocessing import decode, open_rgb  # noqa: E402
+from shared.writer import BackgroundWriter  # noqa: E402
+
+
+def disk_path(data, path, writer):
+    with open(path, "wb") as f:
+        f.write(data)
+    open_rgb(path).load()
+
+
+def memory_path(data, path, writer):
+    writer.write(path, data)
+    decode(data).load()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("image")
+    parser.add_argument("-n", type=int, default=50)
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        data = f.read()
+    writer = BackgroundWriter()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, fn in (("disk (save + reopen)", disk_path), ("memory + background write", memory_path)):
+            times = []
+            for i in range(args.n):
+                path = os.path.join(tmp, f"{label[:4]}_{i}.img")
+                started = time.perf_counter()
+                fn(data, path, writer)
+                times.append((time.perf_counter() - started) * 1000)
+            writer.flush()
+            times.sort()
+            print(f"{label:28s} p50 {statistics.median(times):7.2f} ms   "
+                  f"p95 {times[int(len(times) * 0.95) - 1]:7.2f} ms")
+
+    print("writer:", writer.stats())
+
+
+if __name__ == "__main__":
+    main()
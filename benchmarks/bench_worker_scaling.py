@@ -0,0 +1,119 @@
+"""Inference throughput against the number of worker processes.
+
+    python benchmarks/bench_worker_scaling.py --workers 0,1,2,4 -n 64 --clients 16
+
+"0 workers" is the in-process baseline (both models in this process, one
+forward at a time as under the single-threaded batch scheduler). For N > 0 an
+InferencePool with N workers is started; `--clients` threads then each send
+classifier and segmentation requests until `-n` of each are done.
+Threads per worker default to cores / N (override with --threads).
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _drive(call, n, clients):
+    import torch
+
+    cls_x = torch.randn(1, 3, 224, 224)
+    seg_x = torch.rand(1, 3, 512, 512)
+    counter = iter(range(n))
+    lock = threading.Lock()
+    latencies = []
+
+    def client():
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            started = time.perf_counter()
+            call("classify", cls_x)
+            call("segment", seg_x)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    call("classify", cls_x)  # warm-up
+    call("segment", seg_x)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput": n / wall,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def run_in_process(n, clients, threads):
+    import torch
+    from models.classification_model import load_classifier_model, cam_forward
+    from models.segmentation_model import load_segmentation_model, seg_logits_forward
+
+    if threads:
+        torch.set_num_threads(threads)
+    cls_model = load_classifier_model()
+    seg_model = load_segmentation_model()
+    forward_lock = threading.Lock()
+    forwards = {
+        "classify": lambda x: cam_forward(cls_model, x),
+        "segment": lambda x: seg_logits_forward(seg_model, x),
+    }
+
+    def call(kind, x):
+        with forward_lock:
+            return forwards[kind](x)
+
+    return _drive(call, n, clients)
+
+
+def run_pool(workers, n, clients, threads, pin_cpus):
+    from models.worker_pool import InferencePool
+
+    pool = InferencePool(workers=workers, threads=threads or None, pin_cpus=pin_cpus)
+    try:
+        return _drive(lambda kind, x: pool.submit(kind, x).result(), n, clients)
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="0,1,2,4")
+    parser.add_argument("-n", type=int, default=64, help="requests (classify + segment) per run")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=0, help="torch threads per worker")
+    parser.add_argument("--pin-cpus", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.clients} clients, {args.n} requests per run")
+    print(f"{'workers':>8s} {'threads':>8s} {'req/s':>8s} {'speed-up':>9s} {'p50':>9s} {'p95':>9s}")
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        if workers == 0:
+            threads = args.threads or os.cpu_count()
+            r = run_in_process(args.n, args.clients, args.threads)
+        else:
+            threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+            r = run_pool(workers, args.n, args.clients, args.threads, args.pin_cpus)
+        baseline = baseline or r["throughput"]
+        print(f"{workers:8d} {threads:8d} {r['throughput']:8.2f} {r['throughput'] / baseline:8.2f}x "
+              f"{r['p50_ms']:7.0f}ms {r['p95_ms']:7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Load-test the main pages on the in-memory datastore at growing data sizes.
+
+    python benchmarks/loadtest.py --scales 10,100,1000 --requests 50
+    python benchmarks/loadtest.py --analyze     # also POST /analyze_mri (needs the model weights)
+
+Runs app.py with DATASTORE=memory (shared/datastore.py), seeds one
+radiologist with `scale` patients, each with 2 cases of 3 scans plus a
+report, and drives /home, /patients and /patients/<id>/profile through
+Flask's test client. /dashboard is left out: the repository ships no
+templates/dashboard.html, so that route answers 500 before it gets to the
+datastore. Every scale starts from an empty store. Prints
+p50/p95 latency and the datastore reads and writes per request, taken from
+the X-Datastore-Ops header. Uploads to /analyze_mri are random images, so
+they miss the result cache and run the models.
+
+The in-memory store answers a query by scanning its collection, so latency
+here is the app's own work plus a scan, not Firestore round trips; the
+reads and writes per request are what Firestore would bill.
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CASES_PER_PATIENT = 2
+SCANS_PER_CASE = 3
+TUMOR_TYPES = ["glioma", "meningioma", "pituitary", "no_tumor"]
+
+
+def seed(db, rid, n_patients):
+    from shared.queries import chunked
+
+    now = datetime.now()
+    db.collection("Radiologists").document(rid).set({
+        "FullName": "Load Test", "Email": "load@example.com",
+    })
+    patients = [f"{rid}-p{i}" for i in range(n_patients)]
+    for chunk in chunked(patients, 50):
+        batch = db.batch()
+        for pid in chunk:
+            tumor = random.choice(TUMOR_TYPES)
+            batch.set(db.collection("Patients").document(pid), {
+                "FullName": f"Patient {pid}",
+                "Age": random.randint(20, 80),
+                "Gender": random.choice(["Male", "Female"]),
+                "TumorType": tumor,
+                "CreatedBy": f"/Radiologists/{rid}",
+                "CreatedAt": (now - timedelta(days=random.randint(0, 400))).strftime("%Y-%m-%d %H:%M:%S"),
+            })
+            for c in range(CASES_PER_PATIENT):
+                case_id = f"{pid}-c{c}"
+                batch.set(db.collection("Cases").document(case_id), {
+                    "PatientID": f"/Patients/{pid}",
+                    "CreatedAt": now - timedelta(days=30 * (CASES_PER_PATIENT - c)),
+                    "Status": "Open",
+                })
+                for s in range(SCANS_PER_CASE):
+                    batch.set(db.collection("MRI_Scans").document(f"{case_id}-s{s}"), {
+                        "PatientID": f"/Patients/{pid}",
+                        "CaseID": f"/Cases/{case_id}",
+                        "ClassificationResult": tumor,
+                        "ConfidenceScore": round(random.uniform(60, 99), 1),
+                        "UploadDate": now - timedelta(days=random.randint(0, 400)),
+                        "MRIFilePath": f"/media/{'0' * 64}.png",
+                    })
+            batch.set(db.collection("Reports").document(f"{pid}-r"), {
+                "PatientID": f"/Patients/{pid}", "CreatedBy": f"/Radiologists/{rid}",
+            })
+        batch.commit()
+    return patients
+
+
+def random_png(size=256):
+    import numpy as np
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.fromarray(np.random.randint(0, 256, (size, size), dtype=np.uint8)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def ops_of(resp):
+    ops = dict(part.strip().split("=") for part in resp.headers.get("X-Datastore-Ops", "").split(",") if "=" in part)
+    return int(ops.get("reads", 0)), int(ops.get("writes", 0))
+
+
+def drive(client, name, make_request, n):
+    latencies, reads, writes = [], [], []
+    for i in range(n):
+        started = time.perf_counter()
+        resp = make_request(i)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"{name}: HTTP {resp.status_code}")
+        r, w = ops_of(resp)
+        reads.append(r)
+        writes.append(w)
+    return {
+        "route": name,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "reads": statistics.mean(reads),
+        "writes": statistics.mean(writes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="10,100,1000", help="patients per run, comma separated")
+    parser.add_argument("--requests", type=int, default=50, help="requests per route")
+    parser.add_argument("--analyze", action="store_true", help="also POST /analyze_mri")
+    parser.add_argument("--doc-cache-ttl", default="30")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    os.chdir(ROOT)
+    os.environ.update({
+        "DATASTORE": "memory",
+        "MODEL_WARMUP": "1" if args.analyze else "0",
+        "ASYNC_UPLOAD_WRITES": "0",
+        "DOC_CACHE_TTL": args.doc_cache_ttl,
+        "MEDIA_DIR": os.path.join(workdir, "media"),
+        "RESULT_CACHE_PATH": os.path.join(workdir, "results.sqlite3"),
+        "JOB_STORE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+    })
+
+    import app as webapp
+    from shared.aggregates import rebuild
+
+    if args.analyze:
+        webapp.model_registry.get("classifier", timeout=None)
+
+    client = webapp.app.test_client()
+    print(f"{'patients':>8s}  {'route':28s} {'p50 ms':>8s} {'p95 ms':>8s} {'reads/req':>10s} {'writes/req':>10s}")
+    for scale in (int(s) for s in args.scales.split(",")):
+        # every scale starts from an empty store, with its own radiologist
+        # so nothing is served from the document cache of the previous one
+        webapp.db.clear()
+        rid = f"load-r{scale}"
+        patients = seed(webapp.db, rid, scale)
+        rebuild(webapp.db, rid)
+        with client.session_transaction() as sess:
+            sess["radiologist_id"] = rid
+
+        routes = [
+            ("/home", lambda i: client.get("/home")),
+            ("/patients", lambda i: client.get("/patients")),
+            ("/patients/<id>/profile",
+             lambda i: client.get(f"/patients/{random.choice(patients)}/profile")),
+        ]
+        if args.analyze:
+            def analyze(i):
+                pid = random.choice(patients)
+                return client.post("/analyze_mri", data={
+                    "file": (io.BytesIO(random_png()), f"load-{i}.png"),
+                    "patient_id": pid, "case_id": f"{pid}-c0",
+                }, content_type="multipart/form-data")
+            routes.append(("/analyze_mri", analyze))
+
+        for name, make_request in routes:
+            r = drive(client, name, make_request, args.requests)
+            print(f"{scale:8d}  {r['route']:28s} {r['p50']:8.1f} {r['p95']:8.1f} {r['reads']:10.1f} {r['writes']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Inference backends for the exported models (see models/export.py).
+
+MODEL_BACKEND selects how both models run: "eager" (the PyTorch modules,
+default), "onnx" (ONNX Runtime), "onnx-int8" (the INT8 graphs written by
+models/quantize.py) or "torchscript" (a frozen TorchScript graph).
+The exported classifier returns (probs, cams) like cam_forward(); the exported
+segmenter returns logits like the eager U-Net++. Runners of the worker pool
+(models/worker_pool.py) follow the same contract.
+"""
+import os
+
+import torch
+
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "eager")
+EXPORT_DIR = os.environ.get("MODEL_EXPORT_DIR", "exported")
+BACKENDS = ("eager", "onnx", "onnx-int8", "torchscript")
+
+_EXTENSIONS = {"onnx": ".onnx", "onnx-int8": ".int8.onnx", "torchscript": ".ts"}
+
+
+def exported_path(name, backend):
+    return os.path.join(EXPORT_DIR, f"{name}{_EXTENSIONS[backend]}")
+
+
+class Runner:
+    """Something callable like the eager model that is not an nn.Module."""
+
+    def eval(self):
+        return self
+
+
+class OnnxRunner(Runner):
+    def __init__(self, path, intra_op_threads=0):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            opts.intra_op_num_threads = intra_op_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        outs = self.session.run(None, {self.input_name: x.detach().cpu().numpy()})
+        outs = tuple(torch.from_numpy(o) for o in outs)
+        return outs if len(outs) > 1 else outs[0]
+
+
+class TorchScriptRunner(Runner):
+    def __init__(self, path):
+        self.path = path
+        self.module = torch.jit.optimize_for_inference(torch.jit.load(path, map_location="cpu"))
+
+    def __call__(self, x):
+        with torch.no_grad():
+            return self.module(x.cpu())
+
+
+def load_exported(name, backend):
+    path = exported_path(name, backend)
+    if not os.path.exists(path):
+        command = "models.quantize" if backend == "onnx-int8" else f"models.export --format {backend}"
+        raise FileNotFoundError(f"{path} not found; run `python -m {command}` first")
+    runner = TorchScriptRunner(path) if backend == "torchscript" else OnnxRunner(path)
+    print(f"{name} loaded from {path} ({backend})")
+    return runner
+
+
+def is_exported(model):
+    return isinstance(model, Runner)
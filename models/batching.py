@@ -0,0 +1,162 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+from shared.metrics import observe
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class BatchScheduler:
+    """Collects single-image requests from many threads and runs them as one batch.
+
+    `fn` receives a stacked batch tensor and returns either a tensor or a tuple
+    of tensors whose first dimension is the batch; each caller gets its own row.
+    A batch is run once `max_batch_size` requests are queued or the oldest one
+    has waited `max_wait_ms`. `workers` threads run batches concurrently, which
+    only pays off when `fn` releases the GIL for long, e.g. when it hands the
+    batch to a process of the inference pool.
+    """
+
+    def __init__(self, fn, max_batch_size=8, max_wait_ms=5, name="model", workers=1):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue = []
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._requests = 0
+        self._batches = 0
+        self._max_batch_seen = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._forward_total = 0.0
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"batch-{name}-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, x):
+        if x.dim() == 3:
+            x = x.unsqueeze(0)
+        fut = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} scheduler is closed")
+            self._queue.append((x, fut, time.perf_counter()))
+            self._cond.notify()
+        return fut
+
+    def __call__(self, x):
+        return self.submit(x).result()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "name": self.name,
+                "workers": len(self._workers),
+                "queue_depth": len(self._queue),
+                "requests": self._requests,
+                "batches": self._batches,
+                "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch_seen,
+                "avg_wait_ms": self._wait_total / self._requests * 1000 if self._requests else 0.0,
+                "max_wait_ms": self._wait_max * 1000,
+                "avg_forward_ms": self._forward_total / self._batches * 1000 if self._batches else 0.0,
+            }
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return None
+
+            deadline = self._queue[0][2] + self.max_wait
+            while len(self._queue) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # only stack inputs of the same shape as the head of the queue
+            shape = self._queue[0][0].shape[1:]
+            batch, rest = [], []
+            for item in self._queue:
+                if len(batch) < self.max_batch_size and item[0].shape[1:] == shape:
+                    batch.append(item)
+                else:
+                    rest.append(item)
+            self._queue = rest
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            started = time.perf_counter()
+            try:
+                out = self.fn(torch.cat([x for x, _, _ in batch], dim=0))
+            except Exception as e:
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            for i, (_, fut, _) in enumerate(batch):
+                if isinstance(out, tuple):
+                    fut.set_result(tuple(o[i:i + 1] for o in out))
+                else:
+                    fut.set_result(out[i:i + 1])
+
+            observe("model_forward_seconds", finished - started, model=self.name)
+            observe("model_batch_size", len(batch), buckets=BATCH_BUCKETS, model=self.name)
+            with self._cond:
+                self._requests += len(batch)
+                self._batches += 1
+                self._max_batch_seen = max(self._max_batch_seen, len(batch))
+                self._forward_total += finished - started
+                for _, _, queued_at in batch:
+                    waited = started - queued_at
+                    self._wait_total += waited
+                    self._wait_max = max(self._wait_max, waited)
+
+
+def run_batched(fn, tensors, scheduler=None, batch_size=16):
+    """Run `fn` over single-image tensors in batches and return one output per input.
+
+    With a scheduler the tensors are submitted to it (so they share batches
+    with live requests); otherwise they are stacked `batch_size` at a time.
+    Outputs have the same shape as BatchScheduler results.
+    """
+    if scheduler is not None:
+        futures = [scheduler.submit(t) for t in tensors]
+        return [f.result() for f in futures]
+
+    results = []
+    for i in range(0, len(tensors), batch_size):
+        chunk = [t if t.dim() == 4 else t.unsqueeze(0) for t in tensors[i:i + batch_size]]
+        out = fn(torch.cat(chunk, dim=0))
+        for j in range(len(chunk)):
+            if isinstance(out, tuple):
+                results.append(tuple(o[j:j + 1] for o in out))
+            else:
+                results.append(out[j:j + 1])
+    return results
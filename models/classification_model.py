@@ -1,14 +1,21 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torchvision import transforms
 from PIL import Image
 import timm
 import numpy as np
-import os
-import cv2
+import io
+
+from models.batching import run_batched
+from models.backends import MODEL_BACKEND, load_exported, is_exported
+from models.gradcam import grad_cam, render_overlay, pil_to_tensor, compact_cam
+from models.preprocessing import classifier_input, open_rgb
+from shared import media
+from shared.metrics import span
 
 CLASSIFIER_MODEL_PATH = "class_model.pth"
+# Bump whenever preprocessing changes so cached results are not reused.
+PREPROCESS_VERSION = "cls-224-imagenet-v1"
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 
@@ -37,7 +44,34 @@ class EfficientNetB1_Classifier(nn.Module):
         return logits
 
 
-def load_classifier_model():
+class CamExport(nn.Module):
+    """Classifier + class activation map in one graph, used for ONNX/TorchScript export.
+
+    Exported graphs cannot backpropagate, so the map is taken on the final
+    feature map before global pooling, where Grad-CAM reduces to CAM with the
+    classifier weights of the predicted class. Returns (probs, cams) like
+    cam_forward().
+    """
+
+    def __init__(self, classifier):
+        super().__init__()
+        self.net = classifier.model
+
+    def forward(self, x):
+        feats = self.net.forward_features(x)
+        logits = self.net.forward_head(feats)
+        pred = logits.argmax(dim=1)
+        weights = self.net.classifier.weight[pred]
+        cam = torch.relu((weights[:, :, None, None] * feats).sum(dim=1))
+        cam = cam / (cam.flatten(1).max(dim=1)[0][:, None, None] + 1e-8)
+        return torch.softmax(logits, dim=1), cam
+
+
+def load_classifier_model(backend=None):
+    backend = backend or MODEL_BACKEND
+    if backend != "eager":
+        return load_exported("classifier", backend)
+
     model = EfficientNetB1_Classifier(num_classes=4)
     state_dict = torch.load(CLASSIFIER_MODEL_PATH, map_location=device)
     model.load_state_dict(state_dict, strict=True)
@@ -47,82 +81,78 @@ def load_classifier_model():
     return model
 
 
-def preprocess_img(img_path):
-    img = Image.open(img_path).convert("RGB")
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(
-            mean=[0.485, 0.456, 0.406],
-            std=[0.229, 0.224, 0.225]
-        )
-    ])
-    return transform(img).unsqueeze(0)
+def preprocess_pil(img):
+    return classifier_input(img)
 
 
-def generate_gradcam(model, img_path, save_name="gradcam.png"):
-    model.eval()
-    img = Image.open(img_path).convert("RGB")
-    preprocess = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(
-            mean=[0.485, 0.456, 0.406],
-            std=[0.229, 0.224, 0.225]
-        )
-    ])
-    input_tensor = preprocess(img).unsqueeze(0).to(device)
-    input_tensor.requires_grad_(True)
-    target_layer = model.model.conv_head
-    conv_features = []
-    conv_grads = []
+def _save_gradcam(cam, img):
+    """Store the overlay in the media store (content-addressed) and return its URL."""
+    overlay = render_overlay(cam, pil_to_tensor(img))
+    buf = io.BytesIO()
+    Image.fromarray(overlay).save(buf, format="PNG")
+    return media.put(buf.getvalue(), ".png")
 
-    def forward_hook(module, inp, output):
-        conv_features.append(output)
 
-    def backward_hook(module, grad_in, grad_out):
-        conv_grads.append(grad_out[0])
-
-    fh = target_layer.register_forward_hook(forward_hook)
-    bh = target_layer.register_backward_hook(backward_hook)
-
-    logits = model(input_tensor)
-    pred_class = logits.argmax(1).item()
-
-    model.zero_grad()
-    logits[0, pred_class].backward()
+CLASSES = ["glioma", "meningioma", "no_tumor", "pituitary"]
 
-    fmap = conv_features[0].detach().cpu().numpy()[0]
-    grads = conv_grads[0].detach().cpu().numpy()[0]
-    weights = grads.mean(axis=(1, 2))
-    cam = np.maximum(np.sum(weights[:, None, None] * fmap, axis=0), 0)
-    cam /= (cam.max() + 1e-8)
-    cam = cv2.resize(cam, img.size)
 
-    heatmap = cv2.applyColorMap(np.uint8(cam * 255), cv2.COLORMAP_JET)
-    original = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-    overlay = cv2.addWeighted(original, 0.5, heatmap, 0.5, 0)
+def cam_forward(model, x):
+    """Batched forward + Grad-CAM for the predicted class of every row of `x`.
 
-    out_dir = "static/uploads/gradcam"
-    os.makedirs(out_dir, exist_ok=True)
-    save_path = os.path.join(out_dir, save_name)
-    cv2.imwrite(save_path, overlay)
+    Returns (probs, cams) with shapes (B, num_classes) and (B, h, w).
+    """
+    if is_exported(model):
+        return model(x)
 
-    fh.remove()
-    bh.remove()
+    logits, cams = grad_cam(model, x.to(device), model.model.conv_head)
+    return torch.softmax(logits, dim=1), cams[:, 0]
 
-    return save_path, pred_class
 
+def classify_with_gradcam(model, img, scheduler=None):
+    """Classify an image and render its Grad-CAM from a single forward pass.
 
-CLASSES = ["glioma", "meningioma", "no_tumor", "pituitary"]
+    `img` is either a file path or an already decoded RGB PIL image. When a
+    BatchScheduler wrapping `cam_forward` is given the forward is batched with
+    other concurrent requests.
+    Returns (tumor_type, confidence, probs, gradcam_url, pred_idx, cam), cam
+    being the low-resolution map from compact_cam().
+    """
+    model.eval()
+    img = open_rgb(img)
+    x = preprocess_pil(img)
 
+    with span("classify.forward"):
+        if scheduler is not None:
+            probs, cams = scheduler(x)
+        else:
+            probs, cams = cam_forward(model, x)
 
-def classify_image(model, img_path):
-    x = preprocess_img(img_path).to(device)
-    with torch.no_grad():
-        logits = model(x)
-        probs = torch.softmax(logits, dim=1)[0].cpu().numpy()
+    probs = probs[0].cpu().numpy()
     idx = int(np.argmax(probs))
+    with span("classify.gradcam"):
+        gradcam_url = _save_gradcam(cams[0], img)
+
     tumor_type = CLASSES[idx]
     confidence = float(probs[idx]) * 100.0
-    return tumor_type, confidence
+    return tumor_type, confidence, probs, gradcam_url, idx, compact_cam(cams[0])
+
+
+def classify_batch_with_gradcam(model, imgs, scheduler=None, batch_size=16):
+    """Batched classify_with_gradcam over many images (paths or PIL images).
+
+    Returns one (tumor_type, confidence, probs, gradcam_url, pred_idx, cam) per image.
+    """
+    model.eval()
+    imgs = [open_rgb(img) for img in imgs]
+    outputs = run_batched(
+        lambda x: cam_forward(model, x), [preprocess_pil(img) for img in imgs],
+        scheduler=scheduler, batch_size=batch_size
+    )
+
+    results = []
+    for img, (probs, cams) in zip(imgs, outputs):
+        probs = probs[0].cpu().numpy()
+        idx = int(np.argmax(probs))
+        gradcam_url = _save_gradcam(cams[0], img)
+        results.append((CLASSES[idx], float(probs[idx]) * 100.0, probs, gradcam_url, idx, compact_cam(cams[0])))
+    return results
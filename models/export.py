@@ -0,0 +1,107 @@
+"""Export both checkpoints to ONNX or TorchScript and check them against the eager models.
+
+    python -m models.export --format onnx
+    python -m models.export --format torchscript --check-only
+
+Files are written to MODEL_EXPORT_DIR (default "exported/"); select them at
+runtime with MODEL_BACKEND=onnx or MODEL_BACKEND=torchscript.
+"""
+import argparse
+import os
+
+import torch
+
+from models.backends import EXPORT_DIR, exported_path, load_exported
+from models.classification_model import CamExport, load_classifier_model
+from models.segmentation_model import load_segmentation_model
+
+# Tolerances for the parity check on random inputs.
+PROB_ATOL = 1e-3
+CAM_ATOL = 1e-2
+LOGIT_ATOL = 1e-2
+
+
+def export_classifier(fmt):
+    wrapper = CamExport(load_classifier_model(backend="eager")).cpu().eval()
+    example = torch.randn(1, 3, 224, 224)
+    path = exported_path("classifier", fmt)
+    if fmt == "onnx":
+        torch.onnx.export(
+            wrapper, example, path, input_names=["image"], output_names=["probs", "cams"],
+            dynamic_axes={"image": {0: "batch"}, "probs": {0: "batch"}, "cams": {0: "batch"}},
+            opset_version=17,
+        )
+    else:
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(wrapper, example))
+        traced.save(path)
+    return wrapper, path
+
+
+def export_segmenter(fmt):
+    model = load_segmentation_model(backend="eager").cpu().eval()
+    example = torch.randn(1, 3, 512, 512)
+    path = exported_path("segmentation", fmt)
+    if fmt == "onnx":
+        torch.onnx.export(
+            model, example, path, input_names=["image"], output_names=["logits"],
+            dynamic_axes={"image": {0: "batch", 2: "height", 3: "width"},
+                          "logits": {0: "batch", 2: "height", 3: "width"}},
+            opset_version=17,
+        )
+    else:
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(model, example))
+        traced.save(path)
+    return model, path
+
+
+def check_parity(fmt, classifier=None, segmenter=None, batch=2):
+    """Compare the exported graphs with the eager models on random inputs."""
+    classifier = classifier or CamExport(load_classifier_model(backend="eager")).cpu().eval()
+    segmenter = segmenter or load_segmentation_model(backend="eager").cpu().eval()
+    ok = True
+
+    x = torch.randn(batch, 3, 224, 224)
+    with torch.no_grad():
+        probs, cams = classifier(x)
+    exp_probs, exp_cams = load_exported("classifier", fmt)(x)
+    prob_diff = (probs - exp_probs).abs().max().item()
+    cam_diff = (cams - exp_cams).abs().max().item()
+    same_class = bool((probs.argmax(1) == exp_probs.argmax(1)).all())
+    print(f"classifier  max|dprob| {prob_diff:.2e}  max|dcam| {cam_diff:.2e}  same class: {same_class}")
+    ok &= prob_diff <= PROB_ATOL and cam_diff <= CAM_ATOL and same_class
+
+    x = torch.rand(batch, 3, 512, 512)
+    with torch.no_grad():
+        logits = segmenter(x)
+    exp_logits = load_exported("segmentation", fmt)(x)
+    logit_diff = (logits - exp_logits).abs().max().item()
+    mask_agree = ((logits > 0) == (exp_logits > 0)).float().mean().item()
+    print(f"segmentation  max|dlogit| {logit_diff:.2e}  mask agreement {mask_agree:.4%}")
+    ok &= logit_diff <= LOGIT_ATOL
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=["onnx", "torchscript"], default="onnx")
+    parser.add_argument("--check-only", action="store_true", help="skip export, only run the parity check")
+    args = parser.parse_args()
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    classifier = segmenter = None
+    if not args.check_only:
+        classifier, path = export_classifier(args.format)
+        print(f"classifier -> {path}")
+        segmenter, path = export_segmenter(args.format)
+        print(f"segmentation -> {path}")
+
+    if not check_parity(args.format, classifier, segmenter):
+        raise SystemExit("Parity check failed")
+    print("Parity check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Grad-CAM computed and rendered in torch.
+
+grad_cam() gets the maps for a whole batch, for the predicted class or for
+several target classes, from one forward and one batched backward.
+render_overlay() turns a map into the 50/50 JET overlay with a prebuilt
+colour LUT and per-thread buffers reused between calls of the same size.
+"""
+import threading
+
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+# JET colormap as a (256, 3) RGB table, built once.
+JET_LUT = torch.from_numpy(
+    cv2.applyColorMap(np.arange(256, dtype=np.uint8)[:, None], cv2.COLORMAP_JET)[:, 0, ::-1].copy()
+)
+
+
+def grad_cam(model, x, target_layer, classes=None):
+    """Run `model` on `x` and return (logits, cams).
+
+    `classes` is None (the predicted class of each row), a list of class
+    indices shared by every row, or "all". cams has shape (B, K, h, w) with
+    K target classes, each map scaled to [0, 1].
+    """
+    captured = []
+
+    def forward_hook(module, inp, output):
+        captured.append(output)
+
+    handle = target_layer.register_forward_hook(forward_hook)
+    try:
+        with torch.enable_grad():
+            logits = model(x)
+            features = captured[0]
+            b, n_classes = logits.shape
+
+            if classes is None:
+                targets = logits.argmax(dim=1)[None, :]
+            else:
+                if classes == "all":
+                    classes = range(n_classes)
+                targets = torch.as_tensor(list(classes), device=logits.device)[:, None].expand(-1, b)
+
+            # one-hot grad_outputs for every target: (K, B, num_classes)
+            grad_out = torch.zeros(targets.shape[0], b, n_classes, device=logits.device)
+            grad_out.scatter_(2, targets[:, :, None], 1.0)
+            if grad_out.shape[0] == 1:
+                grads = torch.autograd.grad(logits, features, grad_out[0])[0][None]
+            else:
+                grads = torch.autograd.grad(logits, features, grad_out, is_grads_batched=True)[0]
+    finally:
+        handle.remove()
+
+    # grads: (K, B, C, h, w) -> channel weights (K, B, C)
+    weights = grads.mean(dim=(3, 4))
+    cams = torch.relu(torch.einsum("kbc,bchw->bkhw", weights, features.detach()))
+    cams = cams / (cams.flatten(2).amax(dim=2)[:, :, None, None] + 1e-8)
+    return logits.detach(), cams
+
+
+_buffers = threading.local()
+
+
+def _buffer(name, shape, dtype):
+    cache = getattr(_buffers, "cache", None)
+    if cache is None:
+        cache = _buffers.cache = {}
+    buf = cache.get(name)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = cache[name] = torch.empty(shape, dtype=dtype)
+    return buf
+
+
+def render_overlay(cam, image_rgb):
+    """Blend a (h, w) CAM over a (H, W, 3) uint8 RGB tensor; returns a uint8 RGB numpy array.
+
+    The returned array shares memory with a per-thread buffer, so write or
+    copy it before the next call from the same thread.
+    """
+    height, width = image_rgb.shape[:2]
+    up = F.interpolate(cam.detach().cpu()[None, None].float(), size=(height, width),
+                       mode="bilinear", align_corners=False)[0, 0]
+
+    index = _buffer("index", (height * width,), torch.int64)
+    up.clamp_(0, 1).mul_(255)
+    index.copy_(up.view(-1))  # truncates like np.uint8(cam * 255)
+    heatmap = _buffer("heatmap", (height * width, 3), torch.uint8)
+    torch.index_select(JET_LUT, 0, index, out=heatmap)
+
+    blend = _buffer("blend", (height, width, 3), torch.int16)
+    blend.copy_(image_rgb)
+    blend.add_(heatmap.view(height, width, 3)).add_(1).div_(2, rounding_mode="floor")
+
+    out = _buffer("out", (height, width, 3), torch.uint8)
+    out.copy_(blend)
+    return out.numpy()
+
+
+def pil_to_tensor(img):
+    """An RGB PIL image as a (H, W, 3) uint8 tensor."""
+    return torch.from_numpy(np.array(img, dtype=np.uint8))
+
+
+def compact_cam(cam, decimals=3):
+    """A (h, w) CAM as {"shape", "values"}, small enough (7x7 for the classifier) to keep with the scan."""
+    cam = cam.detach().cpu().float()
+    return {"shape": list(cam.shape), "values": [round(v, decimals) for v in cam.flatten().tolist()]}
@@ -0,0 +1,129 @@
+"""Compact binary masks and the statistics derived from them.
+
+A segmentation mask is stored next to its MRI_Scans record as
+{"format", "shape", "data"}: either run-lengths ("rle", alternating
+background/tumour runs in row-major order, starting with background) or
+np.packbits bits ("packbits"), whichever is smaller, zlib-compressed and
+base64-encoded. Tumour area, bounding box and centroid are computed once
+from the full-resolution mask; PNGs are only rendered when a page asks
+for one.
+"""
+import base64
+import hashlib
+import zlib
+
+import cv2
+import numpy as np
+
+THRESHOLD = 0.5
+
+
+def binarize(mask_pred, original_size):
+    """Threshold a probability map and resize it to `original_size` (w, h) as a bool array."""
+    mask = (mask_pred > THRESHOLD).astype(np.uint8)
+    return cv2.resize(mask, original_size, interpolation=cv2.INTER_NEAREST).astype(bool)
+
+
+def _pack(raw):
+    return base64.b64encode(zlib.compress(raw, 9)).decode("ascii")
+
+
+def _unpack(data):
+    return zlib.decompress(base64.b64decode(data))
+
+
+def _runs(flat):
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    runs = np.diff(np.concatenate([[0], change, [flat.size]]))
+    if flat.size and flat[0]:
+        runs = np.concatenate([[0], runs])
+    return runs.astype("<u4")
+
+
+def encode(mask):
+    h, w = mask.shape
+    flat = mask.ravel()
+    rle = _pack(_runs(flat).tobytes())
+    bits = _pack(np.packbits(flat).tobytes())
+    if len(rle) <= len(bits):
+        return {"format": "rle", "shape": [h, w], "data": rle}
+    return {"format": "packbits", "shape": [h, w], "data": bits}
+
+
+def decode(encoded):
+    h, w = encoded["shape"]
+    raw = _unpack(encoded["data"])
+    if encoded["format"] == "rle":
+        runs = np.frombuffer(raw, dtype="<u4")
+        flat = np.repeat(np.arange(len(runs)) % 2 == 1, runs)
+    elif encoded["format"] == "packbits":
+        flat = np.unpackbits(np.frombuffer(raw, dtype=np.uint8), count=h * w).astype(bool)
+    else:
+        raise ValueError(f"unknown mask format {encoded['format']!r}")
+    return flat.reshape(h, w)
+
+
+def mask_stats(mask):
+    """Tumour area in pixels and as a fraction of the image, bbox [x0, y0, x1, y1] and centroid [x, y]."""
+    h, w = mask.shape
+    ys, xs = np.nonzero(mask)
+    area = int(xs.size)
+    stats = {"area_px": area, "area_fraction": area / float(h * w) if h * w else 0.0,
+             "bbox": None, "centroid": None}
+    if area:
+        stats["bbox"] = [int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())]
+        stats["centroid"] = [round(float(xs.mean()), 1), round(float(ys.mean()), 1)]
+    return stats
+
+
+def gradcam_mean(mask, cam):
+    """Mean Grad-CAM intensity over the tumour pixels of `mask`; `cam` as stored by compact_cam()."""
+    if not cam or not mask.any():
+        return None
+    grid = np.asarray(cam["values"], dtype=np.float32).reshape(cam["shape"])
+    up = cv2.resize(grid, (mask.shape[1], mask.shape[0]), interpolation=cv2.INTER_LINEAR)
+    return round(float(up[mask].mean()), 4)
+
+
+def measure(result, cam=None):
+    """Per-scan measurements of a compact() result: its mask statistics plus gradcam_mean."""
+    measurements = dict(result["stats"])
+    measurements["gradcam_mean"] = gradcam_mean(decode(result["mask"]), cam) if cam else None
+    return measurements
+
+
+def compact(mask_pred, original_size):
+    """What segmentation stores for one image: {"mask": encoded mask, "stats": mask_stats}."""
+    mask = binarize(mask_pred, original_size)
+    return {"mask": encode(mask), "stats": mask_stats(mask)}
+
+
+def render_png(mask):
+    """The mask as a 0/255 grayscale PNG, like the files segmentation used to write."""
+    ok, buf = cv2.imencode(".png", mask.astype(np.uint8) * 255)
+    if not ok:
+        raise ValueError("could not encode mask PNG")
+    return buf.tobytes()
+
+
+def render_overlay(mask, image_rgb, color=(255, 0, 0), alpha=0.45):
+    """The mask tinted over a (H, W, 3) uint8 RGB image, as PNG bytes."""
+    out = image_rgb.copy()
+    if out.shape[:2] != mask.shape:
+        out = cv2.resize(out, (mask.shape[1], mask.shape[0]), interpolation=cv2.INTER_LINEAR)
+    tint = np.array(color, dtype=np.float32)
+    out[mask] = (out[mask] * (1 - alpha) + tint * alpha).astype(np.uint8)
+    ok, buf = cv2.imencode(".png", cv2.cvtColor(out, cv2.COLOR_RGB2BGR))
+    if not ok:
+        raise ValueError("could not encode overlay PNG")
+    return buf.tobytes()
+
+
+def version(encoded):
+    """Short digest of an encoded mask, used to version rendered images."""
+    return hashlib.sha1(encoded["data"].encode("ascii")).hexdigest()[:12]
+
+
+def mask_url(scan_id, encoded):
+    """URL of the lazily rendered mask PNG; changes whenever the mask does."""
+    return f"/scans/{scan_id}/mask.png?v={version(encoded)}"
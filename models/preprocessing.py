@@ -0,0 +1,76 @@
+"""Image decoding and the input transforms of both models.
+
+An upload is decoded once into an RGB image, and the classifier (224x224,
+ImageNet-normalised) and segmentation (512x512) tensors are both built from
+that image. Decoded images are kept in a small LRU keyed by content hash, so
+a /segment_only call shortly after /analyze_mri does not read the file again.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+from torchvision import transforms
+
+CLS_TRANSFORM = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize(
+        mean=[0.485, 0.456, 0.406],
+        std=[0.229, 0.224, 0.225]
+    )
+])
+
+SEG_TRANSFORM = transforms.Compose([
+    transforms.Resize((512, 512), interpolation=Image.BILINEAR),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.0, 0.0, 0.0],
+                         std=[1.0, 1.0, 1.0])
+])
+
+DECODED_CACHE_SIZE = 16
+
+_decoded = OrderedDict()
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def decode(data):
+    return Image.open(io.BytesIO(data)).convert("RGB")
+
+
+def open_rgb(img):
+    """Accept a path or an already decoded image and return an RGB PIL image."""
+    if isinstance(img, Image.Image):
+        return img
+    return Image.open(img).convert("RGB")
+
+
+def load_image(key, data=None, path=None):
+    """Decoded RGB image for `key` (normally the content hash).
+
+    Decodes `data` if given, otherwise reads `path`, unless the image is
+    already cached.
+    """
+    with _lock:
+        img = _decoded.get(key)
+        if img is not None:
+            _decoded.move_to_end(key)
+            stats["hits"] += 1
+            return img
+        stats["misses"] += 1
+
+    img = decode(data) if data is not None else open_rgb(path)
+    with _lock:
+        _decoded[key] = img
+        while len(_decoded) > DECODED_CACHE_SIZE:
+            _decoded.popitem(last=False)
+    return img
+
+
+def classifier_input(img):
+    return CLS_TRANSFORM(img).unsqueeze(0)
+
+
+def segmentation_input(img):
+    return SEG_TRANSFORM(img).unsqueeze(0)
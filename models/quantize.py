@@ -0,0 +1,120 @@
+"""INT8 variants of the exported ONNX models, plus an accuracy-drift report.
+
+    python -m models.export --format onnx
+    python -m models.quantize --calibration-dir samples/ [--eval-dir holdout/] [--mode dynamic]
+
+Static quantization is calibrated on the images in --calibration-dir. The
+results are written next to the fp32 graphs and selected at runtime with
+MODEL_BACKEND=onnx-int8. The report compares the INT8 graphs with the fp32
+ones on --eval-dir (the calibration images when not given): predicted class
+agreement, mask Dice and per-image latency.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from models.backends import OnnxRunner, exported_path
+from models.preprocessing import classifier_input, segmentation_input
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"}
+
+
+def _images(folder):
+    names = sorted(n for n in os.listdir(folder) if os.path.splitext(n)[1].lower() in IMAGE_EXTENSIONS)
+    if not names:
+        raise SystemExit(f"No images found in {folder}")
+    return [Image.open(os.path.join(folder, n)).convert("RGB") for n in names]
+
+
+def _inputs(imgs):
+    return {
+        "classifier": [classifier_input(img) for img in imgs],
+        "segmentation": [segmentation_input(img) for img in imgs],
+    }
+
+
+def quantize(name, tensors, mode):
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+    )
+
+    src = exported_path(name, "onnx")
+    dst = exported_path(name, "onnx-int8")
+    if not os.path.exists(src):
+        raise SystemExit(f"{src} not found; run `python -m models.export --format onnx` first")
+
+    if mode == "dynamic":
+        quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+        return dst
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._batches = iter([{"image": t.numpy()} for t in tensors])
+
+        def get_next(self):
+            return next(self._batches, None)
+
+    quantize_static(
+        src, dst, Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+        activation_type=QuantType.QInt8, weight_type=QuantType.QInt8,
+    )
+    return dst
+
+
+def _run(runner, tensors):
+    outputs, times = [], []
+    for t in tensors:
+        started = time.perf_counter()
+        outputs.append(runner(t))
+        times.append((time.perf_counter() - started) * 1000)
+    return outputs, statistics.median(times)
+
+
+def _dice(a, b):
+    inter = np.logical_and(a, b).sum()
+    total = a.sum() + b.sum()
+    return 1.0 if total == 0 else 2.0 * inter / total
+
+
+def drift_report(inputs):
+    cls32, cls8 = OnnxRunner(exported_path("classifier", "onnx")), OnnxRunner(exported_path("classifier", "onnx-int8"))
+    seg32, seg8 = OnnxRunner(exported_path("segmentation", "onnx")), OnnxRunner(exported_path("segmentation", "onnx-int8"))
+
+    out32, ms32 = _run(cls32, inputs["classifier"])
+    out8, ms8 = _run(cls8, inputs["classifier"])
+    agree = np.mean([int(a[0].argmax()) == int(b[0].argmax()) for a, b in zip(out32, out8)])
+    conf_drift = np.mean([float((a[0] - b[0]).abs().max()) for a, b in zip(out32, out8)])
+
+    m32, sms32 = _run(seg32, inputs["segmentation"])
+    m8, sms8 = _run(seg8, inputs["segmentation"])
+    dice = [_dice((a > 0).numpy(), (b > 0).numpy()) for a, b in zip(m32, m8)]
+
+    n = len(inputs["classifier"])
+    print(f"{n} images")
+    print(f"{'':14s} {'fp32':>10s} {'int8':>10s}")
+    print(f"{'classifier':14s} {ms32:8.1f}ms {ms8:8.1f}ms   class agreement {agree:.1%}, "
+          f"mean max|dprob| {conf_drift:.3f}")
+    print(f"{'segmentation':14s} {sms32:8.1f}ms {sms8:8.1f}ms   mask Dice mean {np.mean(dice):.3f}, "
+          f"min {np.min(dice):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calibration-dir", required=True)
+    parser.add_argument("--eval-dir")
+    parser.add_argument("--mode", choices=["static", "dynamic"], default="static")
+    args = parser.parse_args()
+
+    calibration = _inputs(_images(args.calibration_dir))
+    for name in ("classifier", "segmentation"):
+        print(f"{name} -> {quantize(name, calibration[name], args.mode)}")
+
+    drift_report(_inputs(_images(args.eval_dir)) if args.eval_dir else calibration)
+
+
+if __name__ == "__main__":
+    main()
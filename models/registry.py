@@ -0,0 +1,107 @@
+import threading
+import time
+
+
+class ModelNotReady(Exception):
+    pass
+
+
+class _Entry:
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.state = "not_loaded"
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.failures = 0
+        self.retry_at = None
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Loads models on first use or in a background thread after startup.
+
+    Nothing heavy is imported until a loader runs, so importing the app stays
+    cheap for routes that never touch a model. A failed load is retried by
+    the first get() after a backoff that starts at `retry_base` seconds and
+    doubles with every consecutive failure, up to `retry_max`.
+    """
+
+    def __init__(self, retry_base=5, retry_max=300):
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._entries = {}
+
+    def register(self, name, loader):
+        self._entries[name] = _Entry(name, loader)
+
+    def _load(self, entry):
+        with entry.lock:
+            if entry.state == "failed" and time.monotonic() >= entry.retry_at:
+                entry.state = "not_loaded"
+                entry.ready.clear()
+            if entry.state != "not_loaded":
+                return
+            entry.state = "loading"
+
+        started = time.perf_counter()
+        try:
+            entry.value = entry.loader()
+            entry.error = None
+            entry.failures = 0
+            entry.state = "ready"
+        except Exception as e:
+            entry.error = str(e)
+            entry.failures += 1
+            delay = min(self.retry_base * 2 ** (entry.failures - 1), self.retry_max)
+            entry.retry_at = time.monotonic() + delay
+            entry.state = "failed"
+            print(f"⚠ Failed to load {entry.name}: {e} (retrying after {delay:.0f}s)")
+        entry.load_seconds = time.perf_counter() - started
+        entry.loaded_at = time.time()
+        entry.ready.set()
+
+    def warm_up(self, names=None):
+        for name in names or list(self._entries):
+            entry = self._entries[name]
+            threading.Thread(
+                target=self._load, args=(entry,), name=f"warmup-{name}", daemon=True
+            ).start()
+
+    def get(self, name, timeout=None):
+        """Return the loaded model, loading it in this thread if nobody has started.
+
+        Raises ModelNotReady if it is still loading after `timeout` seconds or
+        if loading failed and the next attempt is not due yet.
+        """
+        entry = self._entries[name]
+        if entry.state in ("not_loaded", "failed"):
+            self._load(entry)
+        if not entry.ready.wait(timeout):
+            raise ModelNotReady(f"{name} is still warming up")
+        if entry.state == "failed":
+            raise ModelNotReady(f"{name} failed to load: {entry.error}")
+        return entry.value
+
+    def peek(self, name):
+        entry = self._entries[name]
+        return entry.value if entry.state == "ready" else None
+
+    def is_ready(self):
+        return all(e.state == "ready" for e in self._entries.values())
+
+    def status(self):
+        return {
+            name: {
+                "state": e.state,
+                "load_seconds": round(e.load_seconds, 3) if e.load_seconds is not None else None,
+                "loaded_at": e.loaded_at,
+                "error": e.error,
+                "failures": e.failures,
+                "retry_in": round(max(0.0, e.retry_at - time.monotonic()), 1) if e.state == "failed" else None,
+            }
+            for name, e in self._entries.items()
+        }
@@ -1,15 +1,29 @@
 import torch
 from torchvision import transforms
-from PIL import Image
 import numpy as np
-import os
-import cv2
+import time
 import segmentation_models_pytorch as smp
 
+from models.batching import run_batched
+from models.backends import MODEL_BACKEND, load_exported
+from models.masks import compact
+from models.preprocessing import open_rgb, segmentation_input
+from shared.metrics import span
+
 SEG_MODEL_PATH = "SEG_Model.pth"
+# Bump whenever preprocessing, thresholding or the stored mask format changes
+# so cached masks are not reused.
+PREPROCESS_VERSION = "seg-512-v2"
+# Tiled ("quality") mode: tiles of up to TILE_SIZE px overlapping by TILE_OVERLAP.
+TILE_SIZE = 512
+TILE_OVERLAP = 0.25
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-def load_segmentation_model():
+def load_segmentation_model(backend=None):
+    backend = backend or MODEL_BACKEND
+    if backend != "eager":
+        return load_exported("segmentation", backend)
+
     model = smp.UnetPlusPlus(
         encoder_name="efficientnet-b1",
         encoder_weights=None,
@@ -29,34 +43,106 @@ def load_segmentation_model():
     return model
 
 
-def preprocess_image(img_path):
-    img = Image.open(img_path).convert("RGB")
-    preprocess = transforms.Compose([
-        transforms.Resize((512, 512), interpolation=Image.BILINEAR),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.0, 0.0, 0.0],
-                             std=[1.0, 1.0, 1.0])
-    ])
-    img_tensor = preprocess(img).unsqueeze(0)
-    return img_tensor, img.size
+def preprocess_image(img):
+    """`img` is a path or a decoded RGB image; returns (tensor, original size)."""
+    img = open_rgb(img)
+    return segmentation_input(img), img.size
 
 
-def segment_image(model, img_path, scan_id=None):
+def seg_forward(model, x):
+    with torch.no_grad():
+        return torch.sigmoid(model(x.to(device)))
+
+
+def segment_image(model, img_path, scheduler=None):
+    """Fast path: resize to 512x512, segment, resize the mask back. `img_path` may be a decoded image.
+
+    Returns {"mask": compact mask, "stats": area/bbox/centroid} (see models/masks.py).
+    """
     model.eval()
     img_tensor, original_size = preprocess_image(img_path)
-    img_tensor = img_tensor.to(device)
 
+    with span("segment.forward"):
+        if scheduler is not None:
+            mask_pred = scheduler(img_tensor).cpu().numpy()[0, 0]
+        else:
+            mask_pred = seg_forward(model, img_tensor).cpu().numpy()[0, 0]
+
+    return compact(mask_pred, original_size)
+
+
+def segment_batch(model, img_paths, scheduler=None, batch_size=8):
+    """Batched segment_image over many files. Returns one compact mask per image."""
+    model.eval()
+    prepared = [preprocess_image(p) for p in img_paths]
+    outputs = run_batched(
+        lambda x: seg_forward(model, x), [t for t, _ in prepared],
+        scheduler=scheduler, batch_size=batch_size
+    )
+    return [compact(out.cpu().numpy()[0, 0], size) for (_, size), out in zip(prepared, outputs)]
+
+
+def _round_up(n, multiple=32):
+    return ((n + multiple - 1) // multiple) * multiple
+
+
+def _tile_starts(length, tile, stride):
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+def _blend_window(h, w):
+    # linear ramp towards the tile edges so overlapping tiles fade into each other
+    wy = 1.0 - torch.linspace(-1, 1, h).abs()
+    wx = 1.0 - torch.linspace(-1, 1, w).abs()
+    return (torch.outer(wy, wx) + 1e-3)
+
+
+def seg_logits_forward(model, x):
     with torch.no_grad():
-        mask_pred = torch.sigmoid(model(img_tensor)).cpu().numpy()[0, 0]
+        return model(x.to(device))
+
+
+def segment_image_tiled(model, img_path, tile=TILE_SIZE, overlap=TILE_OVERLAP, batch_size=4):
+    """Segment at native resolution with overlapping tiles and blended logits.
+
+    Images smaller than a tile are only padded up to a multiple of 32 instead
+    of being upscaled to 512x512. Returns (compact mask, info) where info
+    holds the tile count and timing.
+    """
+    started = time.perf_counter()
+    model.eval()
+    img = open_rgb(img_path)
+    x = transforms.functional.to_tensor(img)
+    _, h, w = x.shape
+
+    th, tw = min(tile, _round_up(h)), min(tile, _round_up(w))
+    ph, pw = max(h, th), max(w, tw)
+    x = torch.nn.functional.pad(x, (0, pw - w, 0, ph - h))
+
+    stride_y = max(1, int(th * (1 - overlap)))
+    stride_x = max(1, int(tw * (1 - overlap)))
+    coords = [(y, xx) for y in _tile_starts(ph, th, stride_y) for xx in _tile_starts(pw, tw, stride_x)]
+    tiles = [x[:, y:y + th, xx:xx + tw] for y, xx in coords]
 
-    mask = (mask_pred > 0.5).astype(np.uint8) * 255
-    mask_resized = cv2.resize(mask, original_size, interpolation=cv2.INTER_NEAREST)
+    outputs = run_batched(lambda b: seg_logits_forward(model, b), tiles, batch_size=batch_size)
 
-    mask_dir = "static/uploads/masks"
-    os.makedirs(mask_dir, exist_ok=True)
-    mask_filename = f"mask_{scan_id}.png" if scan_id else f"mask_{os.path.basename(img_path)}"
-    mask_path = os.path.join(mask_dir, mask_filename)
+    window = _blend_window(th, tw)
+    logits = torch.zeros(ph, pw)
+    weights = torch.zeros(ph, pw)
+    for (y, xx), out in zip(coords, outputs):
+        logits[y:y + th, xx:xx + tw] += out[0, 0].cpu() * window
+        weights[y:y + th, xx:xx + tw] += window
+    mask_pred = torch.sigmoid(logits / weights)[:h, :w].numpy()
 
-    cv2.imwrite(mask_path, mask_resized)
-    print(f"Saved mask at: {mask_path}")
-    return mask_path
+    result = compact(mask_pred, img.size)
+    info = {
+        "mode": "tiled",
+        "tiles": len(coords),
+        "tile_size": [th, tw],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    return result, info
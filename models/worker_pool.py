@@ -0,0 +1,282 @@
+"""Multi-process inference: N worker processes, each holding both models.
+
+Each worker loads the classifier and the segmenter once, limits torch to its
+own share of intra-op threads (optionally pinned to its own cores) and serves
+forwards from one shared task queue, so an idle worker picks up the next
+batch. Tensors travel through torch.multiprocessing queues, which move their
+storage into shared memory and pickle only a handle: neither the input batch
+nor the 512x512 masks coming back are copied through a pipe.
+
+pool.runner("classify") and pool.runner("segment") behave like exported
+models (see models/backends.py), so cam_forward(), seg_forward() and the
+BatchScheduler work on them unchanged.
+"""
+import atexit
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+import torch.multiprocessing as mp
+
+from models.backends import Runner
+
+KINDS = ("classify", "segment")
+
+
+def _pin_cores(worker_id, threads):
+    if not hasattr(os, "sched_setaffinity"):
+        return None
+    cores = sorted(os.sched_getaffinity(0))
+    start = worker_id * threads
+    mine = {cores[(start + i) % len(cores)] for i in range(threads)}
+    os.sched_setaffinity(0, mine)
+    return sorted(mine)
+
+
+def _detach(out):
+    # grad_cam returns views (cams[:, 0]); share only what the caller needs
+    if isinstance(out, tuple):
+        return tuple(o.detach().contiguous() for o in out)
+    return out.detach().contiguous()
+
+
+def _worker_main(worker_id, threads, pin_cpus, backend, tasks, results):
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    cores = _pin_cores(worker_id, threads) if pin_cpus else None
+
+    try:
+        from models.classification_model import load_classifier_model, cam_forward
+        from models.segmentation_model import load_segmentation_model, seg_logits_forward
+
+        cls_model = load_classifier_model(backend=backend)
+        seg_model = load_segmentation_model(backend=backend)
+    except Exception as e:
+        results.put(("failed", worker_id, None, repr(e)))
+        return
+
+    forwards = {
+        "classify": lambda x: cam_forward(cls_model, x),
+        "segment": lambda x: seg_logits_forward(seg_model, x),
+    }
+    results.put(("ready", worker_id, {"pid": os.getpid(), "cores": cores}, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, kind, x = task
+        results.put(("started", worker_id, task_id, None))
+        try:
+            results.put(("ok", task_id, _detach(forwards[kind](x)), None))
+        except Exception as e:
+            results.put(("error", task_id, None, repr(e)))
+
+
+class PoolRunner(Runner):
+    def __init__(self, pool, kind):
+        self.pool = pool
+        self.kind = kind
+
+    def __call__(self, x):
+        return self.pool.submit(self.kind, x).result()
+
+
+class InferencePool:
+    """`workers` processes serving classifier and segmentation forwards.
+
+    `threads` is the torch intra-op thread count of each worker (by default
+    the cores divided evenly between workers); with `pin_cpus` every worker
+    is also bound to its own slice of cores. A worker that dies is restarted
+    and the task it was running fails instead of hanging. A worker can die
+    between taking a task off the shared queue and reporting it as started,
+    so a task no worker has started within `task_timeout` seconds of being
+    submitted fails as well.
+    """
+
+    def __init__(self, workers=2, threads=None, pin_cpus=False, backend=None, start_timeout=300,
+                 task_timeout=120):
+        if workers < 1:
+            raise ValueError("an inference pool needs at least one worker")
+        self.workers = workers
+        self.threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self.pin_cpus = pin_cpus
+        self.backend = backend
+        self.task_timeout = task_timeout
+
+        self._ctx = mp.get_context("spawn")
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._procs = {}
+        self._info = {}
+        self._pending = {}
+        self._running = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._completed = 0
+        self._failed = 0
+        self._restarts = 0
+        self._latency_total = 0.0
+
+        for worker_id in range(workers):
+            self._spawn(worker_id)
+        self._wait_ready(start_timeout)
+
+        self._collector = threading.Thread(target=self._collect, name="inference-pool", daemon=True)
+        self._collector.start()
+        atexit.register(self.close)
+
+    def _spawn(self, worker_id):
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.threads, self.pin_cpus, self.backend, self._tasks, self._results),
+            name=f"inference-worker-{worker_id}",
+            daemon=True,
+        )
+        proc.start()
+        self._procs[worker_id] = proc
+
+    def _wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        waiting = set(self._procs)
+        while waiting:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.close()
+                raise RuntimeError(f"inference workers {sorted(waiting)} did not start in {timeout}s")
+            try:
+                status, worker_id, info, error = self._results.get(timeout=min(remaining, 1.0))
+            except queue.Empty:
+                dead = [w for w in waiting if not self._procs[w].is_alive()]
+                if dead:
+                    self.close()
+                    raise RuntimeError(f"inference workers {dead} exited during start-up")
+                continue
+            if status == "failed":
+                self.close()
+                raise RuntimeError(f"inference worker {worker_id} failed to load models: {error}")
+            self._info[worker_id] = info
+            waiting.discard(worker_id)
+        print(f"Inference pool ready: {self.workers} workers x {self.threads} threads")
+
+    def submit(self, kind, x):
+        if kind not in KINDS:
+            raise ValueError(f"unknown task kind {kind!r}")
+        if x.dim() == 3:
+            x = x.unsqueeze(0)
+        x = x.detach().cpu().contiguous().share_memory_()
+        fut = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("inference pool is closed")
+            task_id = next(self._ids)
+            self._pending[task_id] = (fut, time.perf_counter())
+        self._tasks.put((task_id, kind, x))
+        return fut
+
+    def runner(self, kind):
+        return PoolRunner(self, kind)
+
+    def _finish(self, task_id, result=None, error=None):
+        with self._lock:
+            fut, submitted = self._pending.pop(task_id, (None, None))
+            if fut is None:
+                return
+            if error is None:
+                self._completed += 1
+                self._latency_total += time.perf_counter() - submitted
+            else:
+                self._failed += 1
+        if error is None:
+            fut.set_result(result)
+        else:
+            fut.set_exception(RuntimeError(error))
+
+    def _collect(self):
+        while not self._closed:
+            # check liveness on every message too: under steady load the
+            # queue is never idle long enough to time out
+            self._restart_dead()
+            self._expire_pending()
+            try:
+                status, key, payload, error = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+
+            if status == "started":
+                self._running[key] = payload
+            elif status == "ok":
+                self._forget_running(key)
+                self._finish(key, result=payload)
+            elif status == "error":
+                self._forget_running(key)
+                self._finish(key, error=error)
+            elif status == "ready":
+                self._info[key] = payload
+            elif status == "failed":
+                print(f"⚠ Restarted inference worker {key} failed to load models: {error}")
+
+    def _forget_running(self, task_id):
+        for worker_id, running in list(self._running.items()):
+            if running == task_id:
+                del self._running[worker_id]
+
+    def _expire_pending(self):
+        # tasks a live worker reported as started are left to finish however slow
+        deadline = time.perf_counter() - self.task_timeout
+        running = set(self._running.values())
+        with self._lock:
+            expired = [task_id for task_id, (_, submitted) in self._pending.items()
+                       if submitted < deadline and task_id not in running]
+        for task_id in expired:
+            self._finish(task_id, error=f"inference task got no result within {self.task_timeout}s")
+
+    def _restart_dead(self):
+        for worker_id, proc in list(self._procs.items()):
+            if proc.is_alive() or self._closed:
+                continue
+            task_id = self._running.pop(worker_id, None)
+            if task_id is not None:
+                self._finish(task_id, error=f"inference worker {worker_id} exited (code {proc.exitcode})")
+            print(f"⚠ Inference worker {worker_id} exited (code {proc.exitcode}); restarting")
+            self._restarts += 1
+            self._spawn(worker_id)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for _ in self._procs:
+            self._tasks.put(None)
+        for proc in self._procs.values():
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for fut, _ in pending.values():
+            fut.set_exception(RuntimeError("inference pool is closed"))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "threads_per_worker": self.threads,
+                "pin_cpus": self.pin_cpus,
+                "alive": sum(p.is_alive() for p in self._procs.values()),
+                "pending": len(self._pending),
+                "completed": self._completed,
+                "failed": self._failed,
+                "restarts": self._restarts,
+                "avg_latency_ms": self._latency_total / self._completed * 1000 if self._completed else 0.0,
+                "processes": {str(w): info for w, info in self._info.items()},
+            }
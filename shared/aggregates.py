@@ -0,0 +1,194 @@
+"""Per-radiologist dashboard counters kept in DashboardStats/<radiologist id>.
+
+The counters are bumped with Firestore increments whenever a patient or scan
+is written or deleted, so /dashboard reads a single document. Increments
+made before a radiologist's counters were first rebuilt (e.g. right after
+this was deployed) only hold that delta, so current_stats() rebuilds any
+document without RebuiltAt before using it. TotalReports is rebuild-only:
+Reports are written outside this app, so nothing here can count them as
+they are added. Run
+
+    python -m shared.aggregates [radiologist_id ...]
+
+to recompute them from scratch (all radiologists when no id is given).
+"""
+import sys
+from datetime import datetime
+
+from firebase_admin import firestore
+
+STATS_COLLECTION = "DashboardStats"
+
+
+def _confidence_fraction(val):
+    try:
+        val = float(val)
+    except (TypeError, ValueError):
+        return None
+    return val if val <= 1 else val / 100
+
+
+def _scan_fields(scan, sign):
+    fields = {
+        "TotalScans": firestore.Increment(sign),
+        "TumorCounts": {scan.get("ClassificationResult", "Unknown"): firestore.Increment(sign)},
+    }
+    upload_date = scan.get("UploadDate")
+    if isinstance(upload_date, datetime):
+        fields["MonthlyUploads"] = {upload_date.strftime("%Y-%m"): firestore.Increment(sign)}
+    conf = _confidence_fraction(scan.get("ConfidenceScore"))
+    if conf is not None:
+        fields["ConfidenceSum"] = firestore.Increment(sign * conf)
+        fields["ConfidenceCount"] = firestore.Increment(sign)
+    return fields
+
+
+def _patient_fields(patient, sign):
+    fields = {"TotalPatients": firestore.Increment(sign)}
+    gender = patient.get("Gender", "")
+    if gender:
+        fields["GenderCounts"] = {gender: firestore.Increment(sign)}
+    return fields
+
+
+def stats_ref(db, radiologist_id):
+    return db.collection(STATS_COLLECTION).document(radiologist_id)
+
+
+def _apply(db, radiologist_id, fields, batch):
+    if not radiologist_id:
+        return
+    ref = stats_ref(db, radiologist_id)
+    if batch is not None:
+        batch.set(ref, fields, merge=True)
+    else:
+        ref.set(fields, merge=True)
+
+
+def record_scan(db, radiologist_id, scan, sign=1, batch=None):
+    """Add (sign=1) or remove (sign=-1) one scan from the radiologist's counters.
+
+    With `batch` the update is queued on that WriteBatch instead of written now.
+    """
+    _apply(db, radiologist_id, _scan_fields(scan, sign), batch)
+
+
+def record_scans(db, radiologist_id, scans, sign=1, batch=None):
+    """record_scan() for many scans as a single counter update."""
+    totals = {"TotalScans": 0, "TumorCounts": {}, "MonthlyUploads": {}, "ConfidenceSum": 0.0, "ConfidenceCount": 0}
+    for scan in scans:
+        totals["TotalScans"] += 1
+        tumor = scan.get("ClassificationResult", "Unknown")
+        totals["TumorCounts"][tumor] = totals["TumorCounts"].get(tumor, 0) + 1
+        upload_date = scan.get("UploadDate")
+        if isinstance(upload_date, datetime):
+            month = upload_date.strftime("%Y-%m")
+            totals["MonthlyUploads"][month] = totals["MonthlyUploads"].get(month, 0) + 1
+        conf = _confidence_fraction(scan.get("ConfidenceScore"))
+        if conf is not None:
+            totals["ConfidenceSum"] += conf
+            totals["ConfidenceCount"] += 1
+    if not totals["TotalScans"]:
+        return
+
+    fields = {}
+    for key, value in totals.items():
+        if isinstance(value, dict):
+            if value:
+                fields[key] = {k: firestore.Increment(sign * v) for k, v in value.items()}
+        elif value:
+            fields[key] = firestore.Increment(sign * value)
+    _apply(db, radiologist_id, fields, batch)
+
+
+def record_patient(db, radiologist_id, patient, sign=1, batch=None):
+    _apply(db, radiologist_id, _patient_fields(patient, sign), batch)
+
+
+def record_gender_change(db, radiologist_id, old, new, batch=None):
+    """Move one patient from GenderCounts[old] to GenderCounts[new] after a profile edit."""
+    if old == new:
+        return
+    counts = {}
+    if old:
+        counts[old] = firestore.Increment(-1)
+    if new:
+        counts[new] = firestore.Increment(1)
+    _apply(db, radiologist_id, {"GenderCounts": counts}, batch)
+
+
+def radiologist_of(patient):
+    return (patient.get("CreatedBy") or "").split("/")[-1] or None
+
+
+def load_stats(db, radiologist_id):
+    snap = stats_ref(db, radiologist_id).get()
+    return snap.to_dict() if snap.exists else None
+
+
+def current_stats(db, radiologist_id):
+    """The radiologist's counters, rebuilt first if they never were."""
+    stats = load_stats(db, radiologist_id)
+    if stats is None or "RebuiltAt" not in stats:
+        stats = rebuild(db, radiologist_id)
+    return stats
+
+
+def rebuild(db, radiologist_id):
+    """Recompute one radiologist's counters from the Patients, MRI_Scans and Reports collections."""
+    from shared.queries import patients_for_radiologist, scans_for_patients
+
+    patients = patients_for_radiologist(db, radiologist_id)
+    scans_by_patient = scans_for_patients(db, [p.id for p in patients])
+
+    stats = {
+        "TotalPatients": len(patients),
+        "TotalScans": 0,
+        "TotalReports": len(list(
+            db.collection("Reports")
+            .where("CreatedBy", "==", f"/Radiologists/{radiologist_id}")
+            .stream()
+        )),
+        "TumorCounts": {},
+        "MonthlyUploads": {},
+        "GenderCounts": {},
+        "ConfidenceSum": 0.0,
+        "ConfidenceCount": 0,
+    }
+
+    for p in patients:
+        gender = (p.to_dict() or {}).get("Gender", "")
+        if gender:
+            stats["GenderCounts"][gender] = stats["GenderCounts"].get(gender, 0) + 1
+
+    for scans in scans_by_patient.values():
+        for s in scans:
+            sd = s.to_dict() or {}
+            stats["TotalScans"] += 1
+            tumor = sd.get("ClassificationResult", "Unknown")
+            stats["TumorCounts"][tumor] = stats["TumorCounts"].get(tumor, 0) + 1
+            upload_date = sd.get("UploadDate")
+            if isinstance(upload_date, datetime):
+                month = upload_date.strftime("%Y-%m")
+                stats["MonthlyUploads"][month] = stats["MonthlyUploads"].get(month, 0) + 1
+            conf = _confidence_fraction(sd.get("ConfidenceScore"))
+            if conf is not None:
+                stats["ConfidenceSum"] += conf
+                stats["ConfidenceCount"] += 1
+
+    stats["RebuiltAt"] = datetime.now()
+    stats_ref(db, radiologist_id).set(stats)
+    return stats
+
+
+def main(argv):
+    from shared.firebase_config import db
+
+    radiologist_ids = argv or [d.id for d in db.collection("Radiologists").stream()]
+    for rid in radiologist_ids:
+        stats = rebuild(db, rid)
+        print(f"{rid}: {stats['TotalPatients']} patients, {stats['TotalScans']} scans")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,76 @@
+"""One-off backfills for fields the app now maintains on write.
+
+    python -m shared.backfill scan-radiologist
+    python -m shared.backfill case-summary
+"""
+import sys
+
+from shared.case_summary import summarize
+from shared.queries import chunked
+
+BATCH_LIMIT = 500
+
+
+def backfill_scan_radiologist(db):
+    """Copy each patient's CreatedBy onto their MRI_Scans as RadiologistID."""
+    owners = {
+        p.id: (p.to_dict() or {}).get("CreatedBy")
+        for p in db.collection("Patients").stream()
+    }
+    updates = []
+    for s in db.collection("MRI_Scans").stream():
+        sd = s.to_dict() or {}
+        owner = owners.get((sd.get("PatientID") or "").split("/")[-1])
+        if owner and sd.get("RadiologistID") != owner:
+            updates.append((s.reference, {"RadiologistID": owner}))
+
+    for chunk in chunked(updates, BATCH_LIMIT):
+        batch = db.batch()
+        for ref, fields in chunk:
+            batch.update(ref, fields)
+        batch.commit()
+    return len(updates)
+
+
+def backfill_case_summary(db):
+    """Write ScanCount, LastScanAt and FirstDiagnosis on every case from its scans."""
+    scans_by_case = {}
+    for s in db.collection("MRI_Scans").select(["CaseID", "UploadDate", "ClassificationResult"]).stream():
+        sd = s.to_dict() or {}
+        case_id = (sd.get("CaseID") or "").split("/")[-1]
+        if case_id:
+            scans_by_case.setdefault(case_id, []).append(sd)
+
+    updates = []
+    for c in db.collection("Cases").select(["ScanCount", "LastScanAt", "FirstDiagnosis"]).stream():
+        cd = c.to_dict() or {}
+        summary = summarize(scans_by_case.get(c.id, []))
+        if any(cd.get(k) != v for k, v in summary.items()):
+            updates.append((c.reference, summary))
+
+    for chunk in chunked(updates, BATCH_LIMIT):
+        batch = db.batch()
+        for ref, fields in chunk:
+            batch.update(ref, fields)
+        batch.commit()
+    return len(updates)
+
+
+JOBS = {
+    "scan-radiologist": backfill_scan_radiologist,
+    "case-summary": backfill_case_summary,
+}
+
+
+def main(argv):
+    from shared.firebase_config import db
+
+    names = argv or list(JOBS)
+    for name in names:
+        if name not in JOBS:
+            sys.exit(f"Unknown backfill {name!r}; choose from {', '.join(JOBS)}")
+        print(f"{name}: {JOBS[name](db)} documents updated")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,224 @@
+"""Cascading deletes: patient -> cases -> scans -> files.
+
+Scans are removed in WriteBatches of at most 500 operations, each batch
+together with the dashboard-counter decrement for its scans (and, when a
+single case is deleted, the case's ScanCount), after their files have been
+deleted on a thread pool. Cases and finally the patient go last, so a run
+that fails part-way leaves the patient (or case) in place and running the
+same delete again picks up whatever is left. Run
+
+    python -m shared.cascade patient <patient_id>
+    python -m shared.cascade case <case_id>
+
+to delete from the command line.
+"""
+import glob
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from shared import media
+from shared.aggregates import radiologist_of, record_patient, record_scans
+from shared.case_summary import record_removed
+from shared.queries import chunked
+
+# Firestore rejects WriteBatches with more than 500 operations; two of them
+# are the counter update for the batch's scans and the case's ScanCount.
+BATCH_LIMIT = 500
+SCANS_PER_BATCH = BATCH_LIMIT - 2
+FILE_WORKERS = int(os.environ.get("DELETE_FILE_WORKERS", 8))
+
+# Only files below these folders are ever removed.
+FILE_ROOTS = (media.MEDIA_DIR, os.path.join("static", "uploads"))
+MASK_RENDER_DIR = media.MASK_RENDER_DIR
+# renders written before they moved out of static/
+LEGACY_MASK_RENDER_DIR = os.path.join("static", "uploads", "masks")
+
+SCAN_FIELDS = [
+    "ClassificationResult", "UploadDate", "ConfidenceScore", "ContentHash",
+    "MRIFilePath", "GradCAMPath", "SegmentationMaskPath",
+]
+
+
+def _within_roots(path):
+    path = os.path.abspath(path)
+    return any(path.startswith(os.path.abspath(root) + os.sep) for root in FILE_ROOTS)
+
+
+def _url_files(url):
+    """Local files behind an image URL stored on a scan: the file and, for media, its thumbnails."""
+    if not url or url.startswith("/scans/"):
+        return []
+    path = media.local_path(url.split("?")[0])
+    files = [path]
+    if url.startswith(media.MEDIA_URL):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for size in media.THUMB_SIZES:
+            for ext in (".png", ".jpg"):
+                files.append(os.path.join(media.MEDIA_DIR, "thumbs", str(size), stem + ext))
+    return files
+
+
+def _shared_urls(db, field, urls, deleting):
+    """The media URLs in `urls` still used by a scan that is not being deleted."""
+    shared = set()
+    for chunk in chunked(urls):
+        for s in db.collection("MRI_Scans").where(field, "in", chunk).select([field]).stream():
+            if s.id not in deleting:
+                shared.add((s.to_dict() or {}).get(field))
+    return shared
+
+
+def scan_files(db, scans, deleting):
+    """Files to remove for `scans` (id, data) pairs, keeping media shared with other scans."""
+    media_urls = {"MRIFilePath": set(), "GradCAMPath": set()}
+    for _, sd in scans:
+        for field, urls in media_urls.items():
+            if (sd.get(field) or "").startswith(media.MEDIA_URL):
+                urls.add(sd[field])
+    keep = set()
+    for field, urls in media_urls.items():
+        keep |= _shared_urls(db, field, urls, deleting)
+
+    files = []
+    for scan_id, sd in scans:
+        for field in ("MRIFilePath", "GradCAMPath", "SegmentationMaskPath"):
+            if sd.get(field) not in keep:
+                files += _url_files(sd.get(field))
+        for mask_dir in (MASK_RENDER_DIR, LEGACY_MASK_RENDER_DIR):
+            files.append(os.path.join(mask_dir, f"*_{scan_id}_*.png"))
+    return files
+
+
+def delete_unreferenced(db, field, urls, workers=FILE_WORKERS):
+    """Delete the files of media `urls` that no scan references in `field`; returns (removed, failed)."""
+    urls = {url for url in urls if (url or "").startswith(media.MEDIA_URL)}
+    if not urls:
+        return 0, 0
+    keep = _shared_urls(db, field, urls, deleting=set())
+    return delete_files([path for url in urls - keep for path in _url_files(url)], workers=workers)
+
+
+def _remove(pattern):
+    removed = failed = 0
+    for path in glob.glob(pattern) if "*" in pattern else [pattern]:
+        if not _within_roots(path):
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            failed += 1
+            print(f"⚠ Could not delete {path}: {e}")
+    return removed, failed
+
+
+def delete_files(paths, workers=FILE_WORKERS):
+    """Delete files (glob patterns allowed) on a thread pool; returns (removed, failed)."""
+    if not paths:
+        return 0, 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="delete") as pool:
+        results = list(pool.map(_remove, paths))
+    return sum(r for r, _ in results), sum(f for _, f in results)
+
+
+def _report(progress, stage, done, total, start=0, end=100):
+    if progress:
+        progress(stage, start + (end - start) * done / total if total else end)
+
+
+def delete_scans(db, query, radiologist_id, progress=None, start=0, end=90, file_workers=FILE_WORKERS,
+                 case_id=None):
+    """Delete every scan matched by `query`, with its files and counters.
+
+    With `case_id` (all scans belong to that existing case) its ScanCount is
+    decremented in the same batches.
+    """
+    scans = [(s.id, s.to_dict() or {}) for s in query.select(SCAN_FIELDS).stream()]
+    deleting = {scan_id for scan_id, _ in scans}
+    summary = {"scans": 0, "files_deleted": 0, "files_failed": 0}
+
+    for chunk in chunked(scans, SCANS_PER_BATCH):
+        removed, failed = delete_files(scan_files(db, chunk, deleting), workers=file_workers)
+        summary["files_deleted"] += removed
+        summary["files_failed"] += failed
+
+        batch = db.batch()
+        for scan_id, _ in chunk:
+            batch.delete(db.collection("MRI_Scans").document(scan_id))
+        record_scans(db, radiologist_id, [sd for _, sd in chunk], sign=-1, batch=batch)
+        record_removed(db, case_id, len(chunk), batch=batch)
+        batch.commit()
+
+        summary["scans"] += len(chunk)
+        _report(progress, "deleting scans", summary["scans"], len(scans), start, end)
+    return summary
+
+
+def delete_case(db, case_id, radiologist_id=None, progress=None, file_workers=FILE_WORKERS):
+    """Delete a case, its scans and their files. Safe to run again after a failure."""
+    snap = db.collection("Cases").document(case_id).get()
+    if radiologist_id is None:
+        patient_id = ((snap.to_dict() or {}).get("PatientID") or "").split("/")[-1] if snap.exists else None
+        patient = db.collection("Patients").document(patient_id).get() if patient_id else None
+        radiologist_id = radiologist_of(patient.to_dict() or {}) if patient and patient.exists else None
+
+    # a part-way failure leaves the case with the count of the scans it still has
+    query = db.collection("MRI_Scans").where("CaseID", "==", f"/Cases/{case_id}")
+    summary = delete_scans(db, query, radiologist_id, progress, 0, 95, file_workers,
+                           case_id=case_id if snap.exists else None)
+    db.collection("Cases").document(case_id).delete()
+    summary["cases"] = 1
+    _report(progress, "done", 1, 1)
+    return summary
+
+
+def delete_patient(db, patient_id, progress=None, file_workers=FILE_WORKERS):
+    """Delete a patient with all of their cases, scans and files. Safe to run again after a failure."""
+    patient_ref = db.collection("Patients").document(patient_id)
+    snap = patient_ref.get()
+    patient = (snap.to_dict() or {}) if snap.exists else {}
+    radiologist_id = radiologist_of(patient)
+
+    query = db.collection("MRI_Scans").where("PatientID", "==", f"/Patients/{patient_id}")
+    summary = delete_scans(db, query, radiologist_id, progress, 0, 90, file_workers)
+
+    cases = list(db.collection("Cases").where("PatientID", "==", f"/Patients/{patient_id}").select([]).stream())
+    for chunk in chunked(cases, BATCH_LIMIT):
+        batch = db.batch()
+        for case in chunk:
+            batch.delete(case.reference)
+        batch.commit()
+    summary["cases"] = len(cases)
+    _report(progress, "deleting patient", 95, 100)
+
+    if snap.exists:
+        batch = db.batch()
+        batch.delete(patient_ref)
+        record_patient(db, radiologist_id, patient, sign=-1, batch=batch)
+        batch.commit()
+        removed, failed = delete_files(_url_files(patient.get("ProfilePicture")), workers=1)
+        summary["files_deleted"] += removed
+        summary["files_failed"] += failed
+    _report(progress, "done", 1, 1)
+    return summary
+
+
+def main(argv):
+    from shared.firebase_config import db
+
+    if len(argv) != 2 or argv[0] not in ("patient", "case"):
+        sys.exit("usage: python -m shared.cascade patient|case <id>")
+    kind, doc_id = argv
+
+    def progress(stage, percent):
+        print(f"{stage}: {percent:.0f}%")
+
+    run = delete_patient if kind == "patient" else delete_case
+    print(run(db, doc_id, progress=progress))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
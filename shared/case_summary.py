@@ -0,0 +1,66 @@
+"""Scan summary kept on each Cases document: ScanCount, LastScanAt and FirstDiagnosis.
+
+The fields are queued on the same WriteBatch as the scans they describe, so
+a case never counts a scan that was not written, and the patient page can
+list cases without querying their scans. Deleting a case's scans
+(shared/cascade.py) decrements ScanCount batch by batch. Cases written
+before these fields existed are filled in by
+`python -m shared.backfill case-summary`.
+"""
+from datetime import datetime
+
+from firebase_admin import firestore
+
+
+def _upload_date(scan):
+    upload_date = scan.get("UploadDate")
+    return upload_date if isinstance(upload_date, datetime) else None
+
+
+def summarize(scans):
+    """The summary fields of a case holding exactly `scans` (dicts), e.g. for a backfill."""
+    dated = sorted((s for s in scans if _upload_date(s)), key=_upload_date)
+    return {
+        "ScanCount": len(scans),
+        "LastScanAt": _upload_date(dated[-1]) if dated else None,
+        "FirstDiagnosis": dated[0].get("ClassificationResult") if dated else None,
+    }
+
+
+def record_added(db, case_id, scans, case=None, batch=None):
+    """Count new `scans` on their existing case; the update fails if the case is missing.
+
+    `case` is the case's current data when the caller has it; FirstDiagnosis
+    is only written while the case has none. That check is not transactional:
+    two uploads racing on a case without one may both write it, and the last
+    commit wins. Both are then among the case's first scans, seconds apart,
+    and `python -m shared.backfill case-summary` recomputes the exact value,
+    so a transaction around every upload is not worth its extra latency.
+    """
+    if not case_id or not scans:
+        return
+    fields = {"ScanCount": firestore.Increment(len(scans))}
+    summary = summarize(scans)
+    # new scans are uploaded now, so they are always the case's latest
+    if summary["LastScanAt"] is not None:
+        fields["LastScanAt"] = summary["LastScanAt"]
+    if not (case or {}).get("FirstDiagnosis") and summary["FirstDiagnosis"]:
+        fields["FirstDiagnosis"] = summary["FirstDiagnosis"]
+
+    ref = db.collection("Cases").document(case_id)
+    if batch is not None:
+        batch.update(ref, fields)
+    else:
+        ref.update(fields)
+
+
+def record_removed(db, case_id, count, batch=None):
+    """Uncount `count` deleted scans of an existing case."""
+    if not case_id or not count:
+        return
+    ref = db.collection("Cases").document(case_id)
+    fields = {"ScanCount": firestore.Increment(-count)}
+    if batch is not None:
+        batch.update(ref, fields)
+    else:
+        ref.update(fields)
@@ -0,0 +1,431 @@
+"""The document store behind the app's `db`, swappable and instrumented.
+
+DATASTORE=firestore (the default) uses the Firebase project. DATASTORE=memory
+uses MemoryClient, an in-process stand-in for the Patients, Cases,
+MRI_Scans, Radiologists and Reports collections (and the app's own
+DashboardStats). It implements the part of the Firestore client API the app
+uses: documents, ==/in/range filters, ordering, start_after cursors,
+projections, get_all, WriteBatches, merges, dotted updates and Increment.
+Routes, benchmarks and profiling can then run without a live project.
+
+Either client is wrapped in CountingClient, which counts document reads and
+writes for the current request (flask.g) and in total. Like Firestore
+billing, a query that returns nothing still costs one read. The time spent
+in the client goes into the "firestore" span (shared/metrics.py).
+"""
+import copy
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import g, has_request_context
+
+from shared.metrics import add_span
+
+DATASTORE_BACKENDS = ("firestore", "memory")
+
+
+# ---------------------------------------------------------------- counting
+
+class OpCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {"reads": 0, "writes": 0}
+
+    def add(self, kind, n=1):
+        if not n:
+            return
+        with self._lock:
+            self.totals[kind] += n
+        if has_request_context():
+            ops = g.setdefault("_datastore_ops", {"reads": 0, "writes": 0})
+            ops[kind] += n
+
+    @staticmethod
+    def request_ops():
+        """Reads and writes made so far by the current request."""
+        if not has_request_context():
+            return {"reads": 0, "writes": 0}
+        return dict(g.get("_datastore_ops") or {"reads": 0, "writes": 0})
+
+
+_CHAINS = {
+    "collection": "collection", "document": "document", "where": "query", "order_by": "query",
+    "limit": "query", "start_after": "query", "select": "query", "offset": "query", "batch": "batch",
+}
+
+
+def _unwrap(value):
+    if isinstance(value, _Counted):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(v) for v in value)
+    return value
+
+
+class _Counted:
+    """Proxy that counts the reads and writes made through a client object."""
+
+    def __init__(self, target, counter, kind):
+        self._target = target
+        self._counter = counter
+        self._kind = kind
+        self._pending = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == "reference":
+            return _Counted(attr, self._counter, "document")
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            result = attr(*_unwrap(args), **{k: _unwrap(v) for k, v in kwargs.items()})
+            if name not in _CHAINS and name not in ("stream", "get_all"):
+                add_span("firestore", time.perf_counter() - started)
+            return self._after(name, result)
+
+        return call
+
+    def _snapshots(self, snaps, empty_read):
+        n = 0
+        waited = 0.0
+        snaps = iter(snaps)
+        while True:
+            started = time.perf_counter()
+            snap = next(snaps, None)
+            waited += time.perf_counter() - started
+            if snap is None:
+                break
+            n += 1
+            yield _Counted(snap, self._counter, "snapshot")
+        add_span("firestore", waited)
+        self._counter.add("reads", n or empty_read)
+
+    def _after(self, name, result):
+        if name in _CHAINS:
+            return _Counted(result, self._counter, _CHAINS[name])
+        if name == "stream":
+            return self._snapshots(result, 1)
+        if name == "get_all":
+            return self._snapshots(result, 0)
+        if name == "get" and self._kind == "document":
+            self._counter.add("reads")
+            return _Counted(result, self._counter, "snapshot")
+        if name == "get" and self._kind in ("query", "collection"):
+            return list(self._snapshots(result, 1))
+        if name in ("set", "update", "delete", "create", "add"):
+            if self._kind == "batch":
+                self._pending += 1
+            elif self._kind in ("document", "collection"):
+                self._counter.add("writes")
+        if name == "commit" and self._kind == "batch":
+            self._counter.add("writes", self._pending)
+            self._pending = 0
+        return result
+
+    def __iter__(self):
+        return iter(self._target)
+
+    def __repr__(self):
+        return f"Counted({self._target!r})"
+
+
+class CountingClient(_Counted):
+    def __init__(self, client, counter=None):
+        super().__init__(client, counter or OpCounter(), "client")
+
+    @property
+    def counter(self):
+        return self._counter
+
+
+# ---------------------------------------------------------------- in memory
+
+def _is_increment(value):
+    return type(value).__name__ == "Increment" and hasattr(value, "value")
+
+
+def _resolve(current, value):
+    """`value` with Increment transforms applied against `current`."""
+    if _is_increment(value):
+        return (current if isinstance(current, (int, float)) else 0) + value.value
+    if isinstance(value, dict):
+        base = current if isinstance(current, dict) else {}
+        return {k: _resolve(base.get(k), v) for k, v in value.items()}
+    return copy.deepcopy(value)
+
+
+def _merge(current, value):
+    out = dict(current)
+    for k, v in value.items():
+        if isinstance(v, dict) and not _is_increment(v) and isinstance(out.get(k), dict):
+            out[k] = _merge(out[k], v)
+        else:
+            out[k] = _resolve(out.get(k), v)
+    return out
+
+
+_MISSING = object()
+
+
+def _get_path(data, path):
+    for part in path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return _MISSING
+        data = data[part]
+    return data
+
+
+def _field(doc_id, data, path):
+    """A document's value for an order or cursor field; "__name__" is its id."""
+    return doc_id if path == "__name__" else _get_path(data, path)
+
+
+def _set_path(data, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        if not isinstance(data.get(part), dict):
+            data[part] = {}
+        data = data[part]
+    data[parts[-1]] = _resolve(data.get(parts[-1]), value)
+
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+class MemorySnapshot:
+    def __init__(self, reference, data, fields=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+        self._fields = fields
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        data = copy.deepcopy(self._data)
+        if self._fields is not None:
+            data = {k: v for k, v in data.items() if k in self._fields}
+        return data
+
+    def get(self, field):
+        value = _get_path(self._data or {}, field)
+        return None if value is _MISSING else copy.deepcopy(value)
+
+
+class MemoryDocument:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self.collection_name = collection
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    def get(self):
+        with self._client._lock:
+            return MemorySnapshot(self, self._client._docs(self.collection_name).get(self.id))
+
+    def set(self, data, merge=False):
+        with self._client._lock:
+            self._client._set(self, data, merge)
+
+    def update(self, fields):
+        with self._client._lock:
+            self._client._update(self, fields)
+
+    def delete(self):
+        with self._client._lock:
+            self._client._docs(self.collection_name).pop(self.id, None)
+
+
+class MemoryQuery:
+    def __init__(self, client, collection, filters=(), orders=(), limit=None, cursor=None, fields=None):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes):
+        args = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                    cursor=self._cursor, fields=self._fields)
+        args.update(changes)
+        return MemoryQuery(self._client, self._collection, **args)
+
+    def where(self, field, op, value):
+        if op not in _OPS:
+            raise ValueError(f"unsupported filter operator {op!r}")
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field, direction == "DESCENDING"),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, values):
+        if isinstance(values, MemorySnapshot):
+            values = values.to_dict()
+        return self._copy(cursor=values)
+
+    def select(self, fields):
+        return self._copy(fields=set(fields))
+
+    def _matches(self, data):
+        for field, op, value in self._filters:
+            current = _get_path(data, field)
+            if current is _MISSING:
+                return False
+            try:
+                if not _OPS[op](current, value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def _after_cursor(self, doc_id, data):
+        # compares (order field values..., id) lexicographically, like Firestore
+        for field, descending in self._orders:
+            if field not in self._cursor:
+                continue
+            a, b = _field(doc_id, data, field), self._cursor[field]
+            if field == "__name__":
+                b = getattr(b, "id", b).split("/")[-1]
+            if a == b:
+                continue
+            return (a < b) if descending else (a > b)
+        return False
+
+    def stream(self):
+        with self._client._lock:
+            docs = [(doc_id, copy.deepcopy(data)) for doc_id, data in self._client._docs(self._collection).items()
+                    if self._matches(data)]
+        # like Firestore, ordering on a field drops documents without it
+        for field, descending in reversed(self._orders):
+            docs = [d for d in docs if _field(d[0], d[1], field) is not _MISSING]
+            docs.sort(key=lambda d: _field(d[0], d[1], field), reverse=descending)
+        if self._cursor is not None:
+            docs = [d for d in docs if self._after_cursor(d[0], d[1])]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        for doc_id, data in docs:
+            yield MemorySnapshot(MemoryDocument(self._client, self._collection, doc_id), data, self._fields)
+
+    def get(self):
+        return list(self.stream())
+
+
+class MemoryCollection(MemoryQuery):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, doc_id=None):
+        return MemoryDocument(self._client, self._collection, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return datetime.now(), ref
+
+
+class MemoryBatch:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(("set", ref, data, merge))
+
+    def update(self, ref, fields):
+        self._ops.append(("update", ref, fields, None))
+
+    def delete(self, ref):
+        self._ops.append(("delete", ref, None, None))
+
+    def commit(self):
+        if len(self._ops) > 500:
+            raise ValueError("maximum 500 writes allowed per request")
+        with self._client._lock:
+            # like Firestore, a batch with an update of a missing document
+            # fails as a whole before anything is applied
+            exists = {}
+            for op, ref, data, merge in self._ops:
+                key = (ref.collection_name, ref.id)
+                if op == "update" and not exists.get(key, ref.id in self._client._docs(ref.collection_name)):
+                    raise KeyError(f"No document to update: {ref.path}")
+                exists[key] = op != "delete"
+            for op, ref, data, merge in self._ops:
+                if op == "set":
+                    self._client._set(ref, data, merge)
+                elif op == "update":
+                    self._client._update(ref, data)
+                else:
+                    self._client._docs(ref.collection_name).pop(ref.id, None)
+        self._ops = []
+
+
+class MemoryClient:
+    """Firestore stand-in keeping every collection in a dict."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._collections = {}
+
+    def _docs(self, collection):
+        return self._collections.setdefault(collection, {})
+
+    def _set(self, ref, data, merge):
+        docs = self._docs(ref.collection_name)
+        current = docs.get(ref.id) or {}
+        docs[ref.id] = _merge(current, data) if merge else _resolve({}, data)
+
+    def _update(self, ref, fields):
+        docs = self._docs(ref.collection_name)
+        if ref.id not in docs:
+            raise KeyError(f"No document to update: {ref.path}")
+        for path, value in fields.items():
+            _set_path(docs[ref.id], path, value)
+
+    def collection(self, name):
+        return MemoryCollection(self, name)
+
+    def batch(self):
+        return MemoryBatch(self)
+
+    def get_all(self, refs):
+        for ref in refs:
+            yield ref.get()
+
+    def clear(self):
+        with self._lock:
+            self._collections.clear()
+
+    def counts(self):
+        with self._lock:
+            return {name: len(docs) for name, docs in self._collections.items()}
+
+
+def open_client(backend="firestore"):
+    """A CountingClient over Firestore (the Firebase app must be initialised) or memory."""
+    if backend not in DATASTORE_BACKENDS:
+        raise ValueError(f"DATASTORE must be one of {', '.join(DATASTORE_BACKENDS)}")
+    if backend == "memory":
+        return CountingClient(MemoryClient())
+    from firebase_admin import firestore
+    return CountingClient(firestore.client())
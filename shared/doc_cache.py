@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_request_context
+
+
+class DocCache:
+    """Read-through cache for small, hot documents (Radiologists, Patients).
+
+    Lookups are memoized for the rest of the current request and kept in a
+    process-wide LRU for `ttl` seconds. Routes that write a cached document
+    must call invalidate() so the next read goes back to Firestore.
+    """
+
+    def __init__(self, db, ttl=30, max_entries=2048):
+        self.db = db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.request_hits = 0
+        self.process_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _memo():
+        if not has_request_context():
+            return None
+        if not hasattr(g, "_doc_memo"):
+            g._doc_memo = {}
+        return g._doc_memo
+
+    def get(self, collection, doc_id):
+        """Return a copy of the document's data, or None if it does not exist."""
+        key = (collection, doc_id)
+        memo = self._memo()
+        if memo is not None and key in memo:
+            self.request_hits += 1
+            data = memo[key]
+            return dict(data) if data is not None else None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.process_hits += 1
+                data = entry[1]
+            else:
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+            snap = self.db.collection(collection).document(doc_id).get()
+            data = (snap.to_dict() or {}) if snap.exists else None
+            with self._lock:
+                self._entries[key] = (now + self.ttl, data)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        if memo is not None:
+            memo[key] = data
+        return dict(data) if data is not None else None
+
+    def invalidate(self, collection, doc_id):
+        key = (collection, doc_id)
+        with self._lock:
+            self._entries.pop(key, None)
+        memo = self._memo()
+        if memo is not None:
+            memo.pop(key, None)
+
+    def stats(self):
+        lookups = self.request_hits + self.process_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "request_hits": self.request_hits,
+            "process_hits": self.process_hits,
+            "misses": self.misses,
+            "hit_rate": (self.request_hits + self.process_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,213 @@
+"""Bulk ingestion of every slice of one study into a case.
+
+The web route (/patients/<id>/cases/<id>/ingest) and the command line share
+ingest_study(). For backfills, run it over a local folder:
+
+    python -m shared.ingest path/to/slices --patient-id <id> --case-id <id>
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import zipfile
+from datetime import datetime
+
+from shared.aggregates import radiologist_of, record_scans
+from shared.case_summary import record_added
+from shared.measurements import record_points, series_point
+from shared.queries import chunked
+from shared.result_cache import content_hash
+from shared import media
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"}
+# Firestore rejects WriteBatches with more than 500 operations; four of them
+# are the batch's counters, case summary, measurements and LastMRIDate.
+BATCH_LIMIT = 500
+SCANS_PER_BATCH = BATCH_LIMIT - 4
+
+
+def is_image(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def collect_slices(folder):
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if is_image(name) and os.path.isfile(os.path.join(folder, name))
+    )
+
+
+def extract_zip(zip_path, dest_dir, prefix=""):
+    """Extract the image members of a zip into dest_dir, flattening any folders."""
+    paths = []
+    with zipfile.ZipFile(zip_path) as zf:
+        for info in zf.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or not is_image(name):
+                continue
+            dest = os.path.join(dest_dir, f"{prefix}{name}")
+            with zf.open(info) as src, open(dest, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            paths.append(dest)
+    return sorted(paths)
+
+
+def scan_id_for(case_id, digest):
+    """Scan id of a slice in a case, derived from its content so a re-run reuses it."""
+    return hashlib.sha256(f"{case_id}:{digest}".encode()).hexdigest()[:20]
+
+
+def ingest_study(db, cls_model, seg_model, paths, patient_id, case_id, radiologist_id=None,
+                 segment=True, cls_scheduler=None, seg_scheduler=None, batch_size=16, progress=None):
+    """Classify (and segment) every slice in `paths` and record them under one case.
+
+    `paths` are staging copies of the slices; they are stored in the media
+    store under content-addressed names and removed once the scans are
+    recorded. Each WriteBatch holds up to SCANS_PER_BATCH MRI_Scans documents
+    together with their dashboard counters, case summary and measurements, so
+    a study of up to ~490 slices is recorded atomically. A larger one takes
+    several batches and a failure can leave it part-written; scan ids come
+    from the case and the slice content, so ingesting the study again skips
+    the slices already recorded and counts only the rest.
+    """
+    from models.classification_model import classify_batch_with_gradcam
+    from models.segmentation_model import segment_batch
+    from models.masks import mask_url, measure
+
+    if radiologist_id is None:
+        patient = db.collection("Patients").document(patient_id).get()
+        radiologist_id = radiologist_of(patient.to_dict() or {}) if patient.exists else None
+    case_snap = db.collection("Cases").document(case_id).get()
+    if not case_snap.exists:
+        # the case summary and measurements are updates of an existing case
+        raise ValueError(f"case {case_id} does not exist")
+    case = case_snap.to_dict() or {}
+
+    slices = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            digest = content_hash(f.read())
+        slices.setdefault(scan_id_for(case_id, digest), (path, digest))
+    refs = [db.collection("MRI_Scans").document(scan_id) for scan_id in slices]
+    recorded = {snap.id for snap in db.get_all(refs) if snap.exists}
+    scan_ids = [scan_id for scan_id in slices if scan_id not in recorded]
+    todo = [slices[scan_id][0] for scan_id in scan_ids]
+
+    classified = []
+    masks = {}
+    if todo:
+        if progress:
+            progress("classifying", 10)
+        classified = classify_batch_with_gradcam(cls_model, todo, scheduler=cls_scheduler, batch_size=batch_size)
+
+    if todo and segment:
+        if progress:
+            progress("segmenting", 50)
+        tumor_idx = [i for i, c in enumerate(classified) if c[0] != "no_tumor"]
+        segmented = segment_batch(
+            seg_model, [todo[i] for i in tumor_idx],
+            scheduler=seg_scheduler, batch_size=max(1, batch_size // 2)
+        )
+        masks = dict(zip(tumor_idx, segmented))
+
+    if progress:
+        progress("saving", 80)
+    now = datetime.now()
+    results = []
+    new_scans = []
+    points = {}
+    for i, (path, scan_id, (tumor_type, confidence, _, gradcam_url, _, cam)) in enumerate(
+            zip(todo, scan_ids, classified)):
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = slices[scan_id][1]
+        scan = {
+            "ScanID": scan_id,
+            "PatientID": f"/Patients/{patient_id}",
+            "CaseID": f"/Cases/{case_id}",
+            "MRIFilePath": media.put(data, os.path.splitext(path)[1], digest=digest),
+            "SegmentationMaskPath": mask_url(scan_id, masks[i]["mask"]) if i in masks else None,
+            "SegmentationMask": masks[i]["mask"] if i in masks else None,
+            "MaskStats": masks[i]["stats"] if i in masks else None,
+            "GradCAMPath": gradcam_url,
+            "GradCAMMap": cam,
+            "Measurements": measure(masks[i], cam) if i in masks else None,
+            "ClassificationResult": tumor_type,
+            "ConfidenceScore": confidence,
+            "QuickDescription": f"Detected {tumor_type} with {confidence:.1f}% confidence",
+            "ContentHash": digest,
+            "RadiologistID": f"/Radiologists/{radiologist_id}" if radiologist_id else None,
+            "UploadDate": now,
+            "UploadDateStr": now.strftime("%d %b %Y %H:%M")
+        }
+        if i in masks:
+            points[scan_id] = series_point(scan, scan["Measurements"])
+        new_scans.append(scan)
+        results.append({
+            "scan_id": scan_id,
+            "file": os.path.basename(path),
+            "tumor_type": tumor_type,
+            "confidence": confidence,
+            "gradcam": scan["GradCAMPath"],
+            "mask": scan["SegmentationMaskPath"],
+            "measurements": scan["Measurements"],
+        })
+
+    patient_ref = db.collection("Patients").document(patient_id)
+    for chunk in chunked(new_scans, SCANS_PER_BATCH):
+        batch = db.batch()
+        for scan in chunk:
+            batch.set(db.collection("MRI_Scans").document(scan["ScanID"]), scan)
+        record_scans(db, radiologist_id, chunk, batch=batch)
+        record_points(db, case_id, {s["ScanID"]: points[s["ScanID"]] for s in chunk if s["ScanID"] in points},
+                      batch=batch)
+        record_added(db, case_id, chunk, case=case, batch=batch)
+        batch.update(patient_ref, {"LastMRIDate": now.strftime("%Y-%m-%d")})
+        batch.commit()
+        case = dict(case, FirstDiagnosis=case.get("FirstDiagnosis") or chunk[0].get("ClassificationResult"))
+    for path in paths:
+        os.remove(path)
+
+    return {"status": "success", "count": len(results), "skipped": len(paths) - len(results), "scans": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a folder or zip of MRI slices into one case.")
+    parser.add_argument("source", help="folder of slices or a .zip file")
+    parser.add_argument("--patient-id", required=True)
+    parser.add_argument("--case-id", required=True)
+    parser.add_argument("--upload-folder", default="static/uploads", help="staging folder for the slices")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--no-segment", action="store_true")
+    args = parser.parse_args()
+
+    from shared.firebase_config import db
+    from models.classification_model import load_classifier_model
+    from models.segmentation_model import load_segmentation_model
+
+    os.makedirs(args.upload_folder, exist_ok=True)
+    prefix = f"{args.case_id}_"
+    if zipfile.is_zipfile(args.source):
+        paths = extract_zip(args.source, args.upload_folder, prefix=prefix)
+    else:
+        paths = []
+        for src in collect_slices(args.source):
+            dest = os.path.join(args.upload_folder, prefix + os.path.basename(src))
+            shutil.copyfile(src, dest)
+            paths.append(dest)
+
+    if not paths:
+        raise SystemExit(f"No image slices found in {args.source}")
+
+    result = ingest_study(
+        db, load_classifier_model(), None if args.no_segment else load_segmentation_model(),
+        paths, args.patient_id, args.case_id,
+        segment=not args.no_segment, batch_size=args.batch_size
+    )
+    for scan in result["scans"]:
+        print(f"{scan['file']}: {scan['tumor_type']} ({scan['confidence']:.1f}%) -> {scan['scan_id']}")
+    print(f"Ingested {result['count']} slices ({result['skipped']} already recorded)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Jobs persisted in a local SQLite file so they survive a restart.
+
+    Several app processes may share the file. A job runs in the process that
+    claims it (queued -> running, recording its pid), so no job runs twice.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+            "stage TEXT, progress INTEGER NOT NULL DEFAULT 0, params TEXT NOT NULL, "
+            "result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, owner INTEGER)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+        self._conn.commit()
+
+    def create(self, kind, params):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, stage, progress, params, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', 'queued', 0, ?, ?, ?)",
+                (job_id, kind, json.dumps(params), now, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def claim(self, job_id):
+        """Mark a queued job running in this process; False if another process got it first."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = 'running', stage = 'started', owner = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (os.getpid(), time.time(), job_id),
+            )
+            self._conn.commit()
+        return cur.rowcount == 1
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, stage, progress, params, result, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "stage": row[3],
+            "progress": row[4],
+            "params": json.loads(row[5]),
+            "result": json.loads(row[6]) if row[6] else None,
+            "error": row[7],
+            "created_at": row[8],
+            "updated_at": row[9],
+        }
+
+    def requeue_orphans(self):
+        """Requeue jobs left running by a process that has exited; returns the queued job ids.
+
+        Called at startup, before this process has claimed anything.
+        """
+        with self._lock:
+            running = self._conn.execute("SELECT id, owner FROM jobs WHERE status = 'running'").fetchall()
+            for job_id, owner in running:
+                # our own pid can only be a previous process's, e.g. pid 1 in a restarted container
+                if owner is None or owner == os.getpid() or not _alive(owner):
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'queued', stage = 'queued', progress = 0, owner = NULL, "
+                        "updated_at = ? WHERE id = ? AND status = 'running' AND owner IS ?",
+                        (time.time(), job_id, owner),
+                    )
+            self._conn.commit()
+            rows = self._conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [r[0] for r in rows]
+
+
+class JobQueue:
+    """Runs registered job kinds on a thread pool and records stage-by-stage progress.
+
+    A handler is called as `fn(params, progress)` where `progress(stage, percent)`
+    reports where it is; its return value becomes the job result.
+    """
+
+    def __init__(self, store, workers=2):
+        self.store = store
+        self._handlers = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def register(self, kind, fn):
+        self._handlers[kind] = fn
+
+    def submit(self, kind, params):
+        job_id = self.store.create(kind, params)
+        self._pool.submit(self._run, job_id)
+        return job_id
+
+    def wait(self, job_id, timeout, interval=0.05):
+        """Poll until the job is done or failed, for at most `timeout` seconds; returns the job."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.store.get(job_id)
+            if job is None or job["status"] in ("done", "failed") or time.monotonic() >= deadline:
+                return job
+            time.sleep(interval)
+
+    def resume(self):
+        """Pick up queued jobs and those left running by a process that stopped.
+
+        Another live process may resume the same jobs; each runs only where it is claimed.
+        """
+        job_ids = self.store.requeue_orphans()
+        for job_id in job_ids:
+            self._pool.submit(self._run, job_id)
+        return len(job_ids)
+
+    def _run(self, job_id):
+        if not self.store.claim(job_id):
+            return
+        job = self.store.get(job_id)
+
+        def progress(stage, percent):
+            self.store.update(job_id, stage=stage, progress=int(percent))
+
+        try:
+            result = self._handlers[job["kind"]](job["params"], progress)
+        except Exception as e:
+            self.store.update(job_id, status="failed", stage="failed", error=str(e))
+            print(f"⚠ Job {job_id} failed: {e}")
+            return
+        self.store.update(job_id, status="done", stage="done", progress=100, result=result)
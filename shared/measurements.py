@@ -0,0 +1,87 @@
+"""Per-case tumour time series kept on the Cases document.
+
+Every segmented scan writes one point under Cases/<id>.Measurements.<scan id>
+with a field update, so the series grows without reading the case first and
+re-segmenting a scan replaces its point. A case page gets the whole curve
+from the case document it already reads; case_series() turns the per-slice
+points into one point per study.
+"""
+from datetime import datetime
+
+
+def case_ref_id(case_ref):
+    if isinstance(case_ref, str):
+        return case_ref.split("/")[-1] or None
+    return getattr(case_ref, "id", None)
+
+
+def series_point(scan, measurements):
+    return {
+        "UploadDate": scan.get("UploadDate"),
+        "TumorType": scan.get("ClassificationResult"),
+        "area_px": measurements.get("area_px"),
+        "area_fraction": measurements.get("area_fraction"),
+        "gradcam_mean": measurements.get("gradcam_mean"),
+    }
+
+
+def record_points(db, case_id, points, batch=None):
+    """Add or replace the points {scan id: series_point(...)} of an existing case.
+
+    Fails (like any update) when the case does not exist, rather than
+    creating a case document holding nothing but measurements.
+    """
+    if not case_id or not points:
+        return
+    ref = db.collection("Cases").document(case_id)
+    # scan ids are alphanumeric, so they are valid field path segments
+    fields = {f"Measurements.{scan_id}": point for scan_id, point in points.items()}
+    if batch is not None:
+        batch.update(ref, fields)
+    else:
+        ref.update(fields)
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def case_series(case):
+    """The case's studies oldest first, each with the area change from the previous one in percent.
+
+    Slices ingested together share one UploadDate and form one study, so a
+    point sums the tumour area of all of a study's slices (and averages the
+    per-slice fractions and Grad-CAM means) before studies are compared.
+    """
+    studies = {}
+    for scan_id, point in (case.get("Measurements") or {}).items():
+        upload_date = point.get("UploadDate")
+        key = upload_date if isinstance(upload_date, datetime) else None
+        studies.setdefault(key, []).append(dict(point, scan_id=scan_id))
+
+    points = []
+    for upload_date, slices in sorted(studies.items(), key=lambda s: s[0] or datetime.min):
+        areas = [p["area_px"] for p in slices if p.get("area_px") is not None]
+        tumor_types = [p["TumorType"] for p in slices if p.get("TumorType")]
+        points.append({
+            "UploadDate": upload_date,
+            "Date": upload_date.strftime("%Y-%m-%d %H:%M") if upload_date else "",
+            "scan_ids": sorted(p["scan_id"] for p in slices),
+            "slices": len(slices),
+            "TumorType": max(set(tumor_types), key=tumor_types.count) if tumor_types else None,
+            "area_px": sum(areas) if areas else None,
+            "area_fraction": _mean(p.get("area_fraction") for p in slices),
+            "gradcam_mean": _mean(p.get("gradcam_mean") for p in slices),
+        })
+
+    previous = None
+    for point in points:
+        area = point["area_px"]
+        if previous and area is not None:
+            point["change_pct"] = round((area - previous) / previous * 100, 1)
+        else:
+            point["change_pct"] = None
+        if area:
+            previous = area
+    return points
@@ -0,0 +1,122 @@
+"""Content-addressed storage and serving of scan images.
+
+Originals and Grad-CAM overlays are stored once under MEDIA_DIR as
+<sha256><ext> and served from /media/<name>. A name never changes content,
+so responses carry the digest as ETag and a year-long private, immutable
+Cache-Control, and repeat views cost nothing. They are patient images, so
+the app serves them to logged-in radiologists only and shared caches must
+not keep them. Thumbnails are generated on first request and kept under
+MEDIA_DIR/thumbs/<size>/, and mask PNGs under MASK_RENDER_DIR; neither is
+below static/, so every image goes through a route that checks the session.
+Conditional and Range requests are answered by send_file().
+"""
+import io
+import os
+import re
+import tempfile
+
+from PIL import Image
+
+from shared.result_cache import content_hash
+
+MEDIA_DIR = os.environ.get("MEDIA_DIR", "media")
+MEDIA_URL = "/media/"
+THUMB_SIZES = (128, 256, 512)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MASK_RENDER_DIR = os.path.join(MEDIA_DIR, "masks")
+
+_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+
+
+def is_media_name(name):
+    return bool(_NAME.match(name or ""))
+
+
+def media_name(digest, ext):
+    return f"{digest}{ext.lower()}"
+
+
+def media_path(name):
+    return os.path.join(MEDIA_DIR, name)
+
+
+def media_url(name):
+    return f"{MEDIA_URL}{name}"
+
+
+def local_path(url):
+    """Filesystem path of an image URL stored on a scan (media or legacy /static path)."""
+    if url.startswith(MEDIA_URL):
+        return media_path(url[len(MEDIA_URL):])
+    return url.lstrip("/")
+
+
+def write_atomic(path, data):
+    """Write `data` to `path` through a temp file of its own.
+
+    Every path here names one content, so a path that already exists counts
+    as written and concurrent writers of the same path cannot fail each other.
+    """
+    if os.path.exists(path):
+        return
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def put(data, ext, digest=None):
+    """Store `data` unless an identical file exists; returns its media URL."""
+    name = media_name(digest or content_hash(data), ext)
+    path = media_path(name)
+    if not os.path.exists(path):
+        write_atomic(path, data)
+    return media_url(name)
+
+
+def thumbnail_url(url, size=256):
+    """URL of a `size` px thumbnail for media URLs; other URLs are returned unchanged."""
+    if not url or not url.startswith(MEDIA_URL) or size not in THUMB_SIZES:
+        return url
+    return f"{MEDIA_URL}thumbs/{size}/{url[len(MEDIA_URL):]}"
+
+
+def thumbnail_path(name, size):
+    """Path of the thumbnail of media `name`, rendering it first if needed. None if the original is missing."""
+    stem, ext = os.path.splitext(name)
+    fmt = "JPEG" if ext in (".jpg", ".jpeg") else "PNG"
+    path = os.path.join(MEDIA_DIR, "thumbs", str(size), stem + (".jpg" if fmt == "JPEG" else ".png"))
+    if os.path.exists(path):
+        return path
+    original = media_path(name)
+    if not os.path.exists(original):
+        return None
+
+    img = Image.open(original)
+    img.thumbnail((size, size))
+    if fmt == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, optimize=True)
+    write_atomic(path, buf.getvalue())
+    return path
+
+
+def send_media(path, etag, immutable=True):
+    """send_file() with the ETag and, for versioned URLs, immutable caching."""
+    from flask import send_file
+
+    resp = send_file(path, conditional=True, etag=etag)
+    if immutable:
+        # patient images: browsers may keep them, shared caches must not
+        resp.headers["Cache-Control"] = f"private, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
@@ -0,0 +1,220 @@
+"""Request instrumentation: spans, Prometheus metrics, Server-Timing and an opt-in profiler.
+
+    with span("classify"):
+        ...
+
+times a block. Inside a request the time is added to that request's
+Server-Timing header; it always goes into the span_seconds histogram served
+as Prometheus text from /metrics. init_app() installs the before/after
+request hooks that time every request and count its datastore reads and
+writes (shared/datastore.py).
+
+With PROFILE_REQUESTS=1, a request carrying ?_profile=1 is sampled every
+PROFILE_INTERVAL_MS by a background thread and its stacks are written to
+PROFILE_DIR in the folded format read by flamegraph.pl and speedscope.
+The dump's path is returned in the X-Profile header.
+"""
+import bisect
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import Response, g, has_request_context, request
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "cache/profiles")
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {
+    "http_requests_total": ("counter", "Requests served, by endpoint, method and status."),
+    "http_request_duration_seconds": ("histogram", "Request latency, by endpoint and method."),
+    "span_seconds": ("histogram", "Time spent in instrumented spans."),
+    "datastore_reads_total": ("counter", "Datastore document reads, by endpoint."),
+    "datastore_writes_total": ("counter", "Datastore document writes, by endpoint."),
+    "model_forward_seconds": ("histogram", "Time of one batched model forward pass."),
+    "model_batch_size": ("histogram", "Images per batched model forward pass."),
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=BUCKETS, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        i = bisect.bisect_left(hist["buckets"], value)
+        if i < len(hist["counts"]):
+            hist["counts"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+def _labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: dict(v, counts=list(v["counts"])) for k, v in _histograms.items()}
+
+    lines = []
+    described = set()
+
+    def describe(name, kind):
+        if name in described:
+            return
+        described.add(name)
+        kind, text = _help.get(name, (kind, ""))
+        if text:
+            lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name, "counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), hist in sorted(histograms.items()):
+        describe(name, "histogram")
+        cumulative = 0
+        for le, n in zip(hist["buckets"], hist["counts"]):
+            cumulative += n
+            lines.append(f"{name}_bucket{_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {hist['count']}")
+        lines.append(f"{name}_sum{_labels(labels)} {hist['sum']:.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def add_span(name, seconds):
+    """Record `seconds` spent in span `name`, for callers that time themselves."""
+    observe("span_seconds", seconds, span=name)
+    if has_request_context():
+        spans = g.setdefault("_spans", {})
+        spans[name] = spans.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_span(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+class SamplingProfiler:
+    """Samples one thread's stack every `interval` seconds from a background thread."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            for stack, n in self.samples.most_common():
+                f.write(f"{stack} {n}\n")
+        return path
+
+
+def _server_timing(spans, total, ops):
+    parts = [f'{name.replace(" ", "_")};dur={seconds * 1000:.1f}' for name, seconds in spans.items()]
+    if ops is not None:
+        parts.append(f'datastore;desc="reads={ops["reads"]} writes={ops["writes"]}"')
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def init_app(app, counter=None):
+    """Time every request of `app`, count its datastore ops on `counter` and serve /metrics."""
+
+    @app.before_request
+    def _start_request():
+        g._request_started = time.perf_counter()
+        if PROFILE_REQUESTS and request.args.get("_profile") == "1":
+            g._profiler = SamplingProfiler(threading.get_ident()).start()
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.get("_request_started")
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+        if endpoint != "metrics":
+            inc("http_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+            observe("http_request_duration_seconds", total, endpoint=endpoint, method=request.method)
+
+        ops = counter.request_ops() if counter is not None else None
+        if ops:
+            inc("datastore_reads_total", ops["reads"], endpoint=endpoint)
+            inc("datastore_writes_total", ops["writes"], endpoint=endpoint)
+        response.headers["Server-Timing"] = _server_timing(g.get("_spans") or {}, total, ops)
+
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            name = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{endpoint}.folded"
+            response.headers["X-Profile"] = profiler.dump(os.path.join(PROFILE_DIR, name))
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,206 @@
+"""Local search index behind the /patients list.
+
+Each radiologist's patients are loaded from Firestore into an in-memory
+SQLite database on their first search and re-read after `ttl` seconds, so a
+search, a filter or the next page costs no Firestore reads. The app's own
+writes (add, profile edits, new scans, deletes) update the index in place
+through put(), update() and remove().
+
+The index is per process. With several app processes, a write made through
+one of them reaches the others' indexes only when those reload, so another
+process can show a stale list for up to `ttl` seconds (PATIENT_INDEX_TTL).
+Lower it if several workers serve the same radiologists; each reload costs
+one Firestore read per patient.
+
+Names and ids are searched by substring through an FTS5 trigram index;
+queries shorter than a trigram fall back to LIKE over the radiologist's
+rows. The trigram tokenizer needs SQLite 3.34 or newer. With an older
+SQLite, or one built without FTS5, every query uses LIKE, which gives the
+same matches with a scan of the radiologist's rows. TumorType and LastMRIDate ("YYYY-MM-DD") are filtered with SQL, and
+facet counts by tumour type ignore the tumour filter so every option shows
+how many patients picking it would give.
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+
+# fields the patients page shows; everything else stays in Firestore
+CARD_FIELDS = ("FullName", "Age", "Gender", "TumorType", "LastMRIDate")
+
+
+def _radiologist(data):
+    created_by = data.get("CreatedBy") or ""
+    return created_by.split("/")[-1] or None
+
+
+def _like(text):
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class PatientIndex:
+    def __init__(self, db, ttl=600):
+        self.db = db
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE patients ("
+            " id TEXT PRIMARY KEY, radiologist TEXT NOT NULL, full_name TEXT NOT NULL,"
+            " tumor_type TEXT NOT NULL, last_mri TEXT NOT NULL, card TEXT NOT NULL);"
+            "CREATE INDEX patients_by_radiologist ON patients (radiologist, full_name COLLATE NOCASE);"
+            "CREATE TABLE loaded (radiologist TEXT PRIMARY KEY, loaded_at REAL NOT NULL);"
+        )
+        try:
+            self._conn.execute("CREATE VIRTUAL TABLE patients_fts USING fts5(id, full_name, tokenize='trigram')")
+            self.trigram = True
+        except sqlite3.OperationalError as e:
+            print(f"⚠ SQLite {sqlite3.sqlite_version} has no FTS5 trigram tokenizer ({e}); "
+                  "patient search falls back to LIKE")
+            self.trigram = False
+        self.loads = 0
+        self.searches = 0
+
+    # -- writes, callers hold self._lock
+
+    def _delete(self, patient_id):
+        row = self._conn.execute("SELECT rowid FROM patients WHERE id = ?", (patient_id,)).fetchone()
+        if row:
+            if self.trigram:
+                self._conn.execute("DELETE FROM patients_fts WHERE rowid = ?", (row[0],))
+            self._conn.execute("DELETE FROM patients WHERE rowid = ?", (row[0],))
+
+    def _insert(self, patient_id, radiologist, card):
+        self._delete(patient_id)
+        cur = self._conn.execute(
+            "INSERT INTO patients (id, radiologist, full_name, tumor_type, last_mri, card) VALUES (?, ?, ?, ?, ?, ?)",
+            (patient_id, radiologist, str(card.get("FullName") or ""), str(card.get("TumorType") or ""),
+             str(card.get("LastMRIDate") or ""), json.dumps(card, default=str)),
+        )
+        if self.trigram:
+            self._conn.execute(
+                "INSERT INTO patients_fts (rowid, id, full_name) VALUES (?, ?, ?)",
+                (cur.lastrowid, patient_id, str(card.get("FullName") or "")),
+            )
+
+    def _is_loaded(self, radiologist):
+        row = self._conn.execute("SELECT loaded_at FROM loaded WHERE radiologist = ?", (radiologist,)).fetchone()
+        return bool(row) and time.time() - row[0] < self.ttl
+
+    def _load(self, radiologist):
+        from shared.queries import patients_for_radiologist
+
+        patients = patients_for_radiologist(self.db, radiologist)
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute("SELECT id FROM patients WHERE radiologist = ?", (radiologist,))]
+            for patient_id in ids:
+                self._delete(patient_id)
+            for p in patients:
+                data = p.to_dict() or {}
+                self._insert(p.id, radiologist, {k: data.get(k, "") for k in CARD_FIELDS})
+            self._conn.execute("INSERT OR REPLACE INTO loaded VALUES (?, ?)", (radiologist, time.time()))
+            self._conn.commit()
+            self.loads += 1
+
+    # -- public API
+
+    def put(self, patient_id, data):
+        """Index a patient document written by the app (full data, including CreatedBy)."""
+        radiologist = _radiologist(data)
+        if not radiologist:
+            return
+        with self._lock:
+            if self._is_loaded(radiologist):
+                self._insert(patient_id, radiologist, {k: data.get(k, "") for k in CARD_FIELDS})
+                self._conn.commit()
+
+    def update(self, patient_id, fields):
+        """Apply a partial update of a patient; ignored unless the patient is indexed."""
+        if not any(k in fields for k in CARD_FIELDS):
+            return
+        with self._lock:
+            row = self._conn.execute("SELECT radiologist, card FROM patients WHERE id = ?", (patient_id,)).fetchone()
+            if row:
+                card = json.loads(row[1])
+                card.update({k: fields[k] for k in CARD_FIELDS if k in fields})
+                self._insert(patient_id, row[0], card)
+                self._conn.commit()
+
+    def reload(self, patient_id):
+        """Re-read one patient from Firestore, e.g. after a write made outside the request."""
+        snap = self.db.collection("Patients").document(patient_id).get()
+        if snap.exists:
+            self.put(patient_id, snap.to_dict() or {})
+        else:
+            self.remove(patient_id)
+
+    def remove(self, patient_id):
+        with self._lock:
+            self._delete(patient_id)
+            self._conn.commit()
+
+    def invalidate(self, radiologist):
+        """Reload the radiologist's patients from Firestore on their next search."""
+        with self._lock:
+            self._conn.execute("DELETE FROM loaded WHERE radiologist = ?", (radiologist,))
+            self._conn.commit()
+
+    def search(self, radiologist, q="", tumor="", date_from="", date_to="", page=1, per_page=20):
+        """One page of the radiologist's patients matching the filters, ordered by name.
+
+        Returns {"patients": [card + id], "total", "page", "pages", "facets": {"TumorType": {type: n}}}.
+        """
+        with self._lock:
+            loaded = self._is_loaded(radiologist)
+        if not loaded:
+            self._load(radiologist)
+
+        where, args = ["p.radiologist = ?"], [radiologist]
+        q = (q or "").strip()
+        if len(q) >= 3 and self.trigram:
+            where.append("p.rowid IN (SELECT rowid FROM patients_fts WHERE patients_fts MATCH ?)")
+            args.append('"' + q.replace('"', '""') + '"')
+        elif q:
+            where.append("(p.full_name LIKE ? ESCAPE '\\' OR p.id LIKE ? ESCAPE '\\')")
+            args += [_like(q), _like(q)]
+        if date_from:
+            where.append("p.last_mri != '' AND p.last_mri >= ?")
+            args.append(date_from)
+        if date_to:
+            where.append("p.last_mri != '' AND p.last_mri <= ?")
+            args.append(date_to)
+
+        base = " AND ".join(where)
+        page = max(1, int(page or 1))
+        with self._lock:
+            facets = dict(self._conn.execute(
+                f"SELECT p.tumor_type, COUNT(*) FROM patients p WHERE {base} AND p.tumor_type != '' "
+                "GROUP BY p.tumor_type ORDER BY p.tumor_type", args
+            ).fetchall())
+            if tumor:
+                base += " AND p.tumor_type = ?"
+                args.append(tumor)
+            total = self._conn.execute(f"SELECT COUNT(*) FROM patients p WHERE {base}", args).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT p.id, p.card FROM patients p WHERE {base} "
+                "ORDER BY p.full_name COLLATE NOCASE, p.id LIMIT ? OFFSET ?",
+                args + [per_page, (page - 1) * per_page],
+            ).fetchall()
+            self.searches += 1
+
+        patients = [dict(json.loads(card), id=patient_id) for patient_id, card in rows]
+        return {
+            "patients": patients,
+            "total": total,
+            "page": page,
+            "pages": max(1, math.ceil(total / per_page)),
+            "facets": {"TumorType": facets},
+        }
+
+    def stats(self):
+        with self._lock:
+            indexed = self._conn.execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+            radiologists = self._conn.execute("SELECT COUNT(*) FROM loaded").fetchone()[0]
+        return {"patients": indexed, "radiologists": radiologists, "loads": self.loads,
+                "searches": self.searches, "ttl_seconds": self.ttl, "trigram": self.trigram}
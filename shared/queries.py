@@ -0,0 +1,119 @@
+import base64
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from firebase_admin import firestore
+
+# Firestore allows at most 30 values in an "in" filter.
+IN_QUERY_LIMIT = 30
+
+
+def chunked(items, size=IN_QUERY_LIMIT):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def patients_for_radiologist(db, radiologist_id):
+    return list(
+        db.collection("Patients")
+        .where("CreatedBy", "==", f"/Radiologists/{radiologist_id}")
+        .stream()
+    )
+
+
+def scans_for_patients(db, patient_ids):
+    """All MRI_Scans for the given patients, fetched with batched "in" queries.
+
+    Returns {patient_id: [scan snapshot, ...]}.
+    """
+    by_patient = {pid: [] for pid in patient_ids}
+    for chunk in chunked(f"/Patients/{pid}" for pid in patient_ids):
+        for s in db.collection("MRI_Scans").where("PatientID", "in", chunk).stream():
+            pid = (s.to_dict() or {}).get("PatientID", "").split("/")[-1]
+            if pid in by_patient:
+                by_patient[pid].append(s)
+    return by_patient
+
+
+def patient_ref_id(patient_ref):
+    if isinstance(patient_ref, str):
+        return patient_ref.split("/")[-1] or None
+    if hasattr(patient_ref, "id"):
+        return patient_ref.id
+    return None
+
+
+_NAME_CACHE_SIZE = 1024
+_patient_names = OrderedDict()
+_names_lock = threading.Lock()
+
+
+def patient_names(db, patient_ids):
+    """FullName for each patient id, resolved with one get_all for the ids not cached yet."""
+    names = {}
+    missing = []
+    with _names_lock:
+        for pid in set(patient_ids):
+            if pid in _patient_names:
+                _patient_names.move_to_end(pid)
+                names[pid] = _patient_names[pid]
+            else:
+                missing.append(pid)
+
+    if missing:
+        refs = [db.collection("Patients").document(pid) for pid in missing]
+        fetched = {snap.id: (snap.to_dict() or {}).get("FullName", "") if snap.exists else ""
+                   for snap in db.get_all(refs)}
+        with _names_lock:
+            for pid in missing:
+                names[pid] = fetched.get(pid, "")
+                _patient_names[pid] = names[pid]
+            while len(_patient_names) > _NAME_CACHE_SIZE:
+                _patient_names.popitem(last=False)
+    return names
+
+
+def forget_patient_name(patient_id):
+    with _names_lock:
+        _patient_names.pop(patient_id, None)
+
+
+def encode_cursor(upload_date, doc_id):
+    payload = json.dumps({"t": upload_date.isoformat(), "id": doc_id}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """(UploadDate, document id) of the last scan of the previous page."""
+    padded = token + "=" * (-len(token) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return datetime.fromisoformat(payload["t"]), str(payload["id"])
+
+
+def scans_page(db, radiologist_id, cursor=None, limit=5):
+    """One page of the radiologist's scans, newest first.
+
+    Returns (scan snapshots, next cursor token or None). Scans of one study
+    share an UploadDate, so the document id breaks ties and the cursor
+    resumes from (UploadDate, id).
+    """
+    query = (
+        db.collection("MRI_Scans")
+        .where("RadiologistID", "==", f"/Radiologists/{radiologist_id}")
+        .order_by("UploadDate", direction=firestore.Query.DESCENDING)
+        .order_by("__name__", direction=firestore.Query.DESCENDING)
+    )
+    if cursor:
+        upload_date, doc_id = decode_cursor(cursor)
+        query = query.start_after({"UploadDate": upload_date, "__name__": doc_id})
+    scans = list(query.limit(limit).stream())
+
+    next_cursor = None
+    if len(scans) == limit:
+        last = (scans[-1].to_dict() or {}).get("UploadDate")
+        if isinstance(last, datetime):
+            next_cursor = encode_cursor(last, scans[-1].id)
+    return scans, next_cursor
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+_file_hashes = {}
+
+
+def file_hash(path):
+    """sha256 of a file, memoized on (path, size, mtime) so checkpoints are hashed once."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    if key not in _file_hashes:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _file_hashes[key] = h.hexdigest()
+    return _file_hashes[key]
+
+
+class ResultCache:
+    """Size-bounded LRU of analysis results, persisted in a local SQLite file.
+
+    Keys are tuples such as (kind, content hash, checkpoint hash, preprocessing
+    version); values are small JSON-serialisable dicts. The least recently used
+    entries are evicted once there are more than `max_entries` of them or their
+    JSON takes more than `max_bytes`; `on_evict(values)` is then called with
+    the evicted values, outside the cache lock, e.g. to delete files they name.
+    """
+
+    def __init__(self, path, max_entries=5000, max_bytes=64 << 20, on_evict=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL, bytes INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(results)")]
+        if "bytes" not in columns:
+            # caches written before the byte bound
+            self._conn.execute("ALTER TABLE results ADD COLUMN bytes INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE results SET bytes = length(CAST(value AS BLOB))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)")
+        self._conn.commit()
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+
+    @staticmethod
+    def _key(key):
+        return ":".join(str(k) for k in key)
+
+    def get(self, key, validate=None):
+        """Return the cached dict or None. `validate(value)` may reject stale entries."""
+        kind = key[0]
+        k = self._key(key)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (k,)).fetchone()
+            value = json.loads(row[0]) if row else None
+            if value is not None and validate is not None and not validate(value):
+                self._conn.execute("DELETE FROM results WHERE key = ?", (k,))
+                value = None
+            if value is None:
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+            else:
+                self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), k))
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+            self._conn.commit()
+        return value
+
+    def put(self, key, value):
+        encoded = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, last_access, bytes) VALUES (?, ?, ?, ?)",
+                (self._key(key), encoded, time.time(), len(encoded.encode())),
+            )
+            evicted = self._evict()
+            self._conn.commit()
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted)
+
+    def _evict(self):
+        # callers hold self._lock
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM results").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return []
+        keys, values = [], []
+        for key, value, size in self._conn.execute("SELECT key, value, bytes FROM results ORDER BY last_access ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            keys.append((key,))
+            values.append(json.loads(value))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM results WHERE key = ?", keys)
+        self.evictions += len(keys)
+        return values
+
+    def stats(self):
+        with self._lock:
+            size, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM results").fetchone()
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,67 @@
+import atexit
+import queue
+import threading
+import time
+
+from shared.media import write_atomic
+
+
+class BackgroundWriter:
+    """Writes upload bytes to disk on a worker thread, off the request path.
+
+    Code that needs the file itself (rather than the bytes it already has)
+    can call wait_for(path) to block until that write has landed.
+    """
+
+    def __init__(self, name="upload-writer"):
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.written = 0
+        self.bytes_written = 0
+        self.failed = 0
+        self.write_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def write(self, path, data):
+        done = threading.Event()
+        with self._lock:
+            self._pending[path] = done
+        self._queue.put((path, data, done))
+
+    def wait_for(self, path, timeout=None):
+        with self._lock:
+            done = self._pending.get(path)
+        return done.wait(timeout) if done else True
+
+    def flush(self):
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            path, data, done = self._queue.get()
+            started = time.perf_counter()
+            try:
+                write_atomic(path, data)
+                self.written += 1
+                self.bytes_written += len(data)
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠ Background write of {path} failed: {e}")
+            self.write_seconds += time.perf_counter() - started
+            with self._lock:
+                if self._pending.get(path) is done:
+                    del self._pending[path]
+            done.set()
+            self._queue.task_done()
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "bytes_written": self.bytes_written,
+            "failed": self.failed,
+            "avg_write_ms": self.write_seconds / self.written * 1000 if self.written else 0.0,
+        }
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from shared.aggregates import current_stats, load_stats, record_gender_change, record_scan, record_scans
+from shared.datastore import MemoryClient
+
+RID = "r1"
+
+
+def _seed(db):
+    db.collection("Patients").document("p1").set({"CreatedBy": f"/Radiologists/{RID}", "Gender": "Female"})
+    for i, tumor in enumerate(["glioma", "glioma", "meningioma"]):
+        db.collection("MRI_Scans").document(f"s{i}").set({
+            "PatientID": "/Patients/p1", "ClassificationResult": tumor,
+            "UploadDate": datetime(2025, 3, 1), "ConfidenceScore": 90.0,
+        })
+    db.collection("Reports").document("rep1").set({"CreatedBy": f"/Radiologists/{RID}"})
+
+
+def test_first_increment_after_deploy_does_not_hide_existing_data():
+    db = MemoryClient()
+    _seed(db)
+    scan = {"ClassificationResult": "pituitary", "UploadDate": datetime(2025, 4, 1), "ConfidenceScore": 80.0}
+    db.collection("MRI_Scans").document("s3").set(dict(scan, PatientID="/Patients/p1"))
+    record_scan(db, RID, scan)
+    assert load_stats(db, RID)["TotalScans"] == 1
+
+    stats = current_stats(db, RID)
+    assert stats["TotalScans"] == 4
+    assert stats["TotalPatients"] == 1
+    assert stats["TotalReports"] == 1
+    assert stats["TumorCounts"] == {"glioma": 2, "meningioma": 1, "pituitary": 1}
+    assert stats["GenderCounts"] == {"Female": 1}
+    assert "RebuiltAt" in stats
+
+
+def test_increments_after_a_rebuild_are_kept():
+    db = MemoryClient()
+    _seed(db)
+    current_stats(db, RID)
+
+    scans = [{"ClassificationResult": "glioma", "UploadDate": datetime(2025, 3, 2), "ConfidenceScore": 50.0}] * 2
+    record_scans(db, RID, scans)
+    record_scans(db, RID, scans[:1], sign=-1)
+    record_gender_change(db, RID, "Female", "Male")
+
+    stats = current_stats(db, RID)
+    assert stats["TotalScans"] == 4
+    assert stats["TumorCounts"]["glioma"] == 3
+    assert stats["MonthlyUploads"] == {"2025-03": 4}
+    assert stats["ConfidenceCount"] == 4
+    assert stats["GenderCounts"] == {"Female": 0, "Male": 1}
@@ -0,0 +1,98 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from shared import aggregates, cascade, media
+from shared.datastore import MemoryClient
+
+RID = "r1"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(media, "MEDIA_DIR", str(tmp_path / "media"))
+    monkeypatch.setattr(cascade, "MASK_RENDER_DIR", str(tmp_path / "media" / "masks"))
+    monkeypatch.setattr(cascade, "FILE_ROOTS", (str(tmp_path),))
+    # several batches per delete
+    monkeypatch.setattr(cascade, "SCANS_PER_BATCH", 2)
+    return tmp_path
+
+
+def _seed(db):
+    """p1 has cases c1 (3 scans) and c2 (1 scan); p2 has one scan sharing p1's first upload."""
+    for pid, gender in (("p1", "Female"), ("p2", "Male")):
+        db.collection("Patients").document(pid).set({"CreatedBy": f"/Radiologists/{RID}", "Gender": gender})
+    scans = {"s1": ("p1", "c1", b"shared"), "s2": ("p1", "c1", b"two"), "s3": ("p1", "c1", b"three"),
+             "s4": ("p1", "c2", b"four"), "s5": ("p2", "c3", b"shared")}
+    for case_id, pid in (("c1", "p1"), ("c2", "p1"), ("c3", "p2")):
+        db.collection("Cases").document(case_id).set({
+            "PatientID": f"/Patients/{pid}", "ScanCount": sum(1 for s in scans.values() if s[1] == case_id),
+        })
+    for scan_id, (pid, case_id, data) in scans.items():
+        db.collection("MRI_Scans").document(scan_id).set({
+            "PatientID": f"/Patients/{pid}", "CaseID": f"/Cases/{case_id}",
+            "MRIFilePath": media.put(data, ".png"), "GradCAMPath": media.put(b"cam-" + data, ".png"),
+            "ClassificationResult": "glioma", "UploadDate": datetime(2025, 3, 1), "ConfidenceScore": 90.0,
+        })
+        media.write_atomic(os.path.join(cascade.MASK_RENDER_DIR, f"mask_{scan_id}_v1.png"), b"mask")
+    aggregates.rebuild(db, RID)
+
+
+def _files(root):
+    return {os.path.relpath(os.path.join(d, f), root) for d, _, fs in os.walk(root) for f in fs}
+
+
+def test_delete_patient_removes_everything_but_shared_media(store):
+    db = MemoryClient()
+    _seed(db)
+    shared_upload = db.collection("MRI_Scans").document("s5").get().to_dict()["MRIFilePath"]
+
+    summary = cascade.delete_patient(db, "p1")
+
+    assert summary["scans"] == 4 and summary["cases"] == 2
+    assert [s.id for s in db.collection("MRI_Scans").stream()] == ["s5"]
+    assert [c.id for c in db.collection("Cases").stream()] == ["c3"]
+    assert not db.collection("Patients").document("p1").get().exists
+    assert os.path.exists(media.local_path(shared_upload))
+    masks = {f for f in _files(store) if "masks" in f}
+    assert masks == {os.path.join("media", "masks", "mask_s5_v1.png")}
+
+
+def test_delete_patient_counters_match_a_rebuild(store):
+    db = MemoryClient()
+    _seed(db)
+    cascade.delete_patient(db, "p1")
+
+    stats = aggregates.load_stats(db, RID)
+    rebuilt = aggregates.rebuild(db, RID)
+    for key in ("TotalPatients", "TotalScans", "ConfidenceCount"):
+        assert stats[key] == rebuilt[key]
+    assert stats["TumorCounts"] == {"glioma": 1}
+    assert stats["GenderCounts"] == {"Female": 0, "Male": 1}
+
+
+def test_delete_case_leaves_the_patients_other_cases(store):
+    db = MemoryClient()
+    _seed(db)
+
+    summary = cascade.delete_case(db, "c1")
+
+    assert summary["scans"] == 3
+    assert sorted(s.id for s in db.collection("MRI_Scans").stream()) == ["s4", "s5"]
+    assert not db.collection("Cases").document("c1").get().exists
+    assert db.collection("Cases").document("c2").get().to_dict()["ScanCount"] == 1
+    assert aggregates.load_stats(db, RID)["TotalScans"] == 2
+    assert aggregates.load_stats(db, RID)["TotalPatients"] == 2
+
+
+def test_delete_case_again_after_it_is_gone_changes_nothing(store):
+    db = MemoryClient()
+    _seed(db)
+    cascade.delete_case(db, "c1")
+    before = aggregates.load_stats(db, RID)
+
+    summary = cascade.delete_case(db, "c1", radiologist_id=RID)
+
+    assert summary["scans"] == 0
+    assert aggregates.load_stats(db, RID) == before
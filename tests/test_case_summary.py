@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+
+from shared.case_summary import record_added, record_removed, summarize
+from shared.datastore import MemoryClient
+
+MARCH = datetime(2025, 3, 1)
+APRIL = datetime(2025, 4, 1)
+
+
+def _scan(upload_date, tumor):
+    return {"UploadDate": upload_date, "ClassificationResult": tumor}
+
+
+def test_summarize_uses_the_earliest_and_latest_dated_scans():
+    summary = summarize([_scan(APRIL, "meningioma"), _scan(MARCH, "glioma"), {"ClassificationResult": "pituitary"}])
+    assert summary == {"ScanCount": 3, "LastScanAt": APRIL, "FirstDiagnosis": "glioma"}
+    assert summarize([]) == {"ScanCount": 0, "LastScanAt": None, "FirstDiagnosis": None}
+
+
+def test_record_added_keeps_the_first_diagnosis():
+    db = MemoryClient()
+    ref = db.collection("Cases").document("c1")
+    ref.set({"PatientID": "/Patients/p1"})
+
+    record_added(db, "c1", [_scan(MARCH, "glioma")], case=ref.get().to_dict())
+    record_added(db, "c1", [_scan(APRIL, "meningioma"), _scan(APRIL, "meningioma")], case=ref.get().to_dict())
+
+    assert ref.get().to_dict() == {
+        "PatientID": "/Patients/p1", "ScanCount": 3, "LastScanAt": APRIL, "FirstDiagnosis": "glioma",
+    }
+
+
+def test_record_added_and_removed_in_one_batch_with_the_scans():
+    db = MemoryClient()
+    ref = db.collection("Cases").document("c1")
+    ref.set({"ScanCount": 0})
+
+    batch = db.batch()
+    record_added(db, "c1", [_scan(MARCH, "glioma")] * 4, case={}, batch=batch)
+    assert ref.get().to_dict()["ScanCount"] == 0
+    batch.commit()
+    record_removed(db, "c1", 3)
+
+    assert ref.get().to_dict()["ScanCount"] == 1
+
+
+def test_a_missing_case_is_not_created():
+    db = MemoryClient()
+    with pytest.raises(KeyError):
+        record_added(db, "missing", [_scan(MARCH, "glioma")])
+    assert not db.collection("Cases").document("missing").get().exists
+
+
+def test_nothing_to_record():
+    db = MemoryClient()
+    record_added(db, "", [_scan(MARCH, "glioma")])
+    record_added(db, "c1", [])
+    record_removed(db, "c1", 0)
+    assert db.counts() == {}
@@ -0,0 +1,37 @@
+import pytest
+
+from shared.datastore import MemoryClient
+
+
+def test_batch_with_a_missing_update_target_applies_nothing():
+    db = MemoryClient()
+    scan = db.collection("MRI_Scans").document("s1")
+    scan.set({"ClassificationResult": "glioma"})
+
+    batch = db.batch()
+    batch.update(scan, {"ClassificationResult": "meningioma"})
+    batch.set(db.collection("MRI_Scans").document("s2"), {"ClassificationResult": "pituitary"})
+    batch.update(db.collection("Cases").document("missing"), {"ScanCount": 1})
+    with pytest.raises(KeyError):
+        batch.commit()
+
+    assert scan.get().to_dict() == {"ClassificationResult": "glioma"}
+    assert not db.collection("MRI_Scans").document("s2").get().exists
+
+
+def test_batch_update_sees_earlier_ops_of_the_same_batch():
+    db = MemoryClient()
+    case = db.collection("Cases").document("c1")
+
+    batch = db.batch()
+    batch.set(case, {"ScanCount": 0})
+    batch.update(case, {"ScanCount": 2})
+    batch.commit()
+    assert case.get().to_dict() == {"ScanCount": 2}
+
+    batch = db.batch()
+    batch.delete(case)
+    batch.update(case, {"ScanCount": 3})
+    with pytest.raises(KeyError):
+        batch.commit()
+    assert case.get().exists
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("timm")
+pytest.importorskip("segmentation_models_pytorch")
+
+from models import backends, export  # noqa: E402
+from models.classification_model import CLASSIFIER_MODEL_PATH  # noqa: E402
+from models.segmentation_model import SEG_MODEL_PATH  # noqa: E402
+
+pytestmark = pytest.mark.skipif(
+    not (os.path.exists(CLASSIFIER_MODEL_PATH) and os.path.exists(SEG_MODEL_PATH)),
+    reason="model checkpoints are not available",
+)
+
+
+@pytest.mark.parametrize("fmt", ["onnx", "torchscript"])
+def test_exported_models_match_eager(fmt, tmp_path, monkeypatch):
+    if fmt == "onnx":
+        pytest.importorskip("onnx")
+        pytest.importorskip("onnxruntime")
+    monkeypatch.setattr(backends, "EXPORT_DIR", str(tmp_path))
+    torch.manual_seed(0)
+
+    classifier, path = export.export_classifier(fmt)
+    assert os.path.exists(path)
+    segmenter, path = export.export_segmenter(fmt)
+    assert os.path.exists(path)
+
+    assert export.check_parity(fmt, classifier, segmenter)
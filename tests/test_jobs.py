@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+
+from shared.jobs import JobQueue, JobStore
+
+
+def _set_running(path, job_id, owner):
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE jobs SET status = 'running', owner = ? WHERE id = ?", (owner, job_id))
+    conn.commit()
+    conn.close()
+
+
+def _exited_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_a_job_is_claimed_once_across_stores(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first, second = JobStore(path), JobStore(path)
+    job_id = first.create("analyze", {})
+
+    assert first.claim(job_id)
+    assert not second.claim(job_id)
+    assert second.get(job_id)["status"] == "running"
+
+
+def test_two_queues_resuming_one_file_run_each_job_once(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    job_ids = [JobStore(path).create("analyze", {"n": i}) for i in range(10)]
+    runs = []
+    lock = threading.Lock()
+
+    def handler(params, progress):
+        with lock:
+            runs.append(params["n"])
+
+    queues = [JobQueue(JobStore(path), workers=4) for _ in range(2)]
+    for queue in queues:
+        queue.register("analyze", handler)
+    for queue in queues:
+        queue.resume()
+    for job_id in job_ids:
+        assert queues[0].wait(job_id, timeout=5)["status"] == "done"
+
+    assert sorted(runs) == list(range(10))
+
+
+def test_resume_requeues_only_jobs_of_exited_processes(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    orphan = store.create("analyze", {})
+    busy = store.create("analyze", {})
+    _set_running(path, orphan, _exited_pid())
+    _set_running(path, busy, os.getppid())
+
+    assert store.requeue_orphans() == [orphan]
+    assert store.get(busy)["status"] == "running"
@@ -0,0 +1,62 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from models.masks import decode, encode, mask_stats, mask_url, version  # noqa: E402
+
+
+def _blob(h=64, w=48):
+    mask = np.zeros((h, w), dtype=bool)
+    mask[10:30, 5:20] = True
+    return mask
+
+
+@pytest.mark.parametrize("mask", [
+    _blob(),
+    np.zeros((17, 13), dtype=bool),
+    np.ones((17, 13), dtype=bool),
+    np.eye(31, dtype=bool),
+    np.random.default_rng(0).random((37, 29)) > 0.5,
+], ids=["blob", "empty", "full", "diagonal", "noise"])
+def test_round_trip(mask):
+    encoded = encode(mask)
+    decoded = decode(encoded)
+    assert decoded.shape == mask.shape
+    assert (decoded == mask).all()
+
+
+@pytest.mark.parametrize("mask", [_blob(512, 512), np.random.default_rng(1).random((64, 64)) > 0.5])
+def test_picks_the_smaller_format(mask):
+    from models import masks
+
+    flat = mask.ravel()
+    rle = masks._pack(masks._runs(flat).tobytes())
+    bits = masks._pack(np.packbits(flat).tobytes())
+    encoded = encode(mask)
+    assert encoded["data"] == (rle if len(rle) <= len(bits) else bits)
+    assert encoded["format"] == ("rle" if len(rle) <= len(bits) else "packbits")
+
+
+def test_mask_starting_with_tumour():
+    mask = np.zeros((4, 4), dtype=bool)
+    mask[0, :2] = True
+    assert (decode(encode(mask)) == mask).all()
+
+
+def test_unknown_format_is_rejected():
+    encoded = dict(encode(_blob()), format="png")
+    with pytest.raises(ValueError):
+        decode(encoded)
+
+
+def test_stats_and_version():
+    stats = mask_stats(_blob())
+    assert stats["area_px"] == 20 * 15
+    assert stats["bbox"] == [5, 10, 19, 29]
+    assert stats["centroid"] == [12.0, 19.5]
+    assert mask_stats(np.zeros((4, 4), dtype=bool))["bbox"] is None
+
+    encoded = encode(_blob())
+    assert mask_url("s1", encoded) == f"/scans/s1/mask.png?v={version(encoded)}"
+    assert version(encoded) != version(encode(np.eye(8, dtype=bool)))
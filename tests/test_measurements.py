@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from shared.datastore import MemoryClient
+from shared.measurements import case_series, record_points
+
+MARCH = datetime(2025, 3, 1, 9, 30, 15)
+APRIL = datetime(2025, 4, 1, 9, 30)
+
+
+def _point(upload_date, area, fraction=0.01, gradcam=0.5):
+    return {"UploadDate": upload_date, "TumorType": "glioma", "area_px": area,
+            "area_fraction": fraction, "gradcam_mean": gradcam}
+
+
+def test_slices_of_one_study_form_one_point():
+    case = {"Measurements": {
+        "a": _point(MARCH, 100, 0.01, 0.2),
+        "b": _point(MARCH, 300, 0.03, 0.4),
+        "c": _point(APRIL, 600, 0.06, 0.6),
+    }}
+    first, second = case_series(case)
+
+    assert first["scan_ids"] == ["a", "b"] and first["slices"] == 2
+    assert first["area_px"] == 400
+    assert first["area_fraction"] == 0.02
+    assert first["change_pct"] is None
+    assert second["area_px"] == 600
+    assert second["change_pct"] == 50.0
+
+
+def test_studies_in_the_same_minute_stay_apart_and_in_order():
+    later = MARCH.replace(second=45)
+    case = {"Measurements": {"late": _point(later, 200), "early": _point(MARCH, 100)}}
+    series = case_series(case)
+
+    assert [p["scan_ids"] for p in series] == [["early"], ["late"]]
+    assert series[1]["change_pct"] == 100.0
+
+
+def test_record_points_keeps_other_scans_points():
+    db = MemoryClient()
+    db.collection("Cases").document("c1").set({"PatientID": "/Patients/p1"})
+    record_points(db, "c1", {"a": _point(MARCH, 100)})
+    record_points(db, "c1", {"b": _point(APRIL, 150)})
+
+    case = db.collection("Cases").document("c1").get().to_dict()
+    assert set(case["Measurements"]) == {"a", "b"}
+    assert [p["area_px"] for p in case_series(case)] == [100, 150]
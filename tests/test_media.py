@@ -0,0 +1,47 @@
+import os
+import threading
+
+from shared import media
+from shared.writer import BackgroundWriter
+
+
+def test_concurrent_writes_of_one_path_all_succeed(tmp_path):
+    path = str(tmp_path / "media" / ("a" * 64 + ".png"))
+    errors = []
+
+    def write():
+        for _ in range(20):
+            try:
+                media.write_atomic(path, b"scan")
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    with open(path, "rb") as f:
+        assert f.read() == b"scan"
+    assert os.listdir(tmp_path / "media") == [os.path.basename(path)]
+
+
+def test_background_writer_counts_an_existing_file_as_written(tmp_path):
+    path = str(tmp_path / "scan.png")
+    writer = BackgroundWriter(name="test-writer")
+    writer.write(path, b"scan")
+    writer.write(path, b"scan")
+    writer.flush()
+
+    assert writer.wait_for(path, timeout=1)
+    assert writer.stats()["written"] == 2
+    assert writer.stats()["failed"] == 0
+
+
+def test_put_stores_identical_content_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(media, "MEDIA_DIR", str(tmp_path))
+    first = media.put(b"scan", ".png")
+    assert media.put(b"scan", ".png") == first
+    assert os.listdir(tmp_path) == [first[len(media.MEDIA_URL):]]
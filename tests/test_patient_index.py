@@ -0,0 +1,67 @@
+import pytest
+
+from shared.datastore import MemoryClient
+from shared.patient_index import PatientIndex
+
+PATIENTS = {
+    "p1": ("Alice Smith", "glioma", "2025-01-10"),
+    "p2": ("Bob Smithers", "meningioma", "2025-02-20"),
+    "p3": ("Carol Jones", "glioma", "2025-03-30"),
+    "p4": ("Dan Brown", "", ""),
+}
+
+
+@pytest.fixture(params=[True, False], ids=["trigram", "like"])
+def index(request):
+    db = MemoryClient()
+    for pid, (name, tumor, last_mri) in PATIENTS.items():
+        db.collection("Patients").document(pid).set({
+            "FullName": name, "TumorType": tumor, "LastMRIDate": last_mri, "CreatedBy": "/Radiologists/r1",
+        })
+    db.collection("Patients").document("other").set({"FullName": "Alice Smith", "CreatedBy": "/Radiologists/r2"})
+    index = PatientIndex(db)
+    # the LIKE fallback used when SQLite has no trigram tokenizer
+    index.trigram = request.param and index.trigram
+    return index
+
+
+def _ids(result):
+    return [p["id"] for p in result["patients"]]
+
+
+def test_substring_search_in_names_and_ids(index):
+    assert _ids(index.search("r1", q="smith")) == ["p1", "p2"]
+    assert _ids(index.search("r1", q="MITH")) == ["p1", "p2"]
+    assert _ids(index.search("r1", q="on")) == ["p3"]
+    assert _ids(index.search("r1", q="p4")) == ["p4"]
+    assert _ids(index.search("r1", q="zzz")) == []
+
+
+def test_only_the_radiologists_own_patients(index):
+    assert _ids(index.search("r2")) == ["other"]
+    assert "other" not in _ids(index.search("r1", q="alice"))
+
+
+def test_facets_ignore_the_tumour_filter(index):
+    result = index.search("r1", tumor="glioma")
+    assert _ids(result) == ["p1", "p3"]
+    assert result["facets"]["TumorType"] == {"glioma": 2, "meningioma": 1}
+
+
+def test_date_range_and_pages(index):
+    assert _ids(index.search("r1", date_from="2025-02-01")) == ["p2", "p3"]
+    assert _ids(index.search("r1", date_to="2025-02-01")) == ["p1"]
+
+    page = index.search("r1", page=2, per_page=3)
+    assert _ids(page) == ["p4"] and page["total"] == 4 and page["pages"] == 2
+
+
+def test_app_writes_update_a_loaded_index(index):
+    index.search("r1")
+    index.update("p4", {"FullName": "Dana Smith", "TumorType": "pituitary"})
+    index.put("p5", {"FullName": "Eve Smith", "CreatedBy": "/Radiologists/r1"})
+    index.remove("p1")
+
+    assert _ids(index.search("r1", q="smith")) == ["p2", "p4", "p5"]
+    assert index.search("r1")["facets"]["TumorType"]["pituitary"] == 1
+    assert index.loads == 1
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from shared.datastore import MemoryClient
+from shared.queries import scans_page
+
+RADIOLOGIST = "/Radiologists/r1"
+
+
+def _seed(db):
+    study = datetime(2025, 3, 1, 12, 0)
+    for i in range(12):
+        # every slice of an ingested study shares one UploadDate
+        db.collection("MRI_Scans").document(f"study-{i:02d}").set(
+            {"RadiologistID": RADIOLOGIST, "UploadDate": study}
+        )
+    for i in range(3):
+        db.collection("MRI_Scans").document(f"older-{i}").set(
+            {"RadiologistID": RADIOLOGIST, "UploadDate": study - timedelta(days=i + 1)}
+        )
+
+
+def test_scans_page_does_not_skip_tied_upload_dates():
+    db = MemoryClient()
+    _seed(db)
+
+    seen, cursor = [], None
+    while True:
+        scans, cursor = scans_page(db, "r1", cursor=cursor, limit=5)
+        seen += [s.id for s in scans]
+        if not cursor:
+            break
+
+    assert len(seen) == 15
+    assert len(set(seen)) == 15
+    assert seen[:12] == [f"study-{i:02d}" for i in reversed(range(12))]
+    assert seen[12:] == ["older-0", "older-1", "older-2"]
+
+
+def test_scans_page_cursor_ends_on_a_short_page():
+    db = MemoryClient()
+    _seed(db)
+
+    scans, cursor = scans_page(db, "r1", limit=15)
+    assert len(scans) == 15
+    scans, cursor = scans_page(db, "r1", cursor=cursor, limit=15)
+    assert scans == [] and cursor is None
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from models import registry
+from models.registry import ModelNotReady, ModelRegistry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(registry.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def _flaky(failures):
+    calls = []
+
+    def load():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise RuntimeError("checkpoint missing")
+        return "model"
+    return load, calls
+
+
+def test_failed_load_is_retried_after_the_backoff(clock):
+    load, calls = _flaky(1)
+    models = ModelRegistry(retry_base=5, retry_max=60)
+    models.register("classifier", load)
+
+    with pytest.raises(ModelNotReady, match="checkpoint missing"):
+        models.get("classifier")
+    clock.now += 4
+    with pytest.raises(ModelNotReady):
+        models.get("classifier")
+    assert len(calls) == 1
+
+    clock.now += 1
+    assert models.get("classifier") == "model"
+    assert len(calls) == 2
+    assert models.status()["classifier"]["failures"] == 0
+
+
+def test_backoff_doubles_up_to_the_cap(clock):
+    load, calls = _flaky(10)
+    models = ModelRegistry(retry_base=5, retry_max=12)
+    models.register("segmentation", load)
+
+    delays = []
+    for _ in range(4):
+        with pytest.raises(ModelNotReady):
+            models.get("segmentation")
+        delay = models.status()["segmentation"]["retry_in"]
+        delays.append(delay)
+        clock.now += delay
+    assert delays == [5, 10, 12, 12]
+    assert len(calls) == 4
+
+
+def test_concurrent_gets_share_one_load():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "model"
+
+    models = ModelRegistry()
+    models.register("classifier", load)
+    loader = threading.Thread(target=models.get, args=("classifier",))
+    loader.start()
+    started.wait(5)
+    with pytest.raises(ModelNotReady, match="warming up"):
+        models.get("classifier", timeout=0.01)
+    release.set()
+    loader.join()
+
+    assert models.get("classifier") == "model"
+    assert len(calls) == 1
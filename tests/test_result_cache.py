@@ -0,0 +1,74 @@
+import json
+import sqlite3
+
+from shared.result_cache import ResultCache
+
+
+def _value(i, pad=0):
+    return {"tumor_type": "glioma", "gradcam": f"/media/{i}.png", "pad": "x" * pad}
+
+
+def test_evicts_least_recently_used_beyond_max_entries(tmp_path):
+    evicted = []
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), max_entries=3, on_evict=evicted.extend)
+    for i in range(3):
+        cache.put(("classifier", i), _value(i))
+    cache.get(("classifier", 0))
+    cache.put(("classifier", 3), _value(3))
+
+    assert [v["gradcam"] for v in evicted] == ["/media/1.png"]
+    assert cache.get(("classifier", 0)) is not None
+    assert cache.get(("classifier", 1)) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_until_within_max_bytes(tmp_path):
+    size = len(json.dumps(_value(0, pad=100)))
+    evicted = []
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), max_entries=100, max_bytes=3 * size,
+                        on_evict=evicted.extend)
+    for i in range(5):
+        cache.put(("classifier", i), _value(i, pad=100))
+
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["bytes"] == 3 * size
+    assert [v["gradcam"] for v in evicted] == ["/media/0.png", "/media/1.png"]
+
+
+def test_no_callback_without_eviction(tmp_path):
+    evicted = []
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), on_evict=evicted.extend)
+    cache.put(("classifier", 0), _value(0))
+    assert evicted == []
+
+
+def test_opens_a_cache_written_before_the_byte_bound(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE results (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL)")
+    conn.execute("INSERT INTO results VALUES ('classifier:0', ?, 0)", (json.dumps(_value(0)),))
+    conn.commit()
+    conn.close()
+
+    cache = ResultCache(path)
+    assert cache.get(("classifier", 0)) == _value(0)
+    assert cache.stats()["bytes"] == len(json.dumps(_value(0)))
+
+
+def test_delete_unreferenced_keeps_overlays_a_scan_still_shows(tmp_path, monkeypatch):
+    from shared import cascade, media
+    from shared.datastore import MemoryClient
+
+    monkeypatch.setattr(media, "MEDIA_DIR", str(tmp_path))
+    monkeypatch.setattr(cascade, "FILE_ROOTS", (str(tmp_path),))
+    kept = media.put(b"kept overlay", ".png")
+    dropped = media.put(b"dropped overlay", ".png")
+    db = MemoryClient()
+    db.collection("MRI_Scans").document("s1").set({"GradCAMPath": kept})
+
+    removed, failed = cascade.delete_unreferenced(db, "GradCAMPath", {kept, dropped, None})
+
+    assert (removed, failed) == (1, 0)
+    assert (tmp_path / kept.rsplit("/", 1)[1]).exists()
+    assert not (tmp_path / dropped.rsplit("/", 1)[1]).exists()